@@ -0,0 +1,176 @@
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional
+import numpy as np
+
+from retriever import normalize_query
+from index_manifest import index_version
+from config import (
+    INDEX_DIR,
+    ANSWER_CACHE_TTL,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_SEMANTIC,
+    ANSWER_CACHE_SIMILARITY
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerCache:
+    """
+    In-process cache of final pipeline answers.
+
+    Entries are keyed by (normalized question, verification mode, index
+    version). The index version comes from the ingestion manifest, so any
+    ingestion that changes the index makes older entries unreachable; they
+    are purged the next time the cache sees a newer version. Entries expire
+    after ttl seconds and the least recently used entry is dropped once
+    max_size is reached.
+
+    With semantic lookup enabled, a question that misses the exact key is
+    matched against cached questions of the same mode and index version by
+    cosine similarity of their query embeddings.
+    """
+
+    def __init__(
+        self,
+        ttl: float = ANSWER_CACHE_TTL,
+        max_size: int = ANSWER_CACHE_SIZE,
+        semantic: bool = ANSWER_CACHE_SEMANTIC,
+        similarity_threshold: float = ANSWER_CACHE_SIMILARITY,
+        index_dir: str = INDEX_DIR
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+        self.index_dir = index_dir
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (stored_at, result, embedding)
+        self._version = None
+        self._lock = threading.Lock()
+
+    def current_version(self) -> int:
+        """
+        The index version, re-read from the manifest only when it changed.
+        """
+        return index_version(self.index_dir)
+
+    def _key(self, question: str, enable_verification: bool, version: int) -> tuple:
+        return normalize_query(question), bool(enable_verification), version
+
+    def _purge_stale(self, version: int):
+        """
+        Drop entries of older index versions and expired entries. Caller holds the lock.
+        """
+        if version != self._version:
+            if self._entries:
+                logger.info(f"Index version changed to {version}, clearing {len(self._entries)} cached answers")
+            self._entries.clear()
+            self._version = version
+
+        now = time.time()
+        expired = [key for key, (stored_at, _, _) in self._entries.items() if now - stored_at > self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+    def get(
+        self,
+        question: str,
+        enable_verification: bool,
+        embedding=None,
+        version: int = None
+    ) -> Optional[Dict[str, str]]:
+        """
+        Look up a cached answer.
+
+        Args:
+            question: The user question
+            enable_verification: Verification mode the answer was produced with
+            embedding: Optional normalized query embedding for semantic lookup
+            version: Index version to look up, read from the manifest if omitted
+
+        Returns:
+            Copy of the cached result dict, or None on a miss
+        """
+        if version is None:
+            version = self.current_version()
+        key = self._key(question, enable_verification, version)
+
+        with self._lock:
+            self._purge_stale(version)
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[1])
+
+            if self.semantic and embedding is not None:
+                best_key, best_score = None, self.similarity_threshold
+                for other_key, (_, _, other_embedding) in self._entries.items():
+                    if other_key[1] != key[1] or other_embedding is None:
+                        continue
+                    score = float(np.dot(embedding, other_embedding))
+                    if score >= best_score:
+                        best_key, best_score = other_key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    logger.info(f"Semantic answer cache hit ({best_score:.3f}) for question: {question}")
+                    return dict(self._entries[best_key][1])
+
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        question: str,
+        enable_verification: bool,
+        result: Dict[str, str],
+        embedding=None,
+        version: int = None
+    ):
+        """
+        Store a pipeline result for the index version it was computed against.
+        Pass the version read before retrieval so an ingestion that finishes
+        mid-question can't label an old answer with the new version.
+        """
+        if self.max_size <= 0:
+            return
+        if version is None:
+            version = self.current_version()
+        key = self._key(question, enable_verification, version)
+        if embedding is not None:
+            embedding = np.asarray(embedding, dtype=np.float32)
+
+        with self._lock:
+            if self._version is not None and version < self._version:
+                return
+            self._purge_stale(version)
+            self._entries[key] = (time.time(), dict(result), embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "size": len(self._entries)
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by every AgentWorkflow in the process
+answer_cache = AnswerCache()
\ No newline at end of file
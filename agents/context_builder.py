@@ -0,0 +1,105 @@
+from typing import List
+from langchain_core.documents import Document
+from llama_index.core.utils import get_tokenizer
+from config import CONTEXT_TOKEN_BUDGET, CHUNK_OVERLAP
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Overlaps shorter than this are treated as coincidence, not splitter overlap
+_MIN_OVERLAP_CHARS = 8
+# Upper bound on the overlap searched for; tokens rarely exceed 8 characters
+_MAX_OVERLAP_CHARS = CHUNK_OVERLAP * 8
+
+
+def _overlap(left: str, right: str) -> int:
+    """
+    Length of the longest suffix of left that is also a prefix of right.
+    """
+    longest = min(len(left), len(right), _MAX_OVERLAP_CHARS)
+    for size in range(longest, _MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _merge_page_chunks(texts: List[str]) -> List[str]:
+    """
+    Stitch chunks of one page back together wherever one chunk's end is
+    repeated at the start of another (the splitter's overlap), dropping the
+    repeated span. Chunks that aren't adjacent stay separate segments.
+    """
+    segments = []
+    for text in texts:
+        text = text.strip()
+        if not text or any(text in segment for segment in segments):
+            continue
+        segments.append(text)
+
+    merged = True
+    while merged and len(segments) > 1:
+        merged = False
+        for i in range(len(segments)):
+            for j in range(len(segments)):
+                if i == j:
+                    continue
+                size = _overlap(segments[i], segments[j])
+                if size:
+                    segments[i] = segments[i] + segments[j][size:]
+                    del segments[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return segments
+
+
+def build_context(documents: List[Document], token_budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    Pack retrieved chunks into a prompt context of at most token_budget tokens.
+
+    Documents are expected best first (retriever order). Chunks from the
+    same file and page are merged with their overlapping spans removed,
+    pages are ordered by their best chunk, and segments are added until
+    the budget is spent. A segment that doesn't fit is skipped in favour
+    of smaller ones further down; if not even the first fits, it is cut.
+
+    Args:
+        documents: Retrieved documents, most relevant first
+        token_budget: Maximum context size in tokenizer tokens
+
+    Returns:
+        Context string with segments separated by blank lines
+    """
+    if not documents:
+        return ""
+
+    pages = {}
+    for doc in documents:
+        metadata = doc.metadata or {}
+        key = (metadata.get("file_path") or metadata.get("file_name"), metadata.get("page_label"))
+        if key[0] is None:
+            key = (id(doc), None)  # Unknown origin, never merged
+        pages.setdefault(key, []).append(doc.page_content)
+
+    tokenizer = get_tokenizer()
+    segments = []
+    used = 0
+    for texts in pages.values():
+        for segment in _merge_page_chunks(texts):
+            tokens = len(tokenizer(segment))
+            if used + tokens + 1 > token_budget:
+                continue
+            segments.append(segment)
+            used += tokens + 1  # Plus the separator
+
+    if not segments:
+        first_page = _merge_page_chunks(next(iter(pages.values())))
+        if first_page:
+            tokens = tokenizer(first_page[0])
+            segments.append(first_page[0][:len(first_page[0]) * token_budget // max(len(tokens), 1)])
+
+    input_chars = sum(len(doc.page_content) for doc in documents)
+    context = "\n\n".join(segments)
+    logger.debug(f"Packed {len(documents)} chunks into {len(segments)} segments, {used} tokens ({input_chars} -> {len(context)} chars)")
+    return context
\ No newline at end of file
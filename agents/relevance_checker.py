@@ -1,47 +1,88 @@
-from langchain_groq import ChatGroq
-import os
+from llm_gateway import LLMGateway
+from typing import List
+from langchain_core.documents import Document
+from resources import get_llm
+from config import RELEVANCE_GATE_ENABLED, RELEVANCE_GATE_HIGH, RELEVANCE_GATE_LOW, RELEVANCE_GATE_BM25
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
 class RelevanceChecker:
-    def __init__(self):
-        # Initialize Groq LLM
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY environment variable is not set")
-        
-        self.llm = ChatGroq(
-            model_name="llama-3.1-8b-instant",
-            temperature=0,
-            max_tokens=10,
-            groq_api_key=api_key,
-        )
-
-    def check(self, question: str, retriever, k=3) -> str:
+    def __init__(self, llm: LLMGateway = None, gate: bool = RELEVANCE_GATE_ENABLED):
+        # Shared LLM gateway unless a specific one is given
+        self.llm = llm or get_llm("relevance")
+        self.gate_enabled = gate
+
+        # How often the score gate decided without the LLM
+        self.gated_can_answer = 0
+        self.gated_no_match = 0
+        self.llm_calls = 0
+        self._stats_lock = threading.Lock()
+
+    def gate(self, documents: List[Document]):
         """
-        1. Retrieve the top-k document chunks from the global retriever.
-        2. Combine them into a single text string.
-        3. Pass that text + question to the LLM for classification.
+        Classify from retrieval scores alone when they are conclusive.
 
-        Returns: "CAN_ANSWER", "PARTIAL", or "NO_MATCH".
-        """
+        Uses the cosine similarity ("vector_score") and BM25 scores the
+        retriever attaches to document metadata:
+        - a chunk with a vector score >= RELEVANCE_GATE_HIGH and a
+          normalized BM25 score ("bm25_norm") >= RELEVANCE_GATE_BM25 is CAN_ANSWER
+        - a top vector score < RELEVANCE_GATE_LOW with no BM25 hit at all
+          is NO_MATCH
 
-        logger.debug(f"RelevanceChecker.check called with question='{question}' and k={k}")
+        Returns:
+            "CAN_ANSWER", "NO_MATCH", or None when the LLM should decide
+        """
+        if not self.gate_enabled or not documents:
+            return None
+        if not any("vector_score" in doc.metadata for doc in documents):
+            return None  # Retriever didn't attach scores
+
+        top_vector = max(doc.metadata.get("vector_score", 0.0) for doc in documents)
+        has_bm25_hit = any(doc.metadata.get("bm25_score", 0.0) > 0 for doc in documents)
+        strong_and_lexical = any(
+            doc.metadata.get("vector_score", 0.0) >= RELEVANCE_GATE_HIGH
+            and doc.metadata.get("bm25_norm", 0.0) >= RELEVANCE_GATE_BM25
+            for doc in documents
+        )
 
-        # Retrieve doc chunks from the ensemble retriever
-        try:
-            top_docs = retriever.invoke(question)
-        except Exception as e:
-            logger.error(f"Error retrieving documents: {e}")
+        if strong_and_lexical:
+            return "CAN_ANSWER"
+        if top_vector < RELEVANCE_GATE_LOW and not has_bm25_hit:
             return "NO_MATCH"
-        
-        if not top_docs:
-            logger.debug("No documents returned from retriever.invoke(). Classifying as NO_MATCH.")
-            return "NO_MATCH"
-
+        return None
+
+    def _gated(self, documents: List[Document], k: int):
+        label = self.gate(documents[:k])
+        with self._stats_lock:
+            if label == "CAN_ANSWER":
+                self.gated_can_answer += 1
+            elif label == "NO_MATCH":
+                self.gated_no_match += 1
+            else:
+                self.llm_calls += 1
+        if label:
+            logger.info(f"Relevance decided from retrieval scores: {label}")
+        return label
+
+    def stats(self) -> dict:
+        """
+        Gate decisions and LLM calls so far. llm_calls_avoided counts the
+        gated decisions: each skipped the relevance call, and the workflow
+        runs the gate before speculating, so a gated NO_MATCH makes no call at all.
+        """
+        with self._stats_lock:
+            return {
+                "gated_can_answer": self.gated_can_answer,
+                "gated_no_match": self.gated_no_match,
+                "llm_calls": self.llm_calls,
+                "llm_calls_avoided": self.gated_can_answer + self.gated_no_match
+            }
+
+    def generate_prompt(self, question: str, documents: List[Document], k: int) -> str:
         # Combine the top k chunk texts into one string
-        document_content = "\n\n".join(doc.page_content for doc in top_docs[:k])
+        document_content = "\n\n".join(doc.page_content for doc in documents[:k])
 
         # Create a prompt for the LLM to classify relevance
         prompt = f"""
@@ -64,6 +105,28 @@ class RelevanceChecker:
 
         **Respond ONLY with one of the following labels: CAN_ANSWER, PARTIAL, NO_MATCH**
         """
+        return prompt
+
+    def check(self, question: str, documents: List[Document], k=3) -> str:
+        """
+        1. Take the top-k document chunks already retrieved for the question.
+        2. Combine them into a single text string.
+        3. Pass that text + question to the LLM for classification.
+
+        Returns: "CAN_ANSWER", "PARTIAL", or "NO_MATCH".
+        """
+
+        logger.debug(f"RelevanceChecker.check called with question='{question}' and k={k}")
+
+        if not documents:
+            logger.debug("No documents were retrieved for the question. Classifying as NO_MATCH.")
+            return "NO_MATCH"
+
+        gated = self._gated(documents, k)
+        if gated:
+            return gated
+
+        prompt = self.generate_prompt(question, documents, k)
 
         # Call the LLM
         try:
@@ -74,7 +137,36 @@ class RelevanceChecker:
             logger.error(f"Error during model inference: {e}")
             return "NO_MATCH"
 
-        print(f"Checker response: {llm_response}")
+        return self._classify(llm_response)
+
+    async def acheck(self, question: str, documents: List[Document], k=3) -> str:
+        """
+        Async counterpart of check(), awaiting the LLM with ainvoke().
+        """
+        logger.debug(f"RelevanceChecker.acheck called with question='{question}' and k={k}")
+
+        if not documents:
+            logger.debug("No documents were retrieved for the question. Classifying as NO_MATCH.")
+            return "NO_MATCH"
+
+        gated = self._gated(documents, k)
+        if gated:
+            return gated
+
+        prompt = self.generate_prompt(question, documents, k)
+
+        try:
+            response = await self.llm.ainvoke(prompt)
+            llm_response = response.content.strip().upper()
+            logger.debug(f"LLM response: {llm_response}")
+        except Exception as e:
+            logger.error(f"Error during model inference: {e}")
+            return "NO_MATCH"
+
+        return self._classify(llm_response)
+
+    def _classify(self, llm_response: str) -> str:
+        logger.debug(f"Checker response: {llm_response}")
 
         # Validate the response
         valid_labels = {"CAN_ANSWER", "PARTIAL", "NO_MATCH"}
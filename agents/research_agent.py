@@ -1,25 +1,23 @@
-from langchain_groq import ChatGroq
-from typing import Dict, List
+from llm_gateway import LLMGateway
+from typing import Dict, List, Iterator
 from langchain_core.documents import Document
-import os
+from resources import get_llm
+from .context_builder import build_context
+import logging
+
+logger = logging.getLogger(__name__)
 
 class ResearchAgent:
-    def __init__(self):
+    def __init__(self, llm: LLMGateway = None):
         """
-        Initialize the research agent with Groq LLM.
+        Initialize the research agent with the shared LLM gateway.
+
+        Args:
+            llm: Chat model to use, the shared "research" gateway by default
         """
-        print("Initializing ResearchAgent with Groq LLM...")
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY environment variable is not set")
-        
-        self.llm = ChatGroq(
-            model_name="llama-3.1-8b-instant",
-            temperature=0.1,
-            max_tokens=512,  # Limit for faster responses
-            groq_api_key=api_key,
-        )
-        print("LLM initialized successfully.")
+        logger.debug("Initializing ResearchAgent...")
+        self.llm = llm or get_llm("research")
+        logger.debug("LLM initialized successfully.")
 
     def sanitize_response(self, response_text: str) -> str:
         """
@@ -54,41 +52,108 @@ class ResearchAgent:
         """
         Generate an initial answer using the provided documents.
         """
-        print(f"ResearchAgent.generate called with question='{question}' and {len(documents)} documents.")
+        logger.debug(f"ResearchAgent.generate called with question='{question}' and {len(documents)} documents.")
 
         if not documents:
-            print("No documents provided to generate an answer.")
+            logger.debug("No documents provided to generate an answer.")
             return {
                 "draft_answer": "Sorry, I don't have any information about your question.",
                 "context_used": ""
             }
 
-        # Combine the top document contents into one string
-        context = "\n\n".join([doc.page_content for doc in documents])
-        print(f"Combined context length: {len(context)} characters.")
+        # Pack the documents into the token budget, most relevant first
+        context = build_context(documents)
+        logger.debug(f"Combined context length: {len(context)} characters.")
 
         # Create a prompt for the LLM
         prompt = self.generate_prompt(question, context)
-        print("Prompt created for the LLM.")
+        logger.debug("Prompt created for the LLM.")
 
         # Call the LLM to generate the answer
         try:
-            print("Sending prompt to the model...")
+            logger.debug("Sending prompt to the model...")
             response = self.llm.invoke(prompt)
-            print("LLM response received.")
+            logger.debug("LLM response received.")
+        except Exception as e:
+            logger.error(f"Error during model inference: {e}")
+            return {
+                "draft_answer": "Sorry, I encountered an error while generating the answer.",
+                "context_used": context
+            }
+
+        return self._result_from_response(response, context)
+
+    async def agenerate(self, question: str, documents: List[Document]) -> Dict:
+        """
+        Async counterpart of generate(), awaiting the LLM with ainvoke().
+        """
+        logger.debug(f"ResearchAgent.agenerate called with question='{question}' and {len(documents)} documents.")
+
+        if not documents:
+            logger.debug("No documents provided to generate an answer.")
+            return {
+                "draft_answer": "Sorry, I don't have any information about your question.",
+                "context_used": ""
+            }
+
+        context = build_context(documents)
+        prompt = self.generate_prompt(question, context)
+
+        try:
+            logger.debug("Sending prompt to the model...")
+            response = await self.llm.ainvoke(prompt)
+            logger.debug("LLM response received.")
         except Exception as e:
-            print(f"Error during model inference: {e}")
+            logger.error(f"Error during model inference: {e}")
             return {
                 "draft_answer": "Sorry, I encountered an error while generating the answer.",
                 "context_used": context
             }
 
+        return self._result_from_response(response, context)
+
+    def _result_from_response(self, response, context: str) -> Dict:
         # Extract and process the LLM's response
         draft_answer = self.sanitize_response(response.content) if response.content else "I cannot answer this question."
 
-        print(f"Generated answer: {draft_answer}")
+        logger.debug(f"Generated answer: {draft_answer}")
 
         return {
             "draft_answer": draft_answer,
             "context_used": context
-        }
\ No newline at end of file
+        }
+
+    def stream(self, question: str, documents: List[Document]) -> Iterator[str]:
+        """
+        Generate an answer like generate(), yielding text chunks as the LLM
+        produces them. The concatenated chunks form the draft answer.
+        """
+        logger.debug(f"ResearchAgent.stream called with question='{question}' and {len(documents)} documents.")
+
+        if not documents:
+            logger.debug("No documents provided to generate an answer.")
+            yield "Sorry, I don't have any information about your question."
+            return
+
+        context = build_context(documents)
+        prompt = self.generate_prompt(question, context)
+
+        streamed_any = False
+        try:
+            logger.debug("Streaming prompt to the model...")
+            for chunk in self.llm.stream(prompt):
+                if chunk.content:
+                    # Skip leading whitespace, like sanitize_response does for generate()
+                    text = chunk.content if streamed_any else chunk.content.lstrip()
+                    if text:
+                        streamed_any = True
+                        yield text
+            logger.debug("LLM stream finished.")
+        except Exception as e:
+            logger.error(f"Error during model inference: {e}")
+            if not streamed_any:
+                yield "Sorry, I encountered an error while generating the answer."
+            return
+
+        if not streamed_any:
+            yield "I cannot answer this question."
\ No newline at end of file
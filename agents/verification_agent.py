@@ -1,25 +1,23 @@
-from langchain_groq import ChatGroq
+from llm_gateway import LLMGateway
 from typing import Dict, List
 from langchain_core.documents import Document
-import os
+from resources import get_llm
+from .context_builder import build_context
+import logging
+
+logger = logging.getLogger(__name__)
 
 class VerificationAgent:
-    def __init__(self):
+    def __init__(self, llm: LLMGateway = None):
         """
-        Initialize the verification agent with Groq LLM.
+        Initialize the verification agent with the shared LLM gateway.
+
+        Args:
+            llm: Chat model to use, the shared "verification" gateway by default
         """
-        print("Initializing VerificationAgent with Groq LLM...")
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY environment variable is not set")
-        
-        self.llm = ChatGroq(
-            model_name="llama-3.1-8b-instant",
-            temperature=0.0,
-            max_tokens=200,
-            groq_api_key=api_key,
-        )
-        print("LLM initialized successfully.")
+        logger.debug("Initializing VerificationAgent...")
+        self.llm = llm or get_llm("verification")
+        logger.debug("LLM initialized successfully.")
 
     def sanitize_response(self, response_text: str) -> str:
         """
@@ -109,7 +107,7 @@ class VerificationAgent:
 
             return verification
         except Exception as e:
-            print(f"Error parsing verification response: {e}")
+            logger.error(f"Error parsing verification response: {e}")
             return None
 
     def format_verification_report(self, verification: Dict) -> str:
@@ -146,10 +144,10 @@ class VerificationAgent:
         """
         Verify the answer against the provided documents.
         """
-        print(f"VerificationAgent.check called with answer='{answer}' and {len(documents)} documents.")
+        logger.debug(f"VerificationAgent.check called with answer='{answer}' and {len(documents)} documents.")
 
         if not documents:
-            print("No documents provided for verification.")
+            logger.debug("No documents provided for verification.")
             verification_report = {
                 "Supported": "NO",
                 "Unsupported Claims": [],
@@ -160,24 +158,25 @@ class VerificationAgent:
             verification_report_formatted = self.format_verification_report(verification_report)
             return {
                 "verification_report": verification_report_formatted,
+                "verification": verification_report,
                 "context_used": ""
             }
 
-        # Combine all document contents into one string without truncation
-        context = "\n\n".join([doc.page_content for doc in documents])
-        print(f"Combined context length: {len(context)} characters.")
+        # Pack the documents into the token budget, most relevant first
+        context = build_context(documents)
+        logger.debug(f"Combined context length: {len(context)} characters.")
 
         # Create a prompt for the LLM to verify the answer
         prompt = self.generate_prompt(answer, context)
-        print("Prompt created for the LLM.")
+        logger.debug("Prompt created for the LLM.")
 
         # Call the LLM to generate the verification report
         try:
-            print("Sending prompt to the model...")
+            logger.debug("Sending prompt to the model...")
             response = self.llm.invoke(prompt)
-            print("LLM response received.")
+            logger.debug("LLM response received.")
         except Exception as e:
-            print(f"Error during model inference: {e}")
+            logger.error(f"Error during model inference: {e}")
             verification_report = {
                 "Supported": "NO",
                 "Unsupported Claims": [],
@@ -188,15 +187,52 @@ class VerificationAgent:
             verification_report_formatted = self.format_verification_report(verification_report)
             return {
                 "verification_report": verification_report_formatted,
+                "verification": verification_report,
+                "context_used": context
+            }
+
+        return self._report_from_response(response, context)
+
+    async def acheck(self, answer: str, documents: List[Document]) -> Dict:
+        """
+        Async counterpart of check(), awaiting the LLM with ainvoke().
+        """
+        logger.debug(f"VerificationAgent.acheck called with answer='{answer}' and {len(documents)} documents.")
+
+        if not documents:
+            return self.check(answer, documents)
+
+        context = build_context(documents)
+        prompt = self.generate_prompt(answer, context)
+
+        try:
+            logger.debug("Sending prompt to the model...")
+            response = await self.llm.ainvoke(prompt)
+            logger.debug("LLM response received.")
+        except Exception as e:
+            logger.error(f"Error during model inference: {e}")
+            verification_report = {
+                "Supported": "NO",
+                "Unsupported Claims": [],
+                "Contradictions": [],
+                "Relevant": "NO",
+                "Additional Details": f"Model error: {str(e)}"
+            }
+            return {
+                "verification_report": self.format_verification_report(verification_report),
+                "verification": verification_report,
                 "context_used": context
             }
 
+        return self._report_from_response(response, context)
+
+    def _report_from_response(self, response, context: str) -> Dict:
         # Extract and process the LLM's response
         try:
             llm_response = response.content.strip()
-            print(f"Raw LLM response:\n{llm_response}")
+            logger.debug(f"Raw LLM response:\n{llm_response}")
         except Exception as e:
-            print(f"Unexpected response structure: {e}")
+            logger.error(f"Unexpected response structure: {e}")
             verification_report = {
                 "Supported": "NO",
                 "Unsupported Claims": [],
@@ -205,17 +241,17 @@ class VerificationAgent:
                 "Additional Details": "Invalid response structure from the model."
             }
             verification_report_formatted = self.format_verification_report(verification_report)
-            print(f"Verification report:\n{verification_report_formatted}")
-            print(f"Context used: {context}")
+            logger.debug(f"Verification report:\n{verification_report_formatted}")
             return {
                 "verification_report": verification_report_formatted,
+                "verification": verification_report,
                 "context_used": context
             }
 
         # Sanitize the response
         sanitized_response = self.sanitize_response(llm_response) if llm_response else ""
         if not sanitized_response:
-            print("LLM returned an empty response.")
+            logger.warning("LLM returned an empty response.")
             verification_report = {
                 "Supported": "NO",
                 "Unsupported Claims": [],
@@ -227,7 +263,7 @@ class VerificationAgent:
             # Parse the response into the expected format
             verification_report = self.parse_verification_response(sanitized_response)
             if verification_report is None:
-                print("LLM did not respond with the expected format. Using default verification report.")
+                logger.warning("LLM did not respond with the expected format. Using default verification report.")
                 verification_report = {
                     "Supported": "NO",
                     "Unsupported Claims": [],
@@ -238,10 +274,10 @@ class VerificationAgent:
 
         # Format the verification report into a paragraph
         verification_report_formatted = self.format_verification_report(verification_report)
-        print(f"Verification report:\n{verification_report_formatted}")
-        print(f"Context used: {context}")
+        logger.debug(f"Verification report:\n{verification_report_formatted}")
 
         return {
             "verification_report": verification_report_formatted,
+            "verification": verification_report,
             "context_used": context
         }
\ No newline at end of file
@@ -1,11 +1,27 @@
+import time
+import asyncio
+import operator
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 from langgraph.graph import StateGraph, END
-from typing import TypedDict, List, Dict, Any
+from langchain_core.runnables import RunnableLambda
+from typing import Annotated, TypedDict, List, Dict, Any, Iterator
 from langchain_core.documents import Document
 import logging
 
 from .research_agent import ResearchAgent
 from .verification_agent import VerificationAgent
 from .relevance_checker import RelevanceChecker
+from .answer_cache import AnswerCache, answer_cache as shared_answer_cache
+from metrics import StageSpan, stage_span, registry as metrics_registry
+from config import (
+    ANSWER_CACHE_ENABLED,
+    TOP_K,
+    RELEVANCE_TOP_K,
+    SPECULATIVE_RESEARCH,
+    MAX_RESEARCH_RETRIES,
+    RETRY_EXPAND_K
+)
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -23,22 +39,43 @@ class AgentState(TypedDict):
     retriever: Any  # Custom hybrid retriever
     iteration_count: int  # Track iterations to prevent infinite loops
     enable_verification: bool  # Toggle verification for speed
+    verification: Dict[str, Any]  # Parsed verification result of the latest draft
+    context_k: int  # Leading documents used as research/verification context
+    retry_count: int  # Re-research rounds after failed verification
+    retry_seconds: float  # Time spent in those rounds
+    retry_started: float  # perf_counter() at the start of the current retry
+    spans: Annotated[List[StageSpan], operator.add]  # Timing and token usage per stage run, appended by each node
 
 
 # ---------------------------
 # Workflow Class
 # ---------------------------
 class AgentWorkflow:
-    def __init__(self, enable_verification: bool = False):
+    def __init__(
+        self,
+        enable_verification: bool = False,
+        answer_cache: AnswerCache = None,
+        speculative: bool = SPECULATIVE_RESEARCH
+    ):
         """
         Initialize workflow.
         
         Args:
             enable_verification: If True, runs verification (slower but more accurate).
                                If False, skips verification (faster).
+            answer_cache: Cache for final answers. Defaults to the process-wide
+                          cache when ANSWER_CACHE_ENABLED is set.
+            speculative: With verification, draft the answer while the relevance
+                         check runs and discard the draft on NO_MATCH.
         """
         self.researcher = ResearchAgent()
         self.enable_verification = enable_verification
+        self.speculative = speculative and enable_verification
+        # Runs speculative drafts next to the relevance check
+        self._speculation_pool = ThreadPoolExecutor(thread_name_prefix="speculative-research") if self.speculative else None
+        if answer_cache is None and ANSWER_CACHE_ENABLED:
+            answer_cache = shared_answer_cache
+        self.answer_cache = answer_cache
         
         # Only initialize verification components if needed
         if enable_verification:
@@ -48,71 +85,126 @@ class AgentWorkflow:
             self.verifier = None
             self.relevance_checker = None
             
+        self._steps = self._graph_steps()
         self.compiled_workflow = self._build_workflow()
 
     # ---------------------------
     # Build LangGraph Workflow
     # ---------------------------
-    def _build_workflow(self):
-        workflow = StateGraph(AgentState)
-
+    # Nodes each node may hand over to; _next_node() picks one at run time
+    _SUCCESSORS = {
+        "check_relevance": ("research", END),
+        "check_and_research": ("verify", END),
+        "research": ("verify", END),
+        "verify": ("expand_context", END),
+        "expand_context": ("research",)
+    }
+
+    def _graph_steps(self) -> Dict[str, tuple]:
+        """
+        Node name -> (step, async step or None) for this workflow's mode.
+        """
+        # Fast workflow - research only
+        steps = {"research": (self._research_step, self._aresearch_step)}
         if self.enable_verification:
-            # Full workflow with verification
-            workflow.add_node("check_relevance", self._check_relevance_step)
-            workflow.add_node("research", self._research_step)
-            workflow.add_node("verify", self._verification_step)
-
-            workflow.set_entry_point("check_relevance")
-
-            workflow.add_conditional_edges(
-                "check_relevance",
-                self._decide_after_relevance_check,
-                {
-                    "relevant": "research",
-                    "irrelevant": END
-                }
-            )
+            if self.speculative:
+                # Relevance check and first draft run together
+                steps["check_and_research"] = (self._speculative_step, self._aspeculative_step)
+            else:
+                steps["check_relevance"] = (self._check_relevance_step, self._acheck_relevance_step)
+            steps["verify"] = (self._verification_step, self._averification_step)
+            steps["expand_context"] = (self._expand_context_step, None)
+        return steps
+
+    def _entry_node(self) -> str:
+        if not self.enable_verification:
+            return "research"
+        return "check_and_research" if self.speculative else "check_relevance"
+
+    def _next_node(self, node: str, state: AgentState) -> str:
+        """
+        Routing after a node has run, shared by the compiled graph and
+        stream_pipeline().
 
-            workflow.add_edge("research", "verify")
+        Returns:
+            The next node, or END
+        """
+        if node in ("check_relevance", "check_and_research"):
+            if self._decide_after_relevance_check(state) == "irrelevant":
+                return END
+            return "research" if node == "check_relevance" else "verify"
+        if node == "research":
+            return "verify" if self.enable_verification else END
+        if node == "verify":
+            return "expand_context" if self._decide_next_step(state) == "re_research" else END
+        return "research"  # expand_context
 
-            workflow.add_conditional_edges(
-                "verify",
-                self._decide_next_step,
-                {
-                    "re_research": "research",
-                    "end": END
-                }
-            )
-        else:
-            # Fast workflow - skip verification
-            workflow.add_node("research", self._research_step)
-            workflow.set_entry_point("research")
-            workflow.add_edge("research", END)
+    def _build_workflow(self):
+        workflow = StateGraph(AgentState)
+
+        for name, (func, afunc) in self._steps.items():
+            workflow.add_node(name, self._node(func, afunc))
+        workflow.set_entry_point(self._entry_node())
+        for name in self._steps:
+            targets = [target for target in self._SUCCESSORS[name] if target == END or target in self._steps]
+            workflow.add_conditional_edges(name, partial(self._next_node, name), targets)
 
         return workflow.compile()
 
+    @staticmethod
+    def _node(func, afunc):
+        """
+        Graph node that runs func under invoke() and afunc under ainvoke().
+        """
+        return RunnableLambda(func, afunc=afunc)
+
     # ---------------------------
     # Relevance Check Step
     # ---------------------------
     def _check_relevance_step(self, state: AgentState) -> Dict:
-        retriever = state["retriever"]
         question = state["question"]
 
         logger.info("Checking question relevance")
 
-        try:
-            classification = self.relevance_checker.check(
-                question=question,
-                retriever=retriever,
-                k=20
-            )
-        except Exception as e:
-            logger.error(f"Error in relevance checking: {e}")
-            return {
-                "is_relevant": False,
-                "draft_answer": "❌ An error occurred while checking relevance. Please try again."
-            }
+        with stage_span("relevance") as span:
+            try:
+                # Reuses the documents full_pipeline already retrieved
+                classification = self.relevance_checker.check(
+                    question=question,
+                    documents=state["documents"],
+                    k=RELEVANCE_TOP_K
+                )
+            except Exception as e:
+                logger.error(f"Error in relevance checking: {e}")
+                return {
+                    "is_relevant": False,
+                    "draft_answer": "❌ An error occurred while checking relevance. Please try again.",
+                    "spans": [span]
+                }
 
+        return {**self._relevance_result(classification), "spans": [span]}
+
+    async def _acheck_relevance_step(self, state: AgentState) -> Dict:
+        logger.info("Checking question relevance")
+
+        with stage_span("relevance") as span:
+            try:
+                classification = await self.relevance_checker.acheck(
+                    question=state["question"],
+                    documents=state["documents"],
+                    k=RELEVANCE_TOP_K
+                )
+            except Exception as e:
+                logger.error(f"Error in relevance checking: {e}")
+                return {
+                    "is_relevant": False,
+                    "draft_answer": "❌ An error occurred while checking relevance. Please try again.",
+                    "spans": [span]
+                }
+
+        return {**self._relevance_result(classification), "spans": [span]}
+
+    def _relevance_result(self, classification: str) -> Dict:
         if classification in ("CAN_ANSWER", "PARTIAL"):
             return {"is_relevant": True}
 
@@ -124,6 +216,69 @@ class AgentWorkflow:
             )
         }
 
+    # ---------------------------
+    # Speculative Relevance Check + Research
+    # ---------------------------
+    def _gate_decides(self, state: AgentState) -> bool:
+        """
+        Whether check() will classify without the LLM (no documents, or
+        conclusive retrieval scores). Nothing is worth speculating on then:
+        the check is instant and a NO_MATCH draft would be a wasted call.
+        """
+        documents = state["documents"]
+        return not documents or self.relevance_checker.gate(documents[:RELEVANCE_TOP_K]) is not None
+
+    @staticmethod
+    def _merge_results(relevance_result: Dict, research_result: Dict) -> Dict:
+        return {**relevance_result, **research_result, "spans": relevance_result["spans"] + research_result["spans"]}
+
+    def _speculative_step(self, state: AgentState) -> Dict:
+        """
+        Draft the answer on a pool thread while classifying relevance here.
+        The score gate runs first, so no draft is started for a question it
+        rejects. On an LLM NO_MATCH the draft is cancelled if it hasn't
+        started, otherwise left to finish in the background and discarded.
+        """
+        if self._gate_decides(state):
+            relevance_result = self._check_relevance_step(state)
+            if not relevance_result["is_relevant"]:
+                return relevance_result
+            return self._merge_results(relevance_result, self._research_step(state))
+
+        research = self._speculation_pool.submit(self._research_step, state)
+        relevance_result = self._check_relevance_step(state)
+
+        if not relevance_result["is_relevant"]:
+            logger.info("Relevance check failed → discarding speculative draft")
+            research.cancel()
+            return relevance_result
+        return self._merge_results(relevance_result, research.result())
+
+    async def _aspeculative_step(self, state: AgentState) -> Dict:
+        """
+        Run the relevance check and the draft concurrently, cancelling the
+        in-flight research request as soon as the check returns NO_MATCH.
+        Questions the score gate decides are checked before any draft starts.
+        """
+        if self._gate_decides(state):
+            relevance_result = await self._acheck_relevance_step(state)
+            if not relevance_result["is_relevant"]:
+                return relevance_result
+            return self._merge_results(relevance_result, await self._aresearch_step(state))
+
+        research = asyncio.create_task(self._aresearch_step(state))
+        try:
+            relevance_result = await self._acheck_relevance_step(state)
+        except BaseException:
+            research.cancel()
+            raise
+
+        if not relevance_result["is_relevant"]:
+            logger.info("Relevance check failed → cancelling speculative research")
+            research.cancel()
+            return relevance_result
+        return self._merge_results(relevance_result, await research)
+
     def _decide_after_relevance_check(self, state: AgentState) -> str:
         decision = "relevant" if state["is_relevant"] else "irrelevant"
         logger.info(f"Relevance decision: {decision}")
@@ -132,47 +287,129 @@ class AgentWorkflow:
     # ---------------------------
     # Public Pipeline Entry
     # ---------------------------
-    def full_pipeline(self, question: str, retriever: Any) -> Dict[str, str]:
-        try:
-            logger.info(f"Starting workflow for question: {question}")
+    def _query_embedding(self, question: str, retriever: Any):
+        """
+        Query embedding for semantic answer-cache lookups, if the retriever provides one.
 
-            # Use invoke() to retrieve documents
+        Returns:
+            (embedding or None, [] or the "query_embedding" span when one was computed)
+        """
+        if not (self.answer_cache and self.answer_cache.semantic and hasattr(retriever, "embed_query")):
+            return None, []
+        with stage_span("query_embedding") as span:
             try:
-                documents = retriever.invoke(question)
+                embedding = retriever.embed_query(question)
             except Exception as e:
-                logger.error(f"Error retrieving documents: {e}")
-                return {
+                logger.warning(f"Could not embed question for answer cache lookup: {e}")
+                embedding = None
+        return embedding, [span]
+
+    def _retrieval_depth(self) -> int:
+        if self.enable_verification:
+            # Includes the documents a retry may add to the context
+            return max(TOP_K, RELEVANCE_TOP_K) + MAX_RESEARCH_RETRIES * RETRY_EXPAND_K
+        return TOP_K
+
+    def _initial_state(self, question: str, documents: List[Document], retriever: Any, spans: List[StageSpan]) -> AgentState:
+        return {
+            "question": question,
+            "documents": documents,
+            "draft_answer": "",
+            "verification_report": "⚡ Verification disabled for faster responses" if not self.enable_verification else "",
+            "is_relevant": True,  # Skip check if verification disabled
+            "retriever": retriever,
+            "iteration_count": 0,
+            "enable_verification": self.enable_verification,
+            "verification": {},
+            "context_k": TOP_K,
+            "retry_count": 0,
+            "retry_seconds": 0.0,
+            "retry_started": 0.0,
+            "spans": spans
+        }
+
+    def _cache_result(self, question: str, result: Dict[str, str], embedding, index_version):
+        # Error answers are not cached so the next attempt retries
+        if self.answer_cache is not None and not result["draft_answer"].startswith("❌"):
+            self.answer_cache.put(question, self.enable_verification, result, embedding, index_version)
+
+    def _finish(self, result: Dict, spans: List[StageSpan], started: float) -> Dict:
+        """
+        Attach the stage spans to a result and record the run in the metrics registry.
+        """
+        mode = "verified" if self.enable_verification else "fast"
+        metrics_registry.observe_pipeline(mode, spans, time.perf_counter() - started)
+        return {**result, "spans": spans}
+
+    def _cached_answer(self, question: str, embedding, index_version):
+        """
+        Look the question up in the answer cache.
+
+        Returns:
+            (cached result or None, "answer_cache" span)
+        """
+        with stage_span("answer_cache") as span:
+            cached = self.answer_cache.get(question, self.enable_verification, embedding, index_version)
+        return cached, span
+
+    def full_pipeline(self, question: str, retriever: Any) -> Dict[str, str]:
+        """
+        Answer a question.
+
+        Returns:
+            Dict with draft_answer, verification_report, retry_count,
+            retry_seconds and spans (one StageSpan per stage run)
+        """
+        try:
+            logger.info(f"Starting workflow for question: {question}")
+            started = time.perf_counter()
+
+            embedding, embedding_spans = self._query_embedding(question, retriever)
+            index_version = None
+            if self.answer_cache is not None:
+                index_version = self.answer_cache.current_version()
+                cached, cache_span = self._cached_answer(question, embedding, index_version)
+                if cached is not None:
+                    logger.info("Answer served from cache")
+                    return self._finish(cached, embedding_spans + [cache_span], started)
+
+            # One retrieval per question, deep enough for both the
+            # relevance check and the research context
+            with stage_span("retrieval") as retrieval_span:
+                try:
+                    documents = retriever.invoke(question, k=self._retrieval_depth())
+                except Exception as e:
+                    logger.error(f"Error retrieving documents: {e}")
+                    documents = None
+            if documents is None:
+                return self._finish({
                     "draft_answer": "❌ An error occurred while retrieving documents. Please ensure PDFs are properly indexed.",
                     "verification_report": ""
-                }
+                }, embedding_spans + [retrieval_span], started)
 
             logger.info(f"Retrieved {len(documents)} documents")
 
-            initial_state: AgentState = {
-                "question": question,
-                "documents": documents,
-                "draft_answer": "",
-                "verification_report": "⚡ Verification disabled for faster responses" if not self.enable_verification else "",
-                "is_relevant": True,  # Skip check if verification disabled
-                "retriever": retriever,
-                "iteration_count": 0,
-                "enable_verification": self.enable_verification
-            }
+            initial_state = self._initial_state(question, documents, retriever, embedding_spans + [retrieval_span])
 
             try:
                 final_state = self.compiled_workflow.invoke(initial_state)
             except Exception as e:
                 logger.error(f"Error in workflow execution: {e}")
-                return {
+                return self._finish({
                     "draft_answer": "❌ An error occurred during the workflow execution. Please try again.",
                     "verification_report": ""
-                }
+                }, embedding_spans + [retrieval_span], started)
 
-            return {
+            result = {
                 "draft_answer": final_state.get("draft_answer", ""),
-                "verification_report": final_state.get("verification_report", "")
+                "verification_report": final_state.get("verification_report", ""),
+                "retry_count": final_state.get("retry_count", 0),
+                "retry_seconds": final_state.get("retry_seconds", 0.0)
             }
 
+            self._cache_result(question, result, embedding, index_version)
+            return self._finish(result, final_state.get("spans", []), started)
+
         except Exception as e:
             logger.exception("❌ Workflow execution failed")
             return {
@@ -180,23 +417,245 @@ class AgentWorkflow:
                 "verification_report": ""
             }
 
+    async def afull_pipeline(self, question: str, retriever: Any) -> Dict[str, str]:
+        """
+        Async counterpart of full_pipeline(). Retrieval runs in a worker
+        thread and every LLM call is awaited, so one event loop can keep
+        many questions in flight.
+        """
+        try:
+            logger.info(f"Starting async workflow for question: {question}")
+            started = time.perf_counter()
+
+            embedding, embedding_spans = None, []
+            if self.answer_cache is not None and self.answer_cache.semantic:
+                embedding, embedding_spans = await asyncio.to_thread(self._query_embedding, question, retriever)
+            index_version = None
+            if self.answer_cache is not None:
+                index_version = self.answer_cache.current_version()
+                cached, cache_span = self._cached_answer(question, embedding, index_version)
+                if cached is not None:
+                    logger.info("Answer served from cache")
+                    return self._finish(cached, embedding_spans + [cache_span], started)
+
+            with stage_span("retrieval") as retrieval_span:
+                try:
+                    documents = await asyncio.to_thread(retriever.invoke, question, k=self._retrieval_depth())
+                except Exception as e:
+                    logger.error(f"Error retrieving documents: {e}")
+                    documents = None
+            if documents is None:
+                return self._finish({
+                    "draft_answer": "❌ An error occurred while retrieving documents. Please ensure PDFs are properly indexed.",
+                    "verification_report": ""
+                }, embedding_spans + [retrieval_span], started)
+
+            logger.info(f"Retrieved {len(documents)} documents")
+
+            try:
+                final_state = await self.compiled_workflow.ainvoke(
+                    self._initial_state(question, documents, retriever, embedding_spans + [retrieval_span])
+                )
+            except Exception as e:
+                logger.error(f"Error in workflow execution: {e}")
+                return self._finish({
+                    "draft_answer": "❌ An error occurred during the workflow execution. Please try again.",
+                    "verification_report": ""
+                }, embedding_spans + [retrieval_span], started)
+
+            result = {
+                "draft_answer": final_state.get("draft_answer", ""),
+                "verification_report": final_state.get("verification_report", ""),
+                "retry_count": final_state.get("retry_count", 0),
+                "retry_seconds": final_state.get("retry_seconds", 0.0)
+            }
+            self._cache_result(question, result, embedding, index_version)
+            return self._finish(result, final_state.get("spans", []), started)
+
+        except Exception as e:
+            logger.exception("❌ Async workflow execution failed")
+            return {
+                "draft_answer": f"❌ An unexpected error occurred: {str(e)}",
+                "verification_report": ""
+            }
+
+    def stream_pipeline(self, question: str, retriever: Any) -> Iterator[Dict[str, str]]:
+        """
+        Run the pipeline, streaming the research answer as it is generated.
+
+        Yields event dicts:
+            {"type": "token", "content": str}   next chunk of the draft answer
+            {"type": "answer", "content": str}  full draft answer replacing the
+                                                streamed one (after a re-research)
+            {"type": "result", "draft_answer": str, "verification_report": str,
+             "spans": List[StageSpan]}       always last
+
+        Nodes run in the compiled graph's order (see _next_node()), with the
+        first research draft streamed; no token is sent before the relevance
+        check passes. Verification runs once generation completes.
+        """
+        started = time.perf_counter()
+
+        def finish(draft_answer: str, verification_report: str = "", spans: List[StageSpan] = ()):
+            result = {"draft_answer": draft_answer, "verification_report": verification_report}
+            return {"type": "result", **self._finish(result, list(spans), started)}
+
+        try:
+            logger.info(f"Starting streaming workflow for question: {question}")
+
+            embedding, embedding_spans = self._query_embedding(question, retriever)
+            index_version = None
+            if self.answer_cache is not None:
+                index_version = self.answer_cache.current_version()
+                cached, cache_span = self._cached_answer(question, embedding, index_version)
+                if cached is not None:
+                    logger.info("Answer served from cache")
+                    yield {"type": "token", "content": cached["draft_answer"]}
+                    yield finish(cached["draft_answer"], cached["verification_report"], embedding_spans + [cache_span])
+                    return
+
+            with stage_span("retrieval") as retrieval_span:
+                try:
+                    documents = retriever.invoke(question, k=self._retrieval_depth())
+                except Exception as e:
+                    logger.error(f"Error retrieving documents: {e}")
+                    documents = None
+            if documents is None:
+                message = "❌ An error occurred while retrieving documents. Please ensure PDFs are properly indexed."
+                yield {"type": "token", "content": message}
+                yield finish(message, spans=embedding_spans + [retrieval_span])
+                return
+
+            logger.info(f"Retrieved {len(documents)} documents")
+            state = self._initial_state(question, documents, retriever, embedding_spans + [retrieval_span])
+
+            # Same routing as the compiled graph; only the first draft is streamed
+            node = self._entry_node()
+            streamed = False
+            while node != END:
+                if node in ("research", "check_and_research") and not streamed:
+                    streamed = True
+                    yield from self._stream_research_step(state, speculative=node == "check_and_research")
+                else:
+                    self._apply(state, self._steps[node][0](state))
+                    if node == "research":
+                        yield {"type": "answer", "content": state["draft_answer"]}
+                node = self._next_node(node, state)
+
+            if not state["is_relevant"]:
+                yield {"type": "token", "content": state["draft_answer"]}
+
+            result = {
+                "draft_answer": state["draft_answer"],
+                "verification_report": state["verification_report"]
+            }
+            self._cache_result(question, result, embedding, index_version)
+            yield {**finish(**result, spans=state["spans"]), "retry_count": state["retry_count"], "retry_seconds": state["retry_seconds"]}
+
+        except Exception as e:
+            logger.exception("❌ Streaming workflow execution failed")
+            message = f"❌ An unexpected error occurred: {str(e)}"
+            yield {"type": "answer", "content": message}
+            yield finish(message)
+
+    @staticmethod
+    def _apply(state: AgentState, update: Dict):
+        """
+        state.update() that appends spans like the graph's reducer does.
+        """
+        spans = state["spans"] + update.get("spans", [])
+        state.update(update)
+        state["spans"] = spans
+
+    def _stream_research_step(self, state: AgentState, speculative: bool) -> Iterator[Dict[str, str]]:
+        """
+        The research step of stream_pipeline(): yields the draft as token
+        events and applies the step's update to state.
+
+        With speculative, the relevance check runs on the speculation pool
+        meanwhile and tokens are held back until it passes. On NO_MATCH the
+        draft is dropped and state keeps the relevance result. Questions the
+        score gate decides are checked first and never start a draft. The
+        "research" span includes the time the consumer spends between tokens.
+        """
+        relevance = None
+        if speculative:
+            if self._gate_decides(state):
+                self._apply(state, self._check_relevance_step(state))
+                if not state["is_relevant"]:
+                    return
+            else:
+                relevance = self._speculation_pool.submit(self._check_relevance_step, state)
+
+        logger.info("Streaming research agent")
+        tokens = []
+        flushed = 0
+        with stage_span("research") as span:
+            stream = self.researcher.stream(state["question"], state["documents"][:state["context_k"]])
+            for token in stream:
+                tokens.append(token)
+                if relevance is not None:
+                    if not relevance.done():
+                        continue
+                    self._apply(state, relevance.result())
+                    relevance = None
+                    if not state["is_relevant"]:
+                        stream.close()
+                        break
+                for buffered in tokens[flushed:]:
+                    yield {"type": "token", "content": buffered}
+                flushed = len(tokens)
+
+        if relevance is not None:
+            self._apply(state, relevance.result())
+        # Recorded even when the speculative draft is discarded
+        self._apply(state, {"spans": [span]})
+        if not state["is_relevant"]:
+            return
+        for buffered in tokens[flushed:]:
+            yield {"type": "token", "content": buffered}
+        self._apply(state, self._research_result(state, {"draft_answer": "".join(tokens).strip()}))
+
     # ---------------------------
     # Research Step
     # ---------------------------
     def _research_step(self, state: AgentState) -> Dict:
         logger.info("Running research agent")
 
-        try:
-            result = self.researcher.generate(
-                question=state["question"],
-                documents=state["documents"]
-            )
-        except Exception as e:
-            logger.error(f"Error in research step: {e}")
-            return {
-                "draft_answer": "❌ An error occurred while generating the answer."
-            }
+        with stage_span("research") as span:
+            try:
+                result = self.researcher.generate(
+                    question=state["question"],
+                    documents=state["documents"][:state["context_k"]]
+                )
+            except Exception as e:
+                logger.error(f"Error in research step: {e}")
+                return {
+                    "draft_answer": "❌ An error occurred while generating the answer.",
+                    "spans": [span]
+                }
+
+        return {**self._research_result(state, result), "spans": [span]}
 
+    async def _aresearch_step(self, state: AgentState) -> Dict:
+        logger.info("Running research agent")
+
+        with stage_span("research") as span:
+            try:
+                result = await self.researcher.agenerate(
+                    question=state["question"],
+                    documents=state["documents"][:state["context_k"]]
+                )
+            except Exception as e:
+                logger.error(f"Error in research step: {e}")
+                return {
+                    "draft_answer": "❌ An error occurred while generating the answer.",
+                    "spans": [span]
+                }
+
+        return {**self._research_result(state, result), "spans": [span]}
+
+    def _research_result(self, state: AgentState, result: Dict) -> Dict:
         # Increment iteration count
         iteration_count = state.get("iteration_count", 0) + 1
 
@@ -211,37 +670,79 @@ class AgentWorkflow:
     def _verification_step(self, state: AgentState) -> Dict:
         logger.info("Running verification agent")
 
-        try:
-            result = self.verifier.check(
-                answer=state["draft_answer"],
-                documents=state["documents"]
-            )
-        except Exception as e:
-            logger.error(f"Error in verification step: {e}")
-            return {
-                "verification_report": "❌ An error occurred during verification."
-            }
+        with stage_span("verification") as span:
+            try:
+                result = self.verifier.check(
+                    answer=state["draft_answer"],
+                    documents=state["documents"][:state["context_k"]]
+                )
+            except Exception as e:
+                logger.error(f"Error in verification step: {e}")
+                result = {"verification_report": "❌ An error occurred during verification."}
+
+        return {**self._verification_result(state, result), "spans": [span]}
+
+    async def _averification_step(self, state: AgentState) -> Dict:
+        logger.info("Running verification agent")
+
+        with stage_span("verification") as span:
+            try:
+                result = await self.verifier.acheck(
+                    answer=state["draft_answer"],
+                    documents=state["documents"][:state["context_k"]]
+                )
+            except Exception as e:
+                logger.error(f"Error in verification step: {e}")
+                result = {"verification_report": "❌ An error occurred during verification."}
+
+        return {**self._verification_result(state, result), "spans": [span]}
+
+    def _verification_result(self, state: AgentState, result: Dict) -> Dict:
+        update = {
+            "verification_report": result.get("verification_report", ""),
+            "verification": result.get("verification", {})
+        }
+        # Verification closes a retry round
+        if state.get("retry_count", 0) > 0:
+            elapsed = time.perf_counter() - state["retry_started"]
+            update["retry_seconds"] = state.get("retry_seconds", 0.0) + elapsed
+            logger.info(f"Retry {state['retry_count']} took {elapsed:.2f}s")
+        return update
 
+    # ---------------------------
+    # Retry With Expanded Context
+    # ---------------------------
+    def _expand_context_step(self, state: AgentState) -> Dict:
+        """
+        Widen the research context with the next RETRY_EXPAND_K retrieved
+        documents, so the retry sees evidence the failed draft didn't.
+        """
+        context_k = min(state["context_k"] + RETRY_EXPAND_K, len(state["documents"]))
+        logger.info(f"Expanding research context from {state['context_k']} to {context_k} documents")
         return {
-            "verification_report": result.get("verification_report", "")
+            "context_k": context_k,
+            "retry_count": state.get("retry_count", 0) + 1,
+            "retry_started": time.perf_counter()
         }
 
     # ---------------------------
     # Decide Loop or End
     # ---------------------------
     def _decide_next_step(self, state: AgentState) -> str:
-        report = state.get("verification_report", "")
-        iteration_count = state.get("iteration_count", 0)
-        
-        # Prevent infinite loops - max 2 iterations
-        if iteration_count >= 2:
-            logger.info("Maximum iterations reached → ending workflow")
+        verification = state.get("verification") or {}
+
+        if verification.get("Supported", "NO") != "NO" and verification.get("Relevant", "NO") != "NO":
+            logger.info("Verification successful → ending workflow")
             return "end"
 
-        # Check if verification failed
-        if "Supported: NO" in report or "Relevant: NO" in report:
-            logger.info("Verification failed → re-running research")
-            return "re_research"
+        if state.get("retry_count", 0) >= MAX_RESEARCH_RETRIES:
+            logger.info("Maximum retries reached → ending workflow")
+            return "end"
+
+        # Re-running research on the same documents would repeat the same answer
+        if len(state["documents"]) <= state["context_k"]:
+            logger.info("Verification failed but no further documents are available → ending workflow")
+            return "end"
 
-        logger.info("Verification successful → ending workflow")
-        return "end"
\ No newline at end of file
+        logger.info("Verification failed → re-running research with more context")
+        return "re_research"
\ No newline at end of file
@@ -0,0 +1,368 @@
+import os
+import json
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_META_FILE = "meta.json"
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize rows so inner product equals cosine similarity.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _save_array(path: str, array: np.ndarray):
+    """
+    Write via a temporary file and rename, so processes that memory-map
+    the previous version keep reading a consistent file.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Positions of the top_k highest scores, best first.
+    """
+    if len(scores) > top_k:
+        positions = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        positions = np.arange(len(scores))
+    return positions[np.argsort(-scores[positions], kind="stable")]
+
+
+# ---------------------------
+# Exact Search
+# ---------------------------
+class ExactIndex:
+    """
+    Brute-force inner product search over the full matrix.
+    Used for small corpora where an ANN structure isn't worth it.
+    """
+
+    backend = "exact"
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, **params) -> "ExactIndex":
+        return cls(vectors)
+
+    def add(self, vectors: np.ndarray, first_row: int) -> "ExactIndex":
+        return ExactIndex(vectors)
+
+    def search(self, query: np.ndarray, top_k: int, exclude: np.ndarray = None):
+        """
+        Args:
+            query: Normalized query embedding
+            top_k: Number of rows to return
+            exclude: Optional boolean mask of rows to skip (deleted rows)
+
+        Returns:
+            (rows, scores) arrays sorted best first
+        """
+        scores = np.asarray(self.vectors @ query, dtype=np.float32)
+        if exclude is not None:
+            scores[exclude] = -np.inf
+            top_k = min(top_k, int((~exclude).sum()))
+        positions = _top_k(scores, top_k)
+        return positions, scores[positions]
+
+    def params(self) -> dict:
+        return {}
+
+    def save(self, path: str):
+        pass
+
+    @classmethod
+    def load(cls, path: str, vectors: np.ndarray, **params) -> "ExactIndex":
+        return cls(vectors)
+
+
+# ---------------------------
+# IVF (NumPy)
+# ---------------------------
+class IVFIndex:
+    """
+    Inverted file index: vectors are clustered with spherical k-means and
+    a query only scans the nprobe clusters whose centroids are closest.
+    Lists are stored in CSR layout (list_offsets, list_rows).
+    """
+
+    backend = "ivf"
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        centroids: np.ndarray,
+        list_offsets: np.ndarray,
+        list_rows: np.ndarray,
+        nprobe: int = 16,
+        built_rows: int = None
+    ):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.nprobe = nprobe
+        # Rows the centroids were trained on, used to decide when to retrain
+        self.built_rows = built_rows if built_rows is not None else len(list_rows)
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+            assignments[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+        return assignments
+
+    @staticmethod
+    def _lists(assignments: np.ndarray, nlist: int):
+        list_rows = np.argsort(assignments, kind="stable").astype(np.int64)
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=nlist), out=list_offsets[1:])
+        return list_offsets, list_rows
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        nlist: int = None,
+        nprobe: int = 16,
+        train_iters: int = 10,
+        seed: int = 0,
+        **params
+    ) -> "IVFIndex":
+        n = len(vectors)
+        nlist = min(nlist or max(1, int(4 * np.sqrt(n))), n)
+        rng = np.random.default_rng(seed)
+
+        # Train centroids on a sample, the full corpus isn't needed for good clusters
+        sample_size = min(n, nlist * 64)
+        sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(train_iters):
+            assignments = cls._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            counts = np.bincount(assignments, minlength=nlist)
+
+            # Re-seed empty clusters from random sample points
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                sums[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+            centroids = normalize(sums)
+
+        list_offsets, list_rows = cls._lists(cls._assign(vectors, centroids), nlist)
+        logger.info(f"Built IVF index with {nlist} lists over {n} vectors")
+        return cls(vectors, centroids, list_offsets, list_rows, nprobe=nprobe, built_rows=n)
+
+    def add(self, vectors: np.ndarray, first_row: int) -> "IVFIndex":
+        """
+        Assign new rows to their nearest existing centroid.
+        vectors must be the full matrix including the new rows.
+        """
+        old_assignments = np.empty(len(self.list_rows), dtype=np.int32)
+        old_assignments[self.list_rows] = np.repeat(
+            np.arange(len(self.centroids), dtype=np.int32),
+            np.diff(self.list_offsets)
+        )
+        new_assignments = self._assign(vectors[first_row:], self.centroids)
+        list_offsets, list_rows = self._lists(
+            np.concatenate([old_assignments, new_assignments]),
+            len(self.centroids)
+        )
+        return IVFIndex(
+            vectors,
+            self.centroids,
+            list_offsets,
+            list_rows,
+            nprobe=self.nprobe,
+            built_rows=self.built_rows
+        )
+
+    def search(self, query: np.ndarray, top_k: int, exclude: np.ndarray = None):
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = _top_k(self.centroids @ query, nprobe)
+        rows = np.concatenate([
+            self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]]
+            for c in probes
+        ])
+        if exclude is not None:
+            rows = rows[~exclude[rows]]
+        if len(rows) == 0:
+            return rows, np.zeros(0, dtype=np.float32)
+
+        rows.sort()  # Sequential access into the matrix
+        scores = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+        positions = _top_k(scores, top_k)
+        return rows[positions], scores[positions]
+
+    def params(self) -> dict:
+        return {"nlist": len(self.centroids), "nprobe": self.nprobe, "built_rows": self.built_rows}
+
+    def save(self, path: str):
+        _save_array(os.path.join(path, "ivf_centroids.npy"), self.centroids)
+        _save_array(os.path.join(path, "ivf_list_offsets.npy"), np.asarray(self.list_offsets))
+        _save_array(os.path.join(path, "ivf_list_rows.npy"), np.asarray(self.list_rows))
+
+    @classmethod
+    def load(cls, path: str, vectors: np.ndarray, nprobe: int = 16, built_rows: int = None, **params) -> "IVFIndex":
+        return cls(
+            vectors,
+            np.load(os.path.join(path, "ivf_centroids.npy")),
+            np.load(os.path.join(path, "ivf_list_offsets.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "ivf_list_rows.npy"), mmap_mode="r"),
+            nprobe=nprobe,
+            built_rows=built_rows
+        )
+
+
+# ---------------------------
+# HNSW (hnswlib, optional)
+# ---------------------------
+def _import_hnswlib():
+    try:
+        import hnswlib
+    except ImportError as e:
+        raise ImportError(
+            "ANN_BACKEND='hnsw' requires hnswlib. Install it with `pip install hnswlib` "
+            "or use the 'ivf' backend."
+        ) from e
+    return hnswlib
+
+
+class HNSWIndex:
+    """
+    Hierarchical navigable small world graph backed by hnswlib.
+    """
+
+    backend = "hnsw"
+
+    def __init__(self, index, ef_search: int = 64):
+        self.index = index
+        self.ef_search = ef_search
+        # Set once: the index is searched from concurrent retrieval threads.
+        # hnswlib searches with max(ef, k), so larger k needs no change.
+        self.index.set_ef(ef_search)
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        m: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        **params
+    ) -> "HNSWIndex":
+        hnswlib = _import_hnswlib()
+        index = hnswlib.Index(space="ip", dim=vectors.shape[1])
+        index.init_index(max_elements=len(vectors), ef_construction=ef_construction, M=m)
+        index.add_items(np.asarray(vectors, dtype=np.float32), np.arange(len(vectors)))
+        logger.info(f"Built HNSW index over {len(vectors)} vectors")
+        return cls(index, ef_search=ef_search)
+
+    def add(self, vectors: np.ndarray, first_row: int) -> "HNSWIndex":
+        self.index.resize_index(len(vectors))
+        self.index.add_items(
+            np.asarray(vectors[first_row:], dtype=np.float32),
+            np.arange(first_row, len(vectors))
+        )
+        return self
+
+    def search(self, query: np.ndarray, top_k: int, exclude: np.ndarray = None):
+        count = self.index.get_current_count()
+        k = min(top_k, count)
+        while True:
+            if k == 0:
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+            labels, distances = self.index.knn_query(query, k=k)
+            # hnswlib's "ip" space returns 1 - inner product
+            rows, scores = labels[0].astype(np.int64), 1.0 - distances[0]
+            if exclude is None:
+                return rows, scores
+
+            # Over-fetch until enough live rows survive the tombstone filter
+            live = ~exclude[rows]
+            if live.sum() >= top_k or k >= count:
+                return rows[live][:top_k], scores[live][:top_k]
+            k = min(k * 2, count)
+
+    def params(self) -> dict:
+        return {"ef_search": self.ef_search}
+
+    def save(self, path: str):
+        tmp_path = os.path.join(path, "hnsw.bin.tmp")
+        self.index.save_index(tmp_path)
+        os.replace(tmp_path, os.path.join(path, "hnsw.bin"))
+
+    @classmethod
+    def load(cls, path: str, vectors: np.ndarray, ef_search: int = 64, **params) -> "HNSWIndex":
+        hnswlib = _import_hnswlib()
+        index = hnswlib.Index(space="ip", dim=vectors.shape[1])
+        index.load_index(os.path.join(path, "hnsw.bin"), max_elements=len(vectors))
+        return cls(index, ef_search=ef_search)
+
+
+BACKENDS = {
+    ExactIndex.backend: ExactIndex,
+    IVFIndex.backend: IVFIndex,
+    HNSWIndex.backend: HNSWIndex,
+}
+
+
+# ---------------------------
+# Factory / Persistence
+# ---------------------------
+def build_ann_index(vectors: np.ndarray, backend: str = "ivf", min_vectors: int = 0, **params):
+    """
+    Build a vector search index over normalized vectors.
+
+    Args:
+        vectors: (n, dim) matrix of L2-normalized embeddings
+        backend: "ivf", "hnsw" or "exact"
+        min_vectors: Corpora smaller than this use exact search
+        **params: Backend parameters (nlist, nprobe, m, ef_construction, ef_search)
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown ANN backend '{backend}'. Expected one of {sorted(BACKENDS)}")
+
+    if len(vectors) < max(min_vectors, 1):
+        backend = ExactIndex.backend
+
+    return BACKENDS[backend].build(vectors, **params)
+
+
+def save_ann_index(ann, path: str):
+    os.makedirs(path, exist_ok=True)
+    ann.save(path)
+    tmp_path = os.path.join(path, _META_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"backend": ann.backend, "params": ann.params()}, f)
+    os.replace(tmp_path, os.path.join(path, _META_FILE))
+
+
+def load_ann_index(path: str, vectors: np.ndarray, **params):
+    """
+    Load a saved index. Explicit params (e.g. nprobe, ef_search) override
+    the values saved at build time so recall/latency can be tuned without a rebuild.
+    """
+    with open(os.path.join(path, _META_FILE), encoding="utf-8") as f:
+        meta = json.load(f)
+    merged = {**meta.get("params", {}), **{k: v for k, v in params.items() if v is not None}}
+    return BACKENDS[meta["backend"]].load(path, vectors, **merged)
+
+
+def ann_index_exists(path: str) -> bool:
+    return os.path.exists(os.path.join(path, _META_FILE))
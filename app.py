@@ -2,9 +2,8 @@ import os
 import streamlit as st
 
 from ingest import ingest_pdfs
-from retriever import LlamaIndexHybridRetriever
-from agents.workflow import AgentWorkflow
-from config import UPLOAD_DIR, INDEX_DIR
+from resources import get_retriever, get_workflow
+from config import UPLOAD_DIR, INDEX_DIR, MAX_FILE_SIZE_MB
 
 # -------------------------
 # Streamlit Page Setup
@@ -33,20 +32,35 @@ with st.sidebar:
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
-if "retriever" not in st.session_state:
-    st.session_state.retriever = None
-
 if "files_indexed" not in st.session_state:
     st.session_state.files_indexed = False
 
 if "uploaded_file_names" not in st.session_state:
     st.session_state.uploaded_file_names = set()
 
+
+def show_timings(spans):
+    """
+    Per-stage timings and token usage of one answer.
+    """
+    total_tokens = sum(span["prompt_tokens"] + span["completion_tokens"] for span in spans)
+    with st.expander(f"⏱️ Timings ({sum(span['seconds'] for span in spans):.2f}s in stages, {total_tokens} tokens)", expanded=False):
+        st.table([
+            {
+                "Stage": span["stage"],
+                "Seconds": round(span["seconds"], 3),
+                "LLM calls": span["llm_calls"],
+                "Prompt tokens": span["prompt_tokens"],
+                "Completion tokens": span["completion_tokens"]
+            }
+            for span in spans
+        ])
+
 # -------------------------
 # PDF Upload Section
 # -------------------------
 st.markdown("### 📄 Upload Documents")
-st.info("💡 **Tip**: For large PDFs (>50MB or >200 pages), consider splitting them into smaller files for faster processing.")
+st.info("💡 **Tip**: Large PDFs are streamed page by page, so they take longer to index but don't need to be split.")
 
 uploaded_files = st.file_uploader(
     "Upload PDF documents",
@@ -78,8 +92,8 @@ if uploaded_files:
         # Individual file size warnings
         for file in uploaded_files:
             file_size_mb = file.size / (1024 * 1024)
-            if file_size_mb > 100:
-                st.warning(f"⚠️ {file.name} is very large ({file_size_mb:.1f} MB). Consider splitting it.")
+            if file_size_mb > MAX_FILE_SIZE_MB:
+                st.warning(f"⚠️ {file.name} is very large ({file_size_mb:.1f} MB). It will be indexed in page ranges.")
         
         # Add button to start indexing
         if st.button("📑 Index PDFs", type="primary", use_container_width=True):
@@ -100,10 +114,9 @@ if uploaded_files:
                 status_text.text(message)
             
             try:
+                # The shared retriever reloads itself once the index version changes
                 ingest_pdfs(progress_callback=update_progress)
                 
-                # Reset retriever cache after new upload
-                st.session_state.retriever = None
                 st.session_state.files_indexed = True
                 
                 progress_bar.empty()
@@ -113,7 +126,7 @@ if uploaded_files:
             except MemoryError:
                 progress_bar.empty()
                 status_text.empty()
-                st.error("❌ File too large! Try splitting the PDF into smaller parts (< 100 pages each).")
+                st.error("❌ Out of memory! Lower BATCH_SIZE or EMBED_WORKERS in config.py and try again.")
                 st.session_state.files_indexed = False
             except Exception as e:
                 progress_bar.empty()
@@ -144,6 +157,9 @@ for msg in st.session_state.chat_history:
                 with st.expander("🔍 Verification Report", expanded=False):
                     st.markdown(msg["verification"])
 
+            if msg.get("spans"):
+                show_timings(msg["spans"])
+
         # Old / fallback format
         elif msg.get("role") == "user":
             st.chat_message("user").write(msg.get("content", ""))
@@ -162,35 +178,45 @@ if question:
         st.warning("⚠️ Please upload and index PDFs first.")
         st.stop()
 
-    # Initialize retriever only once (cache in session state)
-    if st.session_state.retriever is None:
-        with st.spinner("Loading retriever..."):
-            st.session_state.retriever = LlamaIndexHybridRetriever()
-    
-    retriever = st.session_state.retriever
-    workflow = AgentWorkflow(enable_verification=enable_verification)
+    # Retriever and workflow are shared by every session in this process
+    with st.spinner("Loading retriever..."):
+        retriever = get_retriever()
+    workflow = get_workflow(enable_verification)
+
+    # Display current turn, streaming the answer as it is generated
+    st.chat_message("user").write(question)
 
-    # Show processing message
-    with st.spinner("🤔 Thinking..." if not enable_verification else "🤔 Thinking and verifying..."):
-        # 🔥 FIXED: Only pass question and retriever (2 arguments)
-        result = workflow.full_pipeline(
-            question,
-            retriever
-        )
+    result = {}
+
+    def answer_tokens():
+        for event in workflow.stream_pipeline(question, retriever):
+            if event["type"] == "token":
+                yield event["content"]
+            elif event["type"] == "result":
+                result.update(event)
+
+    with st.chat_message("assistant"):
+        answer_area = st.empty()
+        with answer_area.container():
+            streamed_answer = st.write_stream(answer_tokens())
+
+        # A re-research after failed verification replaces the streamed draft
+        if result.get("draft_answer") and result["draft_answer"] != streamed_answer:
+            answer_area.write(result["draft_answer"])
 
     # Save chat in NEW SAFE FORMAT
     st.session_state.chat_history.append({
         "user": question,
         "assistant": result.get("draft_answer", ""),
-        "verification": result.get("verification_report", "")
+        "verification": result.get("verification_report", ""),
+        "spans": result.get("spans", [])
     })
-
-    # Display current turn
-    st.chat_message("user").write(question)
-    st.chat_message("assistant").write(result.get("draft_answer", ""))
     
     # Display verification report if available
     verification_report = result.get("verification_report", "")
     if verification_report:
         with st.expander("🔍 Verification Report", expanded=False):
-            st.markdown(verification_report)
\ No newline at end of file
+            st.markdown(verification_report)
+
+    if result.get("spans"):
+        show_timings(result["spans"])
\ No newline at end of file
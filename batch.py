@@ -0,0 +1,125 @@
+import sys
+import json
+import time
+import asyncio
+import argparse
+import logging
+from typing import AsyncIterator, Dict, Iterable
+
+from resources import get_retriever, get_workflow
+from config import BATCH_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+
+def read_questions(lines: Iterable[str]) -> list:
+    """
+    Parse JSONL question records. Each line is an object with a "question"
+    and an optional "id" (the line number is used when it is missing).
+    Blank lines are skipped.
+
+    Raises:
+        ValueError: If a line is not valid JSON or has no question
+    """
+    records = []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_number}: invalid JSON ({e})")
+        if not isinstance(record, dict) or not record.get("question"):
+            raise ValueError(f"Line {line_number}: expected an object with a \"question\"")
+        record.setdefault("id", line_number)
+        records.append(record)
+    return records
+
+
+async def answer_batch(
+    records: list,
+    enable_verification: bool = False,
+    concurrency: int = BATCH_CONCURRENCY
+) -> AsyncIterator[Dict]:
+    """
+    Answer many questions concurrently, yielding results as they finish.
+
+    All queries are embedded in one batch up front. Each question then runs
+    through AgentWorkflow.afull_pipeline, with retrieval in worker threads
+    and at most `concurrency` questions (and so LLM calls) in flight.
+
+    Args:
+        records: Dicts with "id" and "question" (see read_questions)
+        enable_verification: Run the verification workflow
+        concurrency: Maximum questions in flight
+
+    Yields:
+        Dicts with id, question, draft_answer, verification_report,
+        retry_count, spans (per-stage timings), seconds (pipeline time)
+        and queued_seconds
+    """
+    retriever = get_retriever()
+    workflow = get_workflow(enable_verification)
+
+    started = time.perf_counter()
+    encoded = await asyncio.to_thread(retriever.warm_query_embeddings, [r["question"] for r in records])
+    logger.info(f"Embedded {encoded} queries in {time.perf_counter() - started:.2f}s")
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    submitted = time.perf_counter()
+
+    async def answer(record: Dict) -> Dict:
+        async with semaphore:
+            start = time.perf_counter()
+            result = await workflow.afull_pipeline(record["question"], retriever)
+            return {
+                "id": record["id"],
+                "question": record["question"],
+                "draft_answer": result.get("draft_answer", ""),
+                "verification_report": result.get("verification_report", ""),
+                "retry_count": result.get("retry_count", 0),
+                "spans": result.get("spans", []),
+                "seconds": round(time.perf_counter() - start, 3),
+                "queued_seconds": round(start - submitted, 3)
+            }
+
+    for task in asyncio.as_completed([answer(record) for record in records]):
+        yield await task
+
+
+async def _run(args) -> int:
+    with open(args.input, encoding="utf-8") as f:
+        records = read_questions(f)
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    started = time.perf_counter()
+    count = 0
+    try:
+        async for result in answer_batch(records, args.verify, args.concurrency):
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            count += 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Answered {count} questions in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.2f} questions/s)", file=sys.stderr)
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions against the current index.")
+    parser.add_argument("input", help="JSONL file, one {\"id\": ..., \"question\": ...} object per line")
+    parser.add_argument("-o", "--output", help="Write JSONL results here instead of stdout")
+    parser.add_argument("--verify", action="store_true", help="Run relevance checking and verification")
+    parser.add_argument(
+        "--concurrency", type=int, default=BATCH_CONCURRENCY,
+        help=f"Questions in flight at once (default {BATCH_CONCURRENCY})"
+    )
+    args = parser.parse_args(argv)
+    return asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
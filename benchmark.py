@@ -0,0 +1,275 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import logging
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Synthetic documents are drawn from a fixed vocabulary so every run with
+# the same seed produces the same PDFs, chunks and questions.
+_VOCABULARY = (
+    "retrieval embedding index vector query document passage answer model latency "
+    "throughput cache memory storage network cluster replica shard partition batch "
+    "stream pipeline worker thread process queue scheduler budget token prompt context "
+    "agent verification relevance ranking fusion score threshold benchmark baseline "
+    "regression profile metric histogram counter percentile sample request response "
+    "timeout retry backoff limit quota billing invoice contract policy security audit "
+    "compliance revenue forecast quarter growth customer product market strategy"
+).split()
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: list, line_chars: int = 90):
+    """
+    Write a minimal text-only PDF with one page per string in pages.
+
+    Args:
+        path: Output file
+        pages: Page texts, wrapped at line_chars characters
+        line_chars: Characters per line
+    """
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        lines = [text[i:i + line_chars] for i in range(0, len(text), line_chars)]
+        content = "BT /F1 9 Tf 36 806 Td 11 TL " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        content = content.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % k for k in kids) + b"] /Count %d >>" % len(kids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def generate_corpus(directory: str, documents: int, pages: int, words_per_page: int, seed: int = 0) -> dict:
+    """
+    Write `documents` synthetic PDFs of `pages` pages each into directory.
+
+    Returns:
+        Dict with the corpus shape and total size in bytes
+    """
+    rng = random.Random(seed)
+    total_bytes = 0
+    for d in range(documents):
+        texts = []
+        for _ in range(pages):
+            words = []
+            while len(words) < words_per_page:
+                sentence = rng.choices(_VOCABULARY, k=rng.randint(8, 16))
+                words.extend(sentence[:-1] + [sentence[-1] + "."])
+            texts.append(" ".join(words[:words_per_page]))
+        path = os.path.join(directory, f"synthetic_{d:04d}.pdf")
+        write_pdf(path, texts)
+        total_bytes += os.path.getsize(path)
+    return {
+        "documents": documents,
+        "pages_per_document": pages,
+        "words_per_page": words_per_page,
+        "bytes": total_bytes
+    }
+
+
+def generate_questions(count: int, seed: int = 0) -> list:
+    """
+    Distinct questions over the corpus vocabulary. Each is unique so no
+    measurement is served from the query embedding or answer caches.
+    """
+    rng = random.Random(seed + 1)
+    return [
+        f"What does the document say about {' and '.join(rng.sample(_VOCABULARY, 2))} ({i})?"
+        for i in range(count)
+    ]
+
+
+def peak_rss_mb() -> dict:
+    """
+    Peak resident set size so far of this process and of its largest
+    finished child process (PDF parser and embedding workers).
+    """
+    if resource is None:
+        return {"self": None, "children": None}
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit, 1)
+    }
+
+
+def summarize(latencies: list, elapsed: float) -> dict:
+    """
+    Latency percentiles in milliseconds and throughput per second.
+    Latency fields are None when nothing was timed (e.g. every run was warmup).
+    """
+    import numpy as np
+
+    values = np.asarray(latencies, dtype=np.float64) * 1000
+
+    def stat(fn):
+        return round(float(fn(values)), 2) if len(values) else None
+
+    return {
+        "count": len(latencies),
+        "p50_ms": stat(lambda v: np.percentile(v, 50)),
+        "p95_ms": stat(lambda v: np.percentile(v, 95)),
+        "p99_ms": stat(lambda v: np.percentile(v, 99)),
+        "mean_ms": stat(np.mean),
+        "max_ms": stat(np.max),
+        "throughput_per_s": round(len(latencies) / max(elapsed, 1e-9), 2),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def _timed(fn, items: list, warmup: int) -> dict:
+    for item in items[:warmup]:
+        fn(item)
+    latencies = []
+    started = time.perf_counter()
+    for item in items[warmup:]:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def run_benchmark(args) -> dict:
+    """
+    Generate the corpus, ingest it and time retrieval and both workflow modes.
+
+    Must run with RAG_DATA_DIR and LLM_BACKEND already set in the
+    environment, since config reads them at import time.
+    """
+    # Imported here so config sees the benchmark's environment
+    import config
+    from ingest import ingest_pdfs
+    from resources import get_retriever, get_workflow
+
+    corpus = generate_corpus(config.UPLOAD_DIR, args.documents, args.pages, args.words_per_page, args.seed)
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "embed_model": config.EMBED_MODEL,
+            "llm_backend": config.LLM_BACKEND,
+            "llm_fake_latency": config.LLM_FAKE_LATENCY,
+            "chunk_size": config.CHUNK_SIZE,
+            "top_k": config.TOP_K,
+            "ann_backend": config.ANN_BACKEND,
+            "rerank_enabled": config.RERANK_ENABLED
+        },
+        "corpus": corpus
+    }
+
+    print(f"Ingesting {corpus['documents']} PDF(s) x {corpus['pages_per_document']} pages...")
+    started = time.perf_counter()
+    summary = ingest_pdfs()
+    ingest_seconds = time.perf_counter() - started
+    total_pages = corpus["documents"] * corpus["pages_per_document"]
+    results["ingest"] = {
+        "seconds": round(ingest_seconds, 3),
+        "pages_per_s": round(total_pages / max(ingest_seconds, 1e-9), 2),
+        "mb_per_s": round(corpus["bytes"] / 1e6 / max(ingest_seconds, 1e-9), 3),
+        "chunks_per_s": round(summary["chunks_per_second"] or 0, 2),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+    retriever = get_retriever()
+    questions = generate_questions(args.warmup + args.queries, args.seed)
+    print(f"Timing {args.queries} retrievals...")
+    results["retrieval"] = _timed(retriever.invoke, questions, args.warmup)
+
+    results["pipeline"] = {}
+    for mode, enable_verification in (("fast", False), ("verified", True)):
+        workflow = get_workflow(enable_verification)
+        # Fresh questions per mode so neither reuses the other's caches
+        mode_questions = generate_questions(args.warmup + args.pipeline_queries, args.seed + 100 * (1 + enable_verification))
+        print(f"Timing {args.pipeline_queries} full_pipeline runs ({mode})...")
+        results["pipeline"][mode] = _timed(
+            lambda question: workflow.full_pipeline(question, retriever),
+            mode_questions,
+            args.warmup
+        )
+    return results
+
+
+def _print_summary(results: dict):
+    ingest = results["ingest"]
+    print(f"\nIngest: {ingest['seconds']}s, {ingest['pages_per_s']} pages/s, {ingest['chunks_per_s']} chunks/s")
+    rows = [("retrieval", results["retrieval"])] + [(f"pipeline {m}", r) for m, r in results["pipeline"].items()]
+    print(f"{'stage':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'per s':>10}")
+    for name, row in rows:
+        p50, p95, p99 = ("-" if row[key] is None else row[key] for key in ("p50_ms", "p95_ms", "p99_ms"))
+        print(f"{name:<20}{p50:>10}{p95:>10}{p99:>10}{row['throughput_per_s']:>10}")
+    print(f"Peak RSS: {peak_rss_mb()}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark ingestion, retrieval and full_pipeline on synthetic PDFs with a fake LLM."
+    )
+    parser.add_argument("--documents", type=int, default=4, help="Synthetic PDFs to ingest")
+    parser.add_argument("--pages", type=int, default=25, help="Pages per PDF")
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--queries", type=int, default=200, help="Timed retrievals")
+    parser.add_argument("--pipeline-queries", type=int, default=50, help="Timed full_pipeline runs per mode")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed runs before each measurement")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per fake LLM call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--keep-data", action="store_true", help="Keep the temporary index directory")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    data_dir = tempfile.mkdtemp(prefix="rag-benchmark-")
+    os.environ["RAG_DATA_DIR"] = data_dir
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["LLM_FAKE_LATENCY"] = str(args.llm_latency)
+    try:
+        results = run_benchmark(args)
+    finally:
+        if args.keep_data:
+            print(f"Benchmark data kept in {data_dir}")
+        else:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    results["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    _print_summary(results)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
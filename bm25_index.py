@@ -0,0 +1,323 @@
+import os
+import re
+import json
+import logging
+import numpy as np
+import Stemmer
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+# Small English stopword list, applied before stemming
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been
+before being below between both but by can did do does doing down during each
+few for from further had has have having he her here hers herself him himself
+his how i if in into is it its itself just me more most my myself no nor not
+now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what
+when where which while who whom why will with you your yours yourself
+yourselves
+""".split())
+
+_ARRAY_FILES = ("vocab", "node_ids", "term_offsets", "postings_docs", "postings_tfs", "doc_lengths", "idf")
+_META_FILE = "meta.json"
+
+
+class BM25Index:
+    """
+    Compact BM25 inverted index backed by NumPy arrays.
+
+    Postings are stored in CSR layout: the documents containing term t are
+    postings_docs[term_offsets[t]:term_offsets[t + 1]] with matching term
+    frequencies in postings_tfs. Term IDs are positions in the sorted vocab
+    array, found with a binary search. Every array, vocab and node IDs
+    included, is saved as its own .npy file so loading memory-maps them
+    instead of re-tokenizing the corpus or parsing per-term data.
+    """
+
+    def __init__(
+        self,
+        vocab: np.ndarray,
+        node_ids: np.ndarray,
+        term_offsets: np.ndarray,
+        postings_docs: np.ndarray,
+        postings_tfs: np.ndarray,
+        doc_lengths: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+        idf: np.ndarray = None
+    ):
+        self.vocab = vocab
+        self.node_ids = node_ids
+        self.term_offsets = term_offsets
+        self.postings_docs = postings_docs
+        self.postings_tfs = postings_tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.idf = idf if idf is not None else self._compute_idf()
+        self.avgdl = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+        self._stemmer = Stemmer.Stemmer("english")
+
+        # Per-document length normalization, constant for the life of the index
+        self._norm = k1 * (1.0 - b + b * np.asarray(doc_lengths, dtype=np.float32) / max(self.avgdl, 1e-9))
+
+    # ---------------------------
+    # Construction
+    # ---------------------------
+    @staticmethod
+    def tokenize(text: str, stemmer=None) -> list:
+        """
+        Lowercase, split on word characters, drop stopwords and stem.
+        """
+        tokens = [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+        stemmer = stemmer or Stemmer.Stemmer("english")
+        return stemmer.stemWords(tokens)
+
+    @classmethod
+    def build(cls, node_ids: list, texts: list, k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """
+        Build an index from scratch.
+
+        Args:
+            node_ids: Node IDs, one per text
+            texts: Raw node texts
+
+        Returns:
+            BM25Index
+        """
+        empty = cls(
+            vocab=np.zeros(0, dtype=str),
+            node_ids=np.zeros(0, dtype=str),
+            term_offsets=np.zeros(1, dtype=np.int64),
+            postings_docs=np.zeros(0, dtype=np.int32),
+            postings_tfs=np.zeros(0, dtype=np.float32),
+            doc_lengths=np.zeros(0, dtype=np.int32),
+            k1=k1,
+            b=b
+        )
+        return empty.add_documents(node_ids, texts)
+
+    def _term_id(self, token: str):
+        """
+        Position of token in the sorted vocab, or None if it isn't indexed.
+        """
+        term_id = int(np.searchsorted(self.vocab, token))
+        if term_id < len(self.vocab) and self.vocab[term_id] == token:
+            return term_id
+        return None
+
+    def _triplets(self):
+        """
+        Expand the CSR postings into parallel (term, doc, tf) arrays.
+        """
+        term_ids = np.repeat(
+            np.arange(len(self.vocab), dtype=np.int64),
+            np.diff(self.term_offsets)
+        )
+        return term_ids, np.asarray(self.postings_docs), np.asarray(self.postings_tfs)
+
+    def _from_triplets(self, vocab, node_ids, term_ids, docs, tfs, doc_lengths) -> "BM25Index":
+        """
+        Build an index from (term, doc, tf) postings. Postings of a term must
+        already be in doc order; a stable sort on term IDs then yields the CSR
+        layout. Timsort merges presorted runs in linear time, so the existing
+        postings, already sorted, are not re-sorted on each incremental update.
+        """
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, docs, tfs = term_ids[order], docs[order], tfs[order]
+        counts = np.bincount(term_ids, minlength=len(vocab)) if len(vocab) else np.zeros(0, dtype=np.int64)
+        term_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(counts, out=term_offsets[1:])
+        return BM25Index(
+            vocab=vocab,
+            node_ids=node_ids,
+            term_offsets=term_offsets,
+            postings_docs=docs.astype(np.int32),
+            postings_tfs=tfs.astype(np.float32),
+            doc_lengths=doc_lengths.astype(np.int32),
+            k1=self.k1,
+            b=self.b
+        )
+
+    def add_documents(self, node_ids: list, texts: list) -> "BM25Index":
+        """
+        Return a new index containing the existing documents plus the new ones.
+        Only the new texts are tokenized; existing postings are merged as arrays.
+        """
+        first_doc = len(self.node_ids)
+
+        new_tokens, new_docs, new_tfs, new_lengths = [], [], [], []
+        for offset, text in enumerate(texts):
+            tokens = self.tokenize(text, self._stemmer)
+            new_lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                new_tokens.append(token)
+                new_docs.append(first_doc + offset)
+                new_tfs.append(tf)
+
+        # Merged vocab stays sorted; old term IDs shift to their new positions in order
+        new_tokens = np.asarray(new_tokens, dtype=str)
+        vocab = np.union1d(np.asarray(self.vocab), new_tokens)
+        old_terms, old_docs, old_tfs = self._triplets()
+        old_terms = np.searchsorted(vocab, np.asarray(self.vocab))[old_terms]
+        return self._from_triplets(
+            vocab,
+            np.concatenate([np.asarray(self.node_ids), np.asarray(node_ids, dtype=str)]),
+            np.concatenate([old_terms, np.searchsorted(vocab, new_tokens)]),
+            np.concatenate([old_docs, np.asarray(new_docs, dtype=np.int32)]),
+            np.concatenate([old_tfs, np.asarray(new_tfs, dtype=np.float32)]),
+            np.concatenate([np.asarray(self.doc_lengths), np.asarray(new_lengths, dtype=np.int32)])
+        )
+
+    def remove_documents(self, node_ids) -> "BM25Index":
+        """
+        Return a new index without the given node IDs.
+        """
+        keep = ~np.isin(np.asarray(self.node_ids), np.asarray(list(node_ids), dtype=str))
+        if keep.all():
+            return self
+
+        # Old doc position -> new doc position
+        remap = np.cumsum(keep) - 1
+        term_ids, docs, tfs = self._triplets()
+        mask = keep[docs]
+        return self._from_triplets(
+            np.asarray(self.vocab),
+            np.asarray(self.node_ids)[keep],
+            term_ids[mask],
+            remap[docs[mask]],
+            tfs[mask],
+            np.asarray(self.doc_lengths)[keep]
+        )
+
+    def _compute_idf(self) -> np.ndarray:
+        n_docs = len(self.doc_lengths)
+        df = np.diff(self.term_offsets).astype(np.float32)
+        return np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    # ---------------------------
+    # Search
+    # ---------------------------
+    def search(self, query: str, top_k: int, exclude: np.ndarray = None):
+        """
+        Score every document containing a query term.
+        Documents flagged in the optional exclude mask are skipped.
+
+        Returns:
+            (doc positions, scores) arrays sorted best first. Positions follow
+            the order documents were added, which matches the embedding store rows.
+        """
+        n_docs = len(self.node_ids)
+        if n_docs == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        scores = np.zeros(n_docs, dtype=np.float32)
+        norm = self._norm
+
+        for token in set(self.tokenize(query, self._stemmer)):
+            term_id = self._term_id(token)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.postings_docs[start:end]
+            tfs = self.postings_tfs[start:end]
+            scores[docs] += self.idf[term_id] * tfs * (self.k1 + 1.0) / (tfs + norm[docs])
+
+        if exclude is not None:
+            scores[exclude[:n_docs]] = 0.0
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        return candidates, scores[candidates]
+
+    def normalizer(self, query: str) -> float:
+        """
+        Score a document would get for containing every query term once at
+        the average length. Dividing search() scores by it gives the share
+        of the query's idf weight a document matches, comparable across
+        queries; terms missing from the index count at the idf of an unseen term.
+        """
+        unseen_idf = float(np.log(1.0 + (len(self.doc_lengths) + 0.5) / 0.5))
+        total = 0.0
+        for token in set(self.tokenize(query, self._stemmer)):
+            term_id = self._term_id(token)
+            total += float(self.idf[term_id]) if term_id is not None else unseen_idf
+        return total
+
+    # ---------------------------
+    # Persistence
+    # ---------------------------
+    def save(self, path: str):
+        """
+        Write the index arrays and metadata to a directory.
+        """
+        os.makedirs(path, exist_ok=True)
+        # Replace files instead of overwriting them in place, readers may have them mapped
+        for name in _ARRAY_FILES:
+            tmp_path = os.path.join(path, f"{name}.npy.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.asarray(getattr(self, name)))
+            os.replace(tmp_path, os.path.join(path, f"{name}.npy"))
+        tmp_path = os.path.join(path, _META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b}, f)
+        os.replace(tmp_path, os.path.join(path, _META_FILE))
+        logger.info(f"BM25 index saved to {path} ({len(self.node_ids)} docs, {len(self.vocab)} terms)")
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "BM25Index":
+        """
+        Load an index written by save(). Arrays are memory-mapped by default.
+        """
+        with open(os.path.join(path, _META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        mmap_mode = "r" if mmap else None
+        if "vocab" in meta:
+            return cls._load_legacy(path, meta)
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in _ARRAY_FILES
+        }
+        return cls(k1=meta["k1"], b=meta["b"], **arrays)
+
+    @classmethod
+    def _load_legacy(cls, path: str, meta: dict) -> "BM25Index":
+        """
+        Load an index saved with vocab and node IDs in meta.json, in the
+        order terms were first seen, and re-sort its postings by term.
+        """
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"))
+            for name in ("term_offsets", "postings_docs", "postings_tfs", "doc_lengths")
+        }
+        unsorted = cls(
+            vocab=np.asarray(meta["vocab"], dtype=str),
+            node_ids=np.asarray(meta["node_ids"], dtype=str),
+            k1=meta["k1"],
+            b=meta["b"],
+            **arrays
+        )
+        vocab = np.sort(unsorted.vocab)
+        term_ids, docs, tfs = unsorted._triplets()
+        return unsorted._from_triplets(
+            vocab,
+            unsorted.node_ids,
+            np.searchsorted(vocab, unsorted.vocab)[term_ids],
+            docs,
+            tfs,
+            np.asarray(unsorted.doc_lengths)
+        )
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, _META_FILE))
@@ -0,0 +1,160 @@
+import sys
+import json
+import argparse
+import logging
+
+from config import RELEVANCE_TOP_K, RELEVANCE_GATE_HIGH, RELEVANCE_GATE_LOW, RELEVANCE_GATE_BM25
+
+logger = logging.getLogger(__name__)
+
+LABELS = ("CAN_ANSWER", "PARTIAL", "NO_MATCH")
+
+# Normalized BM25 thresholds tried for the CAN_ANSWER gate
+BM25_CANDIDATES = (0.3, 0.4, 0.5, 0.6, 0.7, 0.8)
+
+
+def score_features(documents: list) -> list:
+    """
+    The scores the relevance gate reads from each retrieved document.
+
+    Returns:
+        List of (vector_score, bm25_norm, bm25_score) tuples
+    """
+    return [
+        (
+            doc.metadata.get("vector_score", 0.0),
+            doc.metadata.get("bm25_norm", 0.0),
+            doc.metadata.get("bm25_score", 0.0)
+        )
+        for doc in documents
+    ]
+
+
+def _can_answer(scores: list, high: float, bm25_min: float) -> bool:
+    return any(vector >= high and bm25_norm >= bm25_min for vector, bm25_norm, _ in scores)
+
+
+def _no_match(scores: list, low: float) -> bool:
+    top_vector = max((vector for vector, _, _ in scores), default=0.0)
+    return top_vector < low and not any(bm25 > 0 for _, _, bm25 in scores)
+
+
+def _precision(fired: list, label: str) -> float:
+    return sum(sample["label"] == label for sample in fired) / len(fired)
+
+
+def calibrate(samples: list, target_precision: float = 0.95) -> dict:
+    """
+    Pick gate thresholds from labelled retrieval scores.
+
+    RELEVANCE_GATE_HIGH and RELEVANCE_GATE_BM25 are the pair that gates
+    the most questions as CAN_ANSWER while at least target_precision of
+    them are labelled CAN_ANSWER; RELEVANCE_GATE_LOW is the highest
+    similarity that keeps NO_MATCH decisions at that precision.
+
+    Args:
+        samples: Dicts with "label" (one of LABELS) and "scores" (score_features())
+        target_precision: Share of gated decisions that must match the label
+
+    Returns:
+        Suggested thresholds with the share of questions each gate decides
+        and its precision. A threshold is None when no value reaches the target.
+    """
+    vectors = sorted({round(vector, 2) for sample in samples for vector, _, _ in sample["scores"]})
+    result = {
+        "samples": len(samples),
+        "high": None, "bm25": None, "can_answer_coverage": 0.0, "can_answer_precision": None,
+        "low": None, "no_match_coverage": 0.0, "no_match_precision": None
+    }
+    if not samples:
+        return result
+
+    best = None
+    for bm25_min in BM25_CANDIDATES:
+        # Coverage only shrinks as the threshold rises, so the lowest passing one is best
+        for high in vectors:
+            fired = [sample for sample in samples if _can_answer(sample["scores"], high, bm25_min)]
+            if fired and _precision(fired, "CAN_ANSWER") >= target_precision:
+                if best is None or len(fired) > len(best[2]):
+                    best = (high, bm25_min, fired)
+                break
+    if best:
+        high, bm25_min, fired = best
+        result.update(
+            high=high, bm25=bm25_min,
+            can_answer_coverage=len(fired) / len(samples),
+            can_answer_precision=_precision(fired, "CAN_ANSWER")
+        )
+
+    # Past the highest score too, so a gate that holds for every sample can be found
+    for low in (vectors + [vectors[-1] + 0.01]) if vectors else []:
+        fired = [sample for sample in samples if _no_match(sample["scores"], low)]
+        if fired and _precision(fired, "NO_MATCH") >= target_precision:
+            result.update(
+                low=low,
+                no_match_coverage=len(fired) / len(samples),
+                no_match_precision=_precision(fired, "NO_MATCH")
+            )
+    return result
+
+
+def collect_samples(records: list, k: int = RELEVANCE_TOP_K, llm_labels: bool = False) -> list:
+    """
+    Retrieve every question against the current index and pair the
+    gate's scores with the question's label.
+
+    Args:
+        records: Dicts with "question" and, unless llm_labels, "label"
+        k: Documents the gate sees, as in the workflow
+        llm_labels: Label unlabelled questions with the LLM relevance checker
+
+    Raises:
+        ValueError: If a record has no valid label and llm_labels is off
+    """
+    # Imported here so calibrate() can be used without the index stack
+    from resources import get_retriever
+    from agents.relevance_checker import RelevanceChecker
+
+    retriever = get_retriever()
+    checker = RelevanceChecker(gate=False) if llm_labels else None
+    samples = []
+    for record in records:
+        documents = retriever.invoke(record["question"])
+        label = record.get("label")
+        if label is None and checker:
+            label = checker.check(record["question"], documents, k=k)
+        if label not in LABELS:
+            raise ValueError(f"{record['question']!r}: label must be one of {', '.join(LABELS)}")
+        samples.append({"label": label, "scores": score_features(documents[:k])})
+    return samples
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Calibrate the relevance gate thresholds on labelled questions.")
+    parser.add_argument(
+        "input",
+        help="JSONL file, one {\"question\": ..., \"label\": \"CAN_ANSWER\"|\"PARTIAL\"|\"NO_MATCH\"} object per line"
+    )
+    parser.add_argument(
+        "--target-precision", type=float, default=0.95,
+        help="Share of gated decisions that must agree with the labels (default 0.95)"
+    )
+    parser.add_argument("--llm-labels", action="store_true", help="Label questions without a label using the LLM checker")
+    args = parser.parse_args(argv)
+
+    with open(args.input, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    result = calibrate(collect_samples(records, llm_labels=args.llm_labels), args.target_precision)
+
+    print(json.dumps(result, indent=2))
+    print(f"Current: RELEVANCE_GATE_HIGH={RELEVANCE_GATE_HIGH} RELEVANCE_GATE_BM25={RELEVANCE_GATE_BM25} RELEVANCE_GATE_LOW={RELEVANCE_GATE_LOW}")
+    for name, key in (("RELEVANCE_GATE_HIGH", "high"), ("RELEVANCE_GATE_BM25", "bm25"), ("RELEVANCE_GATE_LOW", "low")):
+        if result[key] is None:
+            print(f"{name}: no value reaches {args.target_precision:.0%} precision, keep the gate conservative")
+        else:
+            print(f"Suggested {name} = {result[key]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
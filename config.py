@@ -5,21 +5,114 @@ load_dotenv()
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-DATA_DIR = os.path.join(BASE_DIR, "data")
+DATA_DIR = os.getenv("RAG_DATA_DIR") or os.path.join(BASE_DIR, "data")  # Override to keep separate indexes, e.g. for benchmarks
 UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")
 INDEX_DIR = os.path.join(DATA_DIR, "llamaindex")
+STORE_DIR = os.path.join(INDEX_DIR, "store")  # Memory-mapped embeddings and node data
+BM25_DIR = os.path.join(INDEX_DIR, "bm25")  # Persistent BM25 inverted index
+ANN_DIR = os.path.join(INDEX_DIR, "ann")  # Approximate nearest neighbour vector index
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(INDEX_DIR, exist_ok=True)
 
 EMBED_MODEL = "BAAI/bge-base-en-v1.5"
+EMBED_DTYPE = "float32"  # Stored embedding precision, "float16" halves disk and memory
 
 TOP_K = 5  # Reduced from 5 for faster retrieval
+RELEVANCE_TOP_K = 3  # Passages the relevance checker classifies in verification mode
+CONTEXT_TOKEN_BUDGET = 3000  # Max prompt context tokens the research and verification agents send
+RELEVANCE_GATE_ENABLED = True  # Decide clear-cut relevance from retrieval scores without the LLM
+# The gate thresholds depend on EMBED_MODEL. These defaults follow the BGE
+# model card (bge similarities cluster in roughly [0.6, 1], with 0.8-0.9
+# suggested for "similar"); derive corpus-specific values from labelled
+# questions with calibrate_relevance.py.
+RELEVANCE_GATE_HIGH = 0.85  # Cosine similarity a chunk needs, with a BM25 match, for CAN_ANSWER
+RELEVANCE_GATE_LOW = 0.45  # Cosine similarity below which, with no BM25 hit, is NO_MATCH
+RELEVANCE_GATE_BM25 = 0.5  # Normalized BM25 score (share of the query's idf weight matched) counted as a BM25 match
+MAX_RESEARCH_RETRIES = 1  # Re-research rounds after failed verification
+RETRY_EXPAND_K = 5  # Extra documents added to the context on each retry
+SPECULATIVE_RESEARCH = True  # Draft the answer while the relevance check runs, discard it on NO_MATCH
+
+# Hybrid retrieval settings
+VECTOR_TOP_K = 10  # Candidates pulled from the vector retriever before fusion
+BM25_TOP_K = 10  # Candidates pulled from the BM25 retriever before fusion
+FUSION_MODE = "rrf"  # "rrf" (reciprocal rank), "weighted" (normalized scores) or "concat"
+RRF_K = 60  # Rank damping constant for reciprocal rank fusion
+FUSION_WEIGHTS = {"vector": 0.6, "bm25": 0.4}  # Used by "weighted" fusion
+RETRIEVAL_TIMEOUT = 30  # Seconds to wait for the retrievers before returning partial results
+RERANK_ENABLED = False  # Rerank fused candidates with a local cross-encoder before truncating to TOP_K
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"  # Small CPU cross-encoder
+RERANK_CANDIDATES = 20  # Fused candidates scored by the reranker
+RERANK_BATCH_SIZE = 32  # Pairs per cross-encoder forward pass
+RERANK_CACHE_SIZE = 4096  # (query, chunk) scores kept in the reranker's LRU cache
+QUERY_CACHE_SIZE = 1024  # Query embeddings kept in the retriever's LRU cache, 0 disables it
+
+# Batch question answering (batch.py)
+BATCH_CONCURRENCY = 8  # Questions, and so LLM calls, in flight at once
+
+# Headless query service (server.py)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_WORKERS = 4  # Questions answered concurrently
+SERVER_QUEUE_SIZE = 32  # Requests allowed to wait for a worker before 503s
+SERVER_REQUEST_TIMEOUT = 120  # Seconds a request waits for its answer before a 504
+
+# Threads shared by every question's retrieval: both legs of each question
+# the server or a batch runs concurrently, so no leg waits in the queue
+RETRIEVAL_WORKERS = 2 * max(SERVER_WORKERS, BATCH_CONCURRENCY)
+
+# Answer cache settings
+ANSWER_CACHE_ENABLED = True  # Serve repeated questions against an unchanged index from memory
+ANSWER_CACHE_TTL = 3600  # Seconds a cached answer stays valid
+ANSWER_CACHE_SIZE = 256  # Cached answers kept per process
+ANSWER_CACHE_SEMANTIC = False  # Also match near-duplicate questions by query embedding
+ANSWER_CACHE_SIMILARITY = 0.95  # Minimum cosine similarity for a semantic match
+
+# Pipeline metrics (metrics.py)
+STAGE_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # Histogram bounds in seconds
+
+BM25_K1 = 1.5  # BM25 term frequency saturation
+BM25_B = 0.75  # BM25 document length normalization
+
+# Vector search settings
+ANN_BACKEND = "ivf"  # "ivf" (NumPy inverted file), "hnsw" (requires hnswlib) or "exact"
+ANN_MIN_VECTORS = 20000  # Smaller corpora always use exact search
+IVF_NLIST = None  # Number of IVF clusters, None = 4 * sqrt(number of chunks)
+IVF_NPROBE = 16  # Clusters scanned per query: higher = better recall, slower
+HNSW_M = 16  # Graph degree: higher = better recall, more memory
+HNSW_EF_CONSTRUCTION = 200  # Build-time candidate list size
+HNSW_EF_SEARCH = 64  # Query-time candidate list size: higher = better recall, slower
 
 # Large file handling settings
-BATCH_SIZE = 1000  # Process nodes in batches for large files
-MAX_FILE_SIZE_MB = 100  # Warn for files larger than this
+BATCH_SIZE = 1000  # Chunks embedded and appended to the store per window
+EMBED_BATCH_SIZE = 64  # Chunks per forward pass of the embedding model
+EMBED_WORKERS = 1  # >1 embeds in a process pool, each worker loads its own model copy
+EMBED_CACHE_ENABLED = True  # Reuse embeddings of unchanged chunk text across runs
+EMBED_CACHE_PATH = os.path.join(DATA_DIR, "embedding_cache.sqlite")
+EMBED_CACHE_MAX_MB = 2048  # Least recently used embeddings are evicted past this size
+MAX_FILE_SIZE_MB = 100  # Larger files are parsed in PDF_PAGE_WINDOW page ranges
+PDF_PAGE_WINDOW = 50  # Pages parsed per fresh PDF reader for large files
+PARSE_WORKERS = min(4, os.cpu_count() or 1)  # PDF parser processes, 1 parses in-process
 CHUNK_SIZE = 256  # Optimized for speed and large files
 CHUNK_OVERLAP = 25  # Reduced overlap for efficiency
+COMPACT_THRESHOLD = 0.25  # Compact the index once this fraction of chunks is deleted
+
+# LLM settings, one client per agent profile is shared process-wide
+LLM_MODEL = "llama-3.1-8b-instant"
+LLM_PROFILES = {
+    "research": {"temperature": 0.1, "max_tokens": 512},  # Limit for faster responses
+    "verification": {"temperature": 0.0, "max_tokens": 200},
+    "relevance": {"temperature": 0, "max_tokens": 10},
+}
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")  # "groq", or "fake" for a local stub without network access
+LLM_TIMEOUT = 30  # Seconds per LLM call
+LLM_MAX_RETRIES = 3  # Retries on 429, 5xx, timeouts and connection errors
+LLM_RETRY_BASE_DELAY = 0.5  # Seconds, doubled per retry with full jitter
+LLM_RETRY_MAX_DELAY = 8  # Upper bound for a single backoff
+LLM_REQUESTS_PER_MINUTE = 30  # Match your Groq plan's limits for LLM_MODEL
+LLM_TOKENS_PER_MINUTE = 20000
+LLM_MAX_CONNECTIONS = 20  # Pooled keep-alive HTTP connections to the LLM API
+LLM_FAKE_LATENCY = float(os.getenv("LLM_FAKE_LATENCY", "0.05"))  # Seconds per call of the fake backend
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
\ No newline at end of file
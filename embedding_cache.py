@@ -0,0 +1,145 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import numpy as np
+from config import EMBED_MODEL, EMBED_CACHE_PATH, EMBED_CACHE_MAX_MB
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+_QUERY_CHUNK = 500
+
+
+class EmbeddingCache:
+    """
+    Disk-backed cache of chunk embeddings in SQLite.
+
+    Keys are SHA-256 digests of the embedding model name plus the exact text
+    that gets embedded, so a cached vector is only reused for the same model
+    and the same input. Vectors are stored as raw float32 bytes. When the
+    stored vectors exceed max_bytes, the least recently used entries are
+    evicted down to 90% of the limit.
+    """
+
+    def __init__(
+        self,
+        path: str = EMBED_CACHE_PATH,
+        model_name: str = EMBED_MODEL,
+        max_bytes: int = EMBED_CACHE_MAX_MB * 1024 * 1024
+    ):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('bytes', 0)")
+        self._conn.commit()
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    @property
+    def size_bytes(self) -> int:
+        return self._conn.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+
+    def get_many(self, texts: list) -> dict:
+        """
+        Look up embeddings for texts.
+
+        Returns:
+            Dict of position in texts -> float32 embedding, for hits only
+        """
+        positions = {}
+        for i, text in enumerate(texts):
+            positions.setdefault(self._key(text), []).append(i)
+
+        found = {}
+        keys = list(positions)
+        for start in range(0, len(keys), _QUERY_CHUNK):
+            chunk = keys[start:start + _QUERY_CHUNK]
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            for key, vector in rows:
+                embedding = np.frombuffer(vector, dtype=np.float32)
+                for i in positions[key]:
+                    found[i] = embedding
+
+        # Refresh recency for hits so eviction is least-recently-used
+        hit_keys = [key for key in keys if positions[key][0] in found]
+        if hit_keys:
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(now, key) for key in hit_keys]
+            )
+            self._conn.commit()
+
+        self.hits += len(found)
+        self.misses += len(texts) - len(found)
+        return found
+
+    def put_many(self, texts: list, embeddings):
+        """
+        Store embeddings for texts, then evict if over the size limit.
+        """
+        now = time.time()
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        rows = {self._key(text): matrix[i].tobytes() for i, text in enumerate(texts)}
+
+        with self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?)",
+                [(key, vector, now) for key, vector in rows.items()]
+            )
+            inserted = self._conn.total_changes - before
+            if inserted:
+                self._conn.execute(
+                    "UPDATE meta SET value = value + ? WHERE name = 'bytes'",
+                    (inserted * matrix.shape[1] * 4,)
+                )
+
+        if self.size_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Drop least recently used entries until the cache is under 90% of max_bytes.
+        """
+        size = self.size_bytes
+        row = self._conn.execute("SELECT length(vector) FROM embeddings LIMIT 1").fetchone()
+        if not row:
+            return
+        excess_rows = int(np.ceil((size - 0.9 * self.max_bytes) / row[0]))
+        if excess_rows <= 0:
+            return
+
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess_rows,)
+            )
+            self._conn.execute(
+                "UPDATE meta SET value = (SELECT COALESCE(SUM(length(vector)), 0) FROM embeddings) "
+                "WHERE name = 'bytes'"
+            )
+        logger.info(f"Evicted {excess_rows} cached embeddings (cache was {size / 1e6:.0f} MB)")
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,141 @@
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from embedding_cache import EmbeddingCache
+from config import EMBED_MODEL, EMBED_BATCH_SIZE, EMBED_WORKERS, EMBED_CACHE_ENABLED
+
+logger = logging.getLogger(__name__)
+
+# Model loaded once per worker process by _init_worker
+_worker_model = None
+
+
+def _load_model(model_name: str, batch_size: int) -> HuggingFaceEmbedding:
+    return HuggingFaceEmbedding(model_name=model_name, embed_batch_size=batch_size)
+
+
+def _init_worker(model_name: str, batch_size: int):
+    global _worker_model
+    _worker_model = _load_model(model_name, batch_size)
+
+
+def _embed_in_worker(texts: list) -> np.ndarray:
+    return np.asarray(_worker_model.get_text_embedding_batch(texts), dtype=np.float32)
+
+
+class EmbeddingEngine:
+    """
+    Embeds chunk texts in large batches, either in-process or across a pool
+    of worker processes that each hold their own copy of the model.
+
+    Texts are submitted in windows (one store append each). With a pool,
+    up to two windows per worker are in flight at once and results are
+    yielded in submission order. Texts found in the embedding cache are
+    never sent to the model; the model itself is only loaded on the first miss.
+    """
+
+    def __init__(
+        self,
+        model: HuggingFaceEmbedding = None,
+        model_name: str = EMBED_MODEL,
+        batch_size: int = EMBED_BATCH_SIZE,
+        workers: int = EMBED_WORKERS,
+        cache: EmbeddingCache = None
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.workers = max(1, workers)
+        self.cache = cache if cache is not None else (
+            EmbeddingCache(model_name=model_name) if EMBED_CACHE_ENABLED else None
+        )
+        self._model = model
+        self._pool = None
+
+    def _submit(self, texts: list):
+        """
+        Start embedding texts: a Future with a pool, the result otherwise.
+        """
+        if self.workers > 1:
+            if self._pool is None:
+                # spawn, not fork: forking after the tokenizer/torch threads start can deadlock
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_name, self.batch_size)
+                )
+                logger.info(f"Embedding with {self.workers} worker processes")
+            return self._pool.submit(_embed_in_worker, texts)
+
+        if self._model is None:
+            self._model = _load_model(self.model_name, self.batch_size)
+        return np.asarray(self._model.get_text_embedding_batch(texts), dtype=np.float32)
+
+    def _start(self, texts: list):
+        cached = self.cache.get_many(texts) if self.cache is not None else {}
+        missing = [i for i in range(len(texts)) if i not in cached]
+        pending = self._submit([texts[i] for i in missing]) if missing else None
+        return texts, cached, missing, pending
+
+    def _finish(self, texts: list, cached: dict, missing: list, pending) -> np.ndarray:
+        fresh = pending.result() if hasattr(pending, "result") else pending
+        if not cached:
+            matrix = fresh
+        else:
+            dim = len(next(iter(cached.values())))
+            matrix = np.empty((len(texts), dim), dtype=np.float32)
+            for i, embedding in cached.items():
+                matrix[i] = embedding
+            if missing:
+                matrix[missing] = fresh
+
+        if self.cache is not None and missing:
+            self.cache.put_many([texts[i] for i in missing], fresh)
+        return matrix
+
+    def embed(self, texts: list) -> np.ndarray:
+        """
+        Embed one window of texts.
+
+        Returns:
+            (len(texts), dim) float32 matrix
+        """
+        return self._finish(*self._start(texts))
+
+    def embed_windows(self, windows, text_fn=None):
+        """
+        Embed an iterable of windows, yielding (window, embeddings) pairs
+        in order. Only a bounded number of windows is held at once.
+
+        Args:
+            windows: Iterable of lists (e.g. nodes)
+            text_fn: Maps a window item to the text to embed, identity by default
+        """
+        text_fn = text_fn or (lambda item: item)
+        max_in_flight = 2 * self.workers if self.workers > 1 else 1
+
+        in_flight = deque()
+        for window in windows:
+            in_flight.append((window, self._start([text_fn(item) for item in window])))
+            if len(in_flight) >= max_in_flight:
+                done_window, state = in_flight.popleft()
+                yield done_window, self._finish(*state)
+        while in_flight:
+            done_window, state = in_flight.popleft()
+            yield done_window, self._finish(*state)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,262 @@
+import os
+import json
+import mmap
+import logging
+import numpy as np
+from llama_index.core.schema import TextNode
+
+logger = logging.getLogger(__name__)
+
+_META_FILE = "meta.json"
+_EMBEDDINGS_FILE = "embeddings.bin"
+_NODES_FILE = "nodes.jsonl"
+_OFFSETS_FILE = "node_offsets.bin"
+_DELETED_FILE = "deleted.npy"
+
+
+class EmbeddingStore:
+    """
+    Binary, memory-mapped storage for node embeddings and node data.
+
+    Layout:
+        embeddings.bin    contiguous row-major (count, dim) matrix of
+                          L2-normalized float32/float16 embeddings
+        nodes.jsonl       one JSON record per row (id, text, metadata)
+        node_offsets.bin  uint64 byte offsets into nodes.jsonl, count + 1 entries
+        meta.json         dim, dtype and the committed row count
+        deleted.npy       tombstone mask of rows removed since the last compaction
+
+    meta.json is written last, so rows appended by an interrupted write are
+    ignored. Opening a store only maps the files; nothing is parsed until a
+    row is read, and several processes share the same page cache. Files are
+    replaced rather than truncated when rewritten, so readers that still map
+    the old files keep working.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, _META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dim = meta["dim"]
+        self.dtype = np.dtype(meta["dtype"])
+        self.count = meta["count"]
+        self._map()
+
+    def _map(self):
+        embeddings_path = os.path.join(self.path, _EMBEDDINGS_FILE)
+        if self.count:
+            self.vectors = np.memmap(embeddings_path, dtype=self.dtype, mode="r", shape=(self.count, self.dim))
+            self.offsets = np.memmap(os.path.join(self.path, _OFFSETS_FILE), dtype=np.uint64, mode="r", shape=(self.count + 1,))
+            with open(os.path.join(self.path, _NODES_FILE), "rb") as f:
+                self._nodes = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.vectors = np.zeros((0, self.dim), dtype=self.dtype)
+            self.offsets = np.zeros(1, dtype=np.uint64)
+            self._nodes = b""
+
+        deleted_path = os.path.join(self.path, _DELETED_FILE)
+        self.deleted = np.zeros(self.count, dtype=bool)
+        if os.path.exists(deleted_path):
+            saved = np.load(deleted_path)
+            self.deleted[:min(len(saved), self.count)] = saved[:self.count]
+        self._has_deleted = bool(self.deleted.any())
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def deleted_count(self) -> int:
+        return int(self.deleted.sum())
+
+    @property
+    def live_count(self) -> int:
+        return self.count - self.deleted_count
+
+    @property
+    def exclude_mask(self):
+        """
+        Tombstone mask to pass to searches, or None when nothing is deleted.
+        """
+        return self.deleted if self._has_deleted else None
+
+    # ---------------------------
+    # Creation / Writes
+    # ---------------------------
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, _META_FILE))
+
+    @classmethod
+    def create(cls, path: str, dim: int, dtype: str = "float32") -> "EmbeddingStore":
+        """
+        Create an empty store, replacing any existing one at path.
+        """
+        os.makedirs(path, exist_ok=True)
+        # Unlink first: readers mapping the old files keep their copies
+        for name in (_EMBEDDINGS_FILE, _NODES_FILE, _OFFSETS_FILE, _DELETED_FILE):
+            if os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+        for name in (_EMBEDDINGS_FILE, _NODES_FILE):
+            open(os.path.join(path, name), "wb").close()
+        np.zeros(1, dtype=np.uint64).tofile(os.path.join(path, _OFFSETS_FILE))
+        cls._write_meta(path, dim, dtype, 0)
+        return cls(path)
+
+    @staticmethod
+    def _write_meta(path: str, dim: int, dtype: str, count: int):
+        tmp_path = os.path.join(path, _META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": dim, "dtype": str(np.dtype(dtype)), "count": count}, f)
+        os.replace(tmp_path, os.path.join(path, _META_FILE))
+
+    def append(self, nodes: list, embeddings) -> range:
+        """
+        Append nodes and their embeddings.
+
+        Args:
+            nodes: LlamaIndex nodes (node_id, text, metadata are stored)
+            embeddings: One embedding per node
+
+        Returns:
+            The range of rows that were written
+        """
+        matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(nodes), self.dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = (matrix / norms).astype(self.dtype)
+
+        nodes_path = os.path.join(self.path, _NODES_FILE)
+        position = int(self.offsets[-1])
+        offsets = []
+        with open(nodes_path, "r+b") as f:
+            f.seek(position)
+            for node in nodes:
+                record = json.dumps(
+                    {"id": node.node_id, "text": node.get_content(), "metadata": node.metadata or {}},
+                    ensure_ascii=False
+                ).encode("utf-8") + b"\n"
+                f.write(record)
+                position += len(record)
+                offsets.append(position)
+            f.truncate()
+
+        with open(os.path.join(self.path, _EMBEDDINGS_FILE), "r+b") as f:
+            f.seek(self.count * self.dim * self.dtype.itemsize)
+            f.write(matrix.tobytes())
+            f.truncate()
+
+        with open(os.path.join(self.path, _OFFSETS_FILE), "r+b") as f:
+            f.seek((self.count + 1) * 8)
+            f.write(np.asarray(offsets, dtype=np.uint64).tobytes())
+            f.truncate()
+
+        first_row = self.count
+        self._write_meta(self.path, self.dim, self.dtype, self.count + len(nodes))
+        self.count += len(nodes)
+        self._map()
+        return range(first_row, self.count)
+
+    def delete(self, rows):
+        """
+        Tombstone rows. They stay in the files until compact() is called.
+        """
+        self.deleted[np.asarray(list(rows), dtype=np.int64)] = True
+        self._has_deleted = bool(self.deleted.any())
+        tmp_path = os.path.join(self.path, "deleted.tmp.npy")
+        np.save(tmp_path, self.deleted)
+        os.replace(tmp_path, os.path.join(self.path, _DELETED_FILE))
+
+    def truncate(self, count: int):
+        """
+        Drop every row from count onward, e.g. rows appended by an
+        interrupted ingestion that never committed them.
+
+        meta.json is rewritten first, which alone commits the truncation
+        (appends overwrite past the committed count); the files are then
+        replaced by their first count rows.
+        """
+        if count >= self.count:
+            return
+        self._write_meta(self.path, self.dim, self.dtype, count)
+
+        row_bytes = self.dim * self.dtype.itemsize
+        node_bytes = int(self.offsets[count])
+        for name, size in (
+            (_EMBEDDINGS_FILE, count * row_bytes),
+            (_NODES_FILE, node_bytes),
+            (_OFFSETS_FILE, (count + 1) * 8)
+        ):
+            src_path = os.path.join(self.path, name)
+            tmp_path = src_path + ".tmp"
+            with open(src_path, "rb") as src, open(tmp_path, "wb") as dst:
+                remaining = size
+                while remaining:
+                    chunk = src.read(min(remaining, 1 << 24))
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    remaining -= len(chunk)
+            os.replace(tmp_path, src_path)
+
+        deleted = self.deleted[:count].copy()
+        logger.info(f"Truncated embedding store: {self.count} -> {count} rows")
+        self.count = count
+        self._map()
+        self.deleted = deleted
+        self._has_deleted = bool(deleted.any())
+        tmp_path = os.path.join(self.path, "deleted.tmp.npy")
+        np.save(tmp_path, self.deleted)
+        os.replace(tmp_path, os.path.join(self.path, _DELETED_FILE))
+
+    def compact(self) -> np.ndarray:
+        """
+        Rewrite the store without tombstoned rows, preserving row order.
+
+        Returns:
+            Array mapping old row -> new row (-1 for removed rows)
+        """
+        keep = ~self.deleted
+        remap = np.full(self.count, -1, dtype=np.int64)
+        remap[keep] = np.arange(int(keep.sum()))
+
+        tmp_embeddings = os.path.join(self.path, _EMBEDDINGS_FILE + ".tmp")
+        tmp_nodes = os.path.join(self.path, _NODES_FILE + ".tmp")
+        tmp_offsets = os.path.join(self.path, _OFFSETS_FILE + ".tmp")
+
+        offsets = [0]
+        with open(tmp_embeddings, "wb") as f_emb, open(tmp_nodes, "wb") as f_nodes:
+            for start in range(0, self.count, 65536):
+                end = min(start + 65536, self.count)
+                f_emb.write(np.ascontiguousarray(self.vectors[start:end][keep[start:end]]).tobytes())
+            for row in np.flatnonzero(keep):
+                record = self._nodes[int(self.offsets[row]):int(self.offsets[row + 1])]
+                f_nodes.write(record)
+                offsets.append(offsets[-1] + len(record))
+        np.asarray(offsets, dtype=np.uint64).tofile(tmp_offsets)
+
+        os.replace(tmp_embeddings, os.path.join(self.path, _EMBEDDINGS_FILE))
+        os.replace(tmp_nodes, os.path.join(self.path, _NODES_FILE))
+        os.replace(tmp_offsets, os.path.join(self.path, _OFFSETS_FILE))
+        if os.path.exists(os.path.join(self.path, _DELETED_FILE)):
+            os.remove(os.path.join(self.path, _DELETED_FILE))
+        self._write_meta(self.path, self.dim, self.dtype, int(keep.sum()))
+
+        logger.info(f"Compacted embedding store: {self.count} -> {int(keep.sum())} rows")
+        self.count = int(keep.sum())
+        self._map()
+        return remap
+
+    # ---------------------------
+    # Reads
+    # ---------------------------
+    def get_record(self, row: int) -> dict:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(self._nodes[start:end])
+
+    def get_node(self, row: int) -> TextNode:
+        record = self.get_record(row)
+        return TextNode(id_=record["id"], text=record["text"], metadata=record["metadata"])
+
+    def iter_records(self):
+        for row in range(self.count):
+            yield row, self.get_record(row)
@@ -0,0 +1,98 @@
+import os
+import json
+import hashlib
+
+MANIFEST_FILE = "manifest.json"
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Hash a file in fixed-size chunks so large PDFs aren't read into memory.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def empty_manifest(settings: dict, version: int = 0) -> dict:
+    """
+    Manifest of an index with no files. Pass the version of the index being
+    replaced so rebuilds keep the version increasing; readers only compare
+    versions for equality and would take a repeated one for an unchanged index.
+    """
+    return {"version": version, "settings": settings, "row_count": 0, "files": {}}
+
+
+def load_manifest(index_dir: str):
+    """
+    Returns:
+        The manifest dict, or None if the index has no manifest yet
+    """
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(index_dir: str, manifest: dict):
+    """
+    Atomically replace the manifest. It is written after every other index
+    file so a crash mid-ingestion leaves the previous manifest in place.
+    """
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+    _versions.pop(index_dir, None)
+
+
+# index_dir -> (manifest stat key, version), so per-question version checks
+# cost a stat() instead of parsing the manifest
+_versions = {}
+
+
+def index_version(index_dir: str) -> int:
+    """
+    Version counter bumped by every ingestion that changes the index.
+
+    The manifest is only re-read when its inode, mtime or size changes;
+    saves made by this process drop the cached version directly.
+    """
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return 0
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached = _versions.get(index_dir)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    manifest = load_manifest(index_dir)
+    version = manifest["version"] if manifest else 0
+    _versions[index_dir] = (key, version)
+    return version
+
+
+def rows_of(entries) -> list:
+    """
+    Expand [[start, end], ...] row ranges into a list of rows.
+    """
+    return [row for start, end in entries for row in range(start, end)]
+
+
+def row_ranges(rows) -> list:
+    """
+    Collapse sorted rows into [[start, end], ...] ranges.
+    """
+    ranges = []
+    for row in rows:
+        if ranges and ranges[-1][1] == row:
+            ranges[-1][1] = row + 1
+        else:
+            ranges.append([row, row + 1])
+    return ranges
@@ -1,23 +1,186 @@
 import os
+import time
+import shutil
 from llama_index.core import (
-    SimpleDirectoryReader,
-    VectorStoreIndex,
     Settings,
-    StorageContext
+    StorageContext,
+    load_index_from_storage
 )
 from llama_index.core.node_parser import SentenceSplitter
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from config import UPLOAD_DIR, INDEX_DIR, EMBED_MODEL, BATCH_SIZE, CHUNK_SIZE, CHUNK_OVERLAP
+from llama_index.core.schema import MetadataMode
+from bm25_index import BM25Index
+from ann_index import build_ann_index, save_ann_index, load_ann_index, ann_index_exists
+from embedding_store import EmbeddingStore
+from embedding_engine import EmbeddingEngine
+from pdf_loader import iter_pdf_pages
+from index_manifest import (
+    file_sha256,
+    empty_manifest,
+    load_manifest,
+    save_manifest,
+    rows_of,
+    row_ranges
+)
+from config import (
+    UPLOAD_DIR,
+    INDEX_DIR,
+    STORE_DIR,
+    EMBED_DTYPE,
+    BM25_DIR,
+    ANN_DIR,
+    ANN_BACKEND,
+    ANN_MIN_VECTORS,
+    IVF_NLIST,
+    IVF_NPROBE,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    EMBED_MODEL,
+    EMBED_WORKERS,
+    PARSE_WORKERS,
+    BATCH_SIZE,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    BM25_K1,
+    BM25_B,
+    COMPACT_THRESHOLD
+)
+
+
+def _build_ann(store: EmbeddingStore):
+    return build_ann_index(
+        store.vectors,
+        backend=ANN_BACKEND,
+        min_vectors=ANN_MIN_VECTORS,
+        nlist=IVF_NLIST,
+        nprobe=IVF_NPROBE,
+        m=HNSW_M,
+        ef_construction=HNSW_EF_CONSTRUCTION,
+        ef_search=HNSW_EF_SEARCH
+    )
+
+
+def _ann_needs_rebuild(ann, store: EmbeddingStore) -> bool:
+    """
+    Rebuild instead of extending when the corpus has outgrown the structure:
+    exact search past ANN_MIN_VECTORS, a backend change, or IVF centroids
+    trained on less than half of the current rows.
+    """
+    if ann.backend != ANN_BACKEND:
+        return ann.backend != "exact" or store.live_count >= ANN_MIN_VECTORS
+    if ann.backend == "ivf":
+        return len(store) > 2 * ann.built_rows
+    return False
+
+
+def build_search_indices(store: EmbeddingStore):
+    """
+    Build and persist the ANN and BM25 indices over every row of the store.
+    Both are built in store row order, so their hits are store rows.
+    """
+    save_ann_index(_build_ann(store), ANN_DIR)
+
+    BM25Index.build(
+        [record["id"] for _, record in store.iter_records()],
+        (record["text"] for _, record in store.iter_records()),
+        k1=BM25_K1,
+        b=BM25_B
+    ).save(BM25_DIR)
+
+
+def export_legacy_index():
+    """
+    Convert an index persisted by LlamaIndex (JSON docstore and vector store)
+    into the binary embedding store without re-embedding anything.
+    """
+    if not os.path.exists(os.path.join(INDEX_DIR, "docstore.json")):
+        raise RuntimeError("No index found. Upload PDFs first.")
+
+    storage = StorageContext.from_defaults(persist_dir=INDEX_DIR)
+    index = load_index_from_storage(storage, embed_model=Settings.embed_model)
+    embedding_dict = index.vector_store.data.embedding_dict
+    nodes = [index.docstore.get_node(node_id) for node_id in embedding_dict]
+    if not nodes:
+        raise RuntimeError("No index found. Upload PDFs first.")
+
+    store = EmbeddingStore.create(STORE_DIR, dim=len(embedding_dict[nodes[0].node_id]), dtype=EMBED_DTYPE)
+    store.append(nodes, [embedding_dict[n.node_id] for n in nodes])
+    build_search_indices(store)
+    print(f"Converted legacy index with {len(nodes)} chunks to {STORE_DIR}")
+
+
+def update_search_indices(store: EmbeddingStore, first_new_row: int):
+    """
+    Bring the persisted ANN and BM25 indices up to date after rows were
+    appended from first_new_row onward. Only the new rows are tokenized and
+    assigned; when tombstones pass COMPACT_THRESHOLD the store is compacted
+    and deleted rows are dropped from both indices.
+
+    Returns:
+        Old row -> new row remap array if the store was compacted, else None
+    """
+    if not (BM25Index.exists(BM25_DIR) and ann_index_exists(ANN_DIR)):
+        build_search_indices(store)
+        return None
+
+    bm25_index = BM25Index.load(BM25_DIR, mmap=False)
+    if len(bm25_index.node_ids) != first_new_row:
+        # BM25 positions and IVF list rows must be store rows; rebuild rather than extend out of step
+        print(f"Search indices cover {len(bm25_index.node_ids)} rows, store had {first_new_row}: rebuilding them")
+        build_search_indices(store)
+        return None
+
+    new_rows = range(first_new_row, len(store))
+    bm25_index = bm25_index.add_documents(
+        [store.get_record(row)["id"] for row in new_rows],
+        (store.get_record(row)["text"] for row in new_rows)
+    )
+
+    remap = None
+    if store.deleted_count > COMPACT_THRESHOLD * len(store):
+        deleted_ids = [store.get_record(int(row))["id"] for row in store.deleted.nonzero()[0]]
+        remap = store.compact()
+        bm25_index = bm25_index.remove_documents(deleted_ids)
+        ann = _build_ann(store)
+    else:
+        ann = load_ann_index(ANN_DIR, store.vectors)
+        ann = _build_ann(store) if _ann_needs_rebuild(ann, store) else ann.add(store.vectors, first_new_row)
+
+    bm25_index.save(BM25_DIR)
+    save_ann_index(ann, ANN_DIR)
+    return remap
+
+
+def _clear_index(manifest: dict):
+    """
+    Remove the store and search indices and commit an empty manifest, for
+    a rebuild that ends with nothing to store. The old files would otherwise
+    stay on disk under a manifest that doesn't describe them.
+    """
+    for path in (STORE_DIR, BM25_DIR, ANN_DIR):
+        shutil.rmtree(path, ignore_errors=True)
+    manifest["version"] += 1
+    save_manifest(INDEX_DIR, manifest)
+    print("Removed the previous index: no PDF documents left to rebuild it from")
 
 
-def ingest_pdfs(progress_callback=None):
+def ingest_pdfs(progress_callback=None, full_rebuild: bool = False):
     """
-    Ingest PDF documents from UPLOAD_DIR and create a vector store index.
-    Optimized for large files with batching and progress tracking.
+    Ingest PDF documents from UPLOAD_DIR into the binary embedding store
+    and build the ANN and BM25 search indices over it.
+
+    Ingestion is incremental: a manifest in INDEX_DIR records a content hash
+    per file, so only new or changed PDFs are read and embedded, and chunks
+    of deleted or replaced files are removed from the existing index.
     
     Args:
         progress_callback: Optional callback function to report progress.
                           Should accept (progress: float, message: str)
+        full_rebuild: Ignore the manifest and re-index every file
+
+    Returns:
+        Dict with the "added", "removed" and "unchanged" file names and the
+        embedding throughput in "chunks_per_second"
     """
     try:
         os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -25,28 +188,79 @@ def ingest_pdfs(progress_callback=None):
 
         # Disable OpenAI completely
         Settings.llm = None
-        Settings.embed_model = HuggingFaceEmbedding(
-            model_name=EMBED_MODEL
-        )
 
         if progress_callback:
-            progress_callback(0.1, "Loading PDF documents...")
+            progress_callback(0.05, "Checking for new or changed PDFs...")
 
-        # Load documents with file size limit handling
-        docs = SimpleDirectoryReader(
-            UPLOAD_DIR,
-            required_exts=[".pdf"],
-            filename_as_id=True  # Use filename as ID for tracking
-        ).load_data()
+        # Settings that invalidate every stored chunk when changed
+        settings = {
+            "embed_model": EMBED_MODEL,
+            "embed_dtype": EMBED_DTYPE,
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP
+        }
+        manifest = load_manifest(INDEX_DIR)
+        previous_version = manifest["version"] if manifest else 0
+        store = None
+        recovered = False
+        # An existing store the rebuilt manifest won't describe
+        replaced_store = False
+        if (
+            full_rebuild
+            or manifest is None
+            or manifest.get("settings") != settings
+            or not EmbeddingStore.exists(STORE_DIR)
+        ):
+            replaced_store = EmbeddingStore.exists(STORE_DIR)
+            manifest = empty_manifest(settings, version=previous_version)
+        else:
+            store = EmbeddingStore(STORE_DIR)
+            if len(store) > manifest["row_count"]:
+                # Rows appended by an interrupted run were never recorded in the
+                # manifest. Drop them so store rows line up with the manifest
+                # again, and rebuild the search indices, which may cover them.
+                print(f"Recovering from an interrupted ingestion: dropping {len(store) - manifest['row_count']} uncommitted chunks")
+                store.truncate(manifest["row_count"])
+                recovered = True
+            elif len(store) < manifest["row_count"]:
+                # Interrupted compaction: manifest rows no longer match the store
+                print("Recovering from an interrupted compaction: re-indexing every file")
+                manifest = empty_manifest(settings, version=previous_version)
+                store = None
+                replaced_store = True
 
-        if not docs:
-            print("No PDF documents found in upload directory.")
-            return
+        pdf_paths = {
+            name: os.path.join(UPLOAD_DIR, name)
+            for name in sorted(os.listdir(UPLOAD_DIR))
+            if name.lower().endswith(".pdf")
+        }
+        hashes = {name: file_sha256(path) for name, path in pdf_paths.items()}
 
-        print(f"Loaded {len(docs)} documents.")
-        
-        if progress_callback:
-            progress_callback(0.3, f"Loaded {len(docs)} documents. Splitting into chunks...")
+        indexed = manifest["files"]
+        added = [name for name in pdf_paths if indexed.get(name, {}).get("sha256") != hashes[name]]
+        removed = [name for name in indexed if name not in pdf_paths]
+        unchanged = [name for name in pdf_paths if name not in added]
+        summary = {"added": added, "removed": removed, "unchanged": unchanged, "chunks_per_second": None}
+
+        if not added and not removed and not recovered:
+            if replaced_store:
+                _clear_index(manifest)
+            if not pdf_paths:
+                print("No PDF documents found in upload directory.")
+            else:
+                print("Index is up to date.")
+            if progress_callback:
+                progress_callback(1.0, "✅ Index is up to date!")
+            return summary
+
+        print(f"{len(added)} new or changed, {len(removed)} removed, {len(unchanged)} unchanged PDF(s).")
+
+        # Tombstone the chunks of deleted and replaced files
+        stale = [name for name in removed + added if name in indexed]
+        if store is not None and stale:
+            store.delete(rows_of(r for name in stale for r in indexed[name]["rows"]))
+        for name in stale:
+            del indexed[name]
 
         # Split documents into chunks
         splitter = SentenceSplitter(
@@ -54,56 +268,120 @@ def ingest_pdfs(progress_callback=None):
             chunk_overlap=CHUNK_OVERLAP  # From config
         )
 
-        nodes = splitter.get_nodes_from_documents(docs)
-        total_nodes = len(nodes)
-        print(f"Created {total_nodes} chunks.")
+        # Streaming pipeline: page -> chunks -> BATCH_SIZE window -> embeddings -> store.
+        # Only the windows in flight are held in memory, never a whole file.
+        position = {"file": 0, "page": 0, "pages": 1, "fraction": 0.1}
+
+        def on_file_parsed(name, pages, seconds):
+            message = f"Parsed {name}: {pages} pages in {seconds:.2f}s"
+            print(message)
+            if progress_callback:
+                progress_callback(position["fraction"], message)
+
+        def iter_nodes():
+            for doc, file_index, page, total_pages in iter_pdf_pages(
+                [pdf_paths[name] for name in added],
+                workers=PARSE_WORKERS,
+                on_file_parsed=on_file_parsed
+            ):
+                position["file"], position["page"], position["pages"] = file_index, page, total_pages
+                yield from splitter.get_nodes_from_documents([doc])
+
+        def iter_windows(nodes):
+            window = []
+            for node in nodes:
+                window.append(node)
+                if len(window) >= BATCH_SIZE:
+                    yield window
+                    window = []
+            if window:
+                yield window
 
         if progress_callback:
-            progress_callback(0.5, f"Created {total_nodes} chunks. Building vector index...")
+            progress_callback(0.1, f"Loading and embedding {len(added)} PDF document(s)...")
+
+        first_new_row = len(store) if store is not None else 0
+        file_rows = {name: [] for name in added}
+        total_nodes = 0
+        if added:
+            start_time = time.perf_counter()
+            rate = 0.0
+
+            with EmbeddingEngine() as engine:
+                for batch, embeddings in engine.embed_windows(
+                    iter_windows(iter_nodes()),
+                    text_fn=lambda n: n.get_content(metadata_mode=MetadataMode.EMBED)
+                ):
+                    if store is None:
+                        store = EmbeddingStore.create(STORE_DIR, dim=embeddings.shape[1], dtype=EMBED_DTYPE)
+                    rows = store.append(batch, embeddings)
+                    for node, row in zip(batch, rows):
+                        ranges = file_rows.setdefault(node.metadata.get("file_name"), [])
+                        if ranges and ranges[-1][1] == row:
+                            ranges[-1][1] = row + 1
+                        else:
+                            ranges.append([row, row + 1])
+
+                    total_nodes += len(batch)
+                    rate = total_nodes / max(time.perf_counter() - start_time, 1e-9)
+                    done = (position["file"] + position["page"] / max(position["pages"], 1)) / len(added)
+                    position["fraction"] = 0.1 + 0.8 * min(done, 1.0)
+                    message = (
+                        f"File {position['file'] + 1}/{len(added)}, page {position['page']}/{position['pages']}: "
+                        f"{total_nodes} chunks ({rate:.0f} chunks/s)"
+                    )
+                    if progress_callback:
+                        progress_callback(position["fraction"], message + "...")
+                    print(message)
+
+                if engine.cache is not None:
+                    print(f"Embedding cache: {engine.cache.hits} hits, {engine.cache.misses} misses")
 
-        # For large files, process in batches (using BATCH_SIZE from config)
-        if total_nodes <= BATCH_SIZE:
-            # Small dataset - process all at once
-            index = VectorStoreIndex(nodes)
+            summary["chunks_per_second"] = rate
+            print(f"Embedded {total_nodes} chunks with {EMBED_WORKERS} worker(s) at {rate:.1f} chunks/s")
+
+        if store is None:
+            if replaced_store:
+                _clear_index(manifest)
+            print("No text could be extracted from the PDF documents.")
             if progress_callback:
-                progress_callback(0.9, "Persisting index to disk...")
+                progress_callback(1.0, "✅ Index is up to date!")
+            return summary
+
+        if progress_callback:
+            progress_callback(0.92, "Updating search indices...")
+
+        # ANN vector index and BM25 keyword index over the stored rows
+        if recovered or (first_new_row == 0 and not store.deleted_count):
+            build_search_indices(store)
+            remap = None
         else:
-            # Large dataset - process in batches
-            print(f"Large dataset detected ({total_nodes} nodes). Processing in batches...")
-            
-            # Create index with first batch
-            first_batch = nodes[:BATCH_SIZE]
-            index = VectorStoreIndex(first_batch)
-            
-            if progress_callback:
-                progress_callback(0.6, f"Processed {BATCH_SIZE}/{total_nodes} chunks...")
-            
-            # Add remaining nodes in batches
-            for i in range(BATCH_SIZE, total_nodes, BATCH_SIZE):
-                batch = nodes[i:i + BATCH_SIZE]
-                for node in batch:
-                    index.insert_nodes([node])
-                
-                progress = 0.6 + (0.3 * (i / total_nodes))
-                if progress_callback:
-                    progress_callback(
-                        progress, 
-                        f"Processed {min(i + BATCH_SIZE, total_nodes)}/{total_nodes} chunks..."
-                    )
-                
-                print(f"Processed {min(i + BATCH_SIZE, total_nodes)}/{total_nodes} chunks")
+            remap = update_search_indices(store, first_new_row)
+
+        for name in added:
+            indexed[name] = {
+                "sha256": hashes[name],
+                "size": os.path.getsize(pdf_paths[name]),
+                "rows": file_rows.get(name, [])
+            }
+        if remap is not None:
+            for entry in indexed.values():
+                entry["rows"] = row_ranges(int(remap[row]) for row in rows_of(entry["rows"]))
+
+        # The manifest is written last and bumps the index version
+        manifest["row_count"] = len(store)
+        manifest["version"] += 1
+        save_manifest(INDEX_DIR, manifest)
 
-        # Persist index
-        index.storage_context.persist(persist_dir=INDEX_DIR)
-        
         if progress_callback:
             progress_callback(1.0, "✅ Indexing complete!")
         
-        print(f"Index successfully created and persisted to {INDEX_DIR}")
-        print(f"Total chunks indexed: {total_nodes}")
+        print(f"Index successfully updated in {STORE_DIR}")
+        print(f"Chunks indexed this run: {total_nodes} (index now holds {store.live_count})")
+        return summary
     
     except MemoryError as e:
-        error_msg = "❌ Out of memory! File is too large. Try splitting the PDF into smaller files."
+        error_msg = "❌ Out of memory! Lower BATCH_SIZE or EMBED_WORKERS in config.py and try again."
         print(error_msg)
         if progress_callback:
             progress_callback(1.0, error_msg)
@@ -0,0 +1,424 @@
+import os
+import time
+import random
+import asyncio
+import weakref
+import threading
+import logging
+from typing import Iterator
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from metrics import record_llm_usage
+from config import (
+    LLM_MODEL,
+    LLM_PROFILES,
+    LLM_BACKEND,
+    LLM_TIMEOUT,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_MAX_CONNECTIONS,
+    LLM_FAKE_LATENCY
+)
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: rate limited or a server-side failure
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_RETRYABLE_ERRORS = ("APITimeoutError", "APIConnectionError", "ConnectTimeout", "ReadTimeout", "ConnectError")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at rate_per_minute.
+
+    reserve() always succeeds and may drive the level negative; it returns
+    how long the caller has to wait for its reservation to be covered, so
+    sync and async callers can sleep in their own way.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take amount from the bucket.
+
+        Returns:
+            Seconds until the bucket is back at zero, 0 if it never went below
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            self._level -= amount
+            return max(0.0, -self._level / self.rate)
+
+    def refund(self, amount: float):
+        """
+        Return unused reservation (negative amounts take more).
+        """
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self._level = min(self.capacity, self._level + amount)
+
+
+class RateLimiter:
+    """
+    Request and token limits shared by every client of the same model.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = LLM_TOKENS_PER_MINUTE
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def reserve(self, tokens: int) -> float:
+        return max(self.requests.reserve(1), self.tokens.reserve(tokens))
+
+
+def _estimate_tokens(prompt: str, max_tokens: int) -> int:
+    # ~4 characters per token is close enough for rate limiting
+    return len(prompt) // 4 + 1 + max_tokens
+
+
+def _status_code(error: Exception):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in _RETRYABLE_ERRORS:
+        return True
+    return _status_code(error) in _RETRYABLE_STATUS
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """
+    Honour Retry-After when the server sends one, otherwise back off
+    exponentially with full jitter so concurrent callers spread out.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        retry_after = float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        retry_after = None
+    if retry_after is not None:
+        return min(retry_after, LLM_RETRY_MAX_DELAY)
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+# ---------------------------
+# Backends
+# ---------------------------
+_http_client = None
+# Event loop -> async client. httpx async clients are bound to the loop they
+# first ran on, so every loop (e.g. each asyncio.run()) gets its own.
+_async_http_clients = weakref.WeakKeyDictionary()
+_http_lock = threading.Lock()
+
+
+def _http_limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_CONNECTIONS
+    )
+
+
+def _pooled_http_client():
+    """
+    Sync httpx client with keep-alive pooling, shared by every Groq chat
+    model in the process.
+    """
+    global _http_client
+    with _http_lock:
+        if _http_client is None:
+            import httpx
+
+            _http_client = httpx.Client(limits=_http_limits(), timeout=LLM_TIMEOUT)
+        return _http_client
+
+
+def _pooled_async_http_client():
+    """
+    Async httpx client with keep-alive pooling for the running event loop,
+    shared by every Groq chat model called on that loop.
+    """
+    loop = asyncio.get_running_loop()
+    with _http_lock:
+        client = _async_http_clients.get(loop)
+        if client is None:
+            import httpx
+
+            client = _async_http_clients[loop] = httpx.AsyncClient(limits=_http_limits(), timeout=LLM_TIMEOUT)
+        return client
+
+
+class GroqChatModel:
+    """
+    Groq chat model for one agent profile. Sync calls share one ChatGroq;
+    async calls get a ChatGroq per event loop, on that loop's pooled client.
+    """
+
+    def __init__(self, profile: str):
+        self.api_key = os.getenv("GROQ_API_KEY")
+        if not self.api_key:
+            raise ValueError("GROQ_API_KEY environment variable is not set")
+        self.profile = profile
+        self._sync_model = self._chat_model(http_client=_pooled_http_client())
+        self._async_models = weakref.WeakKeyDictionary()  # Event loop -> ChatGroq
+        self._lock = threading.Lock()
+
+    def _chat_model(self, **http_clients):
+        from langchain_groq import ChatGroq
+
+        return ChatGroq(
+            model_name=LLM_MODEL,
+            groq_api_key=self.api_key,
+            request_timeout=LLM_TIMEOUT,
+            max_retries=0,  # The gateway retries with its own backoff and rate limits
+            **http_clients,
+            **LLM_PROFILES[self.profile]
+        )
+
+    def invoke(self, prompt: str):
+        return self._sync_model.invoke(prompt)
+
+    def stream(self, prompt: str):
+        return self._sync_model.stream(prompt)
+
+    async def ainvoke(self, prompt: str):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            model = self._async_models.get(loop)
+            if model is None:
+                model = self._async_models[loop] = self._chat_model(http_async_client=_pooled_async_http_client())
+        return await model.ainvoke(prompt)
+
+
+class FakeChatModel:
+    """
+    Local stand-in for the Groq chat model. Replies deterministically per
+    agent profile after a fixed latency, so pipelines, services and
+    benchmarks run without network access or an API key.
+    """
+
+    _REPLIES = {
+        "relevance": "CAN_ANSWER",
+        "verification": (
+            "Supported: YES\nUnsupported Claims: []\nContradictions: []\n"
+            "Relevant: YES\nAdditional Details: Checked by the fake LLM backend."
+        ),
+    }
+
+    def __init__(self, profile: str, latency: float = LLM_FAKE_LATENCY):
+        self.profile = profile
+        self.latency = latency
+
+    def _reply(self, prompt: str) -> str:
+        if self.profile in self._REPLIES:
+            return self._REPLIES[self.profile]
+        # Research: answer with the start of the supplied information
+        information = prompt.split("**Available information:**", 1)[-1]
+        information = information.split("**Answer:**", 1)[0].strip()
+        return " ".join(information.split()[:40]) or "Sorry, I don't have any information about your question."
+
+    def _message(self, prompt: str) -> AIMessage:
+        content = self._reply(prompt)
+        input_tokens = len(prompt) // 4 + 1
+        output_tokens = len(content) // 4 + 1
+        return AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens
+            }
+        )
+
+    def invoke(self, prompt: str) -> AIMessage:
+        time.sleep(self.latency)
+        return self._message(prompt)
+
+    async def ainvoke(self, prompt: str) -> AIMessage:
+        await asyncio.sleep(self.latency)
+        return self._message(prompt)
+
+    def stream(self, prompt: str) -> Iterator[AIMessageChunk]:
+        time.sleep(self.latency)
+        for word in self._reply(prompt).split(" "):
+            yield AIMessageChunk(content=word + " ")
+
+
+BACKENDS = {
+    "groq": GroqChatModel,
+    "fake": FakeChatModel,
+}
+
+
+# ---------------------------
+# Gateway
+# ---------------------------
+class LLMGateway:
+    """
+    The chat model interface the agents call (invoke, ainvoke, stream).
+
+    Every call first waits on the shared request/token rate limiter, runs
+    with a per-call timeout, and is retried with jittered exponential
+    backoff on 429s, 5xx responses, timeouts and connection errors.
+    Streams are only retried before their first chunk.
+    """
+
+    def __init__(
+        self,
+        model,
+        limiter: RateLimiter,
+        max_tokens: int = 0,
+        timeout: float = LLM_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES
+    ):
+        self.model = model
+        self.limiter = limiter
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def _reconcile(self, prompt: str, response, estimate: int):
+        """
+        Correct the token reservation with the reported usage and record the
+        call on the open stage span, estimating usage the model didn't report.
+        """
+        usage = getattr(response, "usage_metadata", None)
+        if usage and usage.get("total_tokens"):
+            self.limiter.tokens.refund(estimate - usage["total_tokens"])
+            record_llm_usage(usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+        else:
+            content = getattr(response, "content", "")
+            record_llm_usage(_estimate_tokens(prompt, 0), _estimate_tokens(content if isinstance(content, str) else "", 0))
+
+    def _should_retry(self, error: Exception, attempt: int) -> float:
+        """
+        Returns:
+            Seconds to wait before the next attempt, or None to give up
+        """
+        if attempt >= self.max_retries or not _is_retryable(error):
+            return None
+        delay = _retry_delay(error, attempt)
+        logger.warning(f"LLM call failed ({type(error).__name__}: {error}), retry {attempt + 1} in {delay:.2f}s")
+        return delay
+
+    def invoke(self, prompt: str):
+        estimate = _estimate_tokens(prompt, self.max_tokens)
+        time.sleep(self.limiter.reserve(estimate))
+        attempt = 0
+        while True:
+            try:
+                response = self.model.invoke(prompt)
+                self._reconcile(prompt, response, estimate)
+                return response
+            except Exception as e:
+                self.limiter.tokens.refund(estimate)
+                delay = self._should_retry(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay + self.limiter.reserve(estimate))
+
+    async def ainvoke(self, prompt: str):
+        estimate = _estimate_tokens(prompt, self.max_tokens)
+        await asyncio.sleep(self.limiter.reserve(estimate))
+        attempt = 0
+        while True:
+            try:
+                response = await asyncio.wait_for(self.model.ainvoke(prompt), self.timeout)
+                self._reconcile(prompt, response, estimate)
+                return response
+            except Exception as e:
+                self.limiter.tokens.refund(estimate)
+                delay = self._should_retry(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay + self.limiter.reserve(estimate))
+
+    def stream(self, prompt: str):
+        estimate = _estimate_tokens(prompt, self.max_tokens)
+        time.sleep(self.limiter.reserve(estimate))
+        attempt = 0
+        while True:
+            started = False
+            streamed = None
+            try:
+                for chunk in self.model.stream(prompt):
+                    started = True
+                    streamed = chunk if streamed is None else streamed + chunk
+                    yield chunk
+                self._reconcile(prompt, streamed, estimate)
+                return
+            except Exception as e:
+                if started:
+                    raise  # Tokens were generated; the stream can't be replayed
+                self.limiter.tokens.refund(estimate)
+                delay = self._should_retry(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay + self.limiter.reserve(estimate))
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def shared_limiter() -> RateLimiter:
+    """
+    Process-wide limiter; every profile calls the same model, so they share limits.
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+
+def create_llm(profile: str, backend: str = LLM_BACKEND) -> LLMGateway:
+    """
+    Build the gateway for an agent profile in LLM_PROFILES.
+
+    Raises:
+        ValueError: If the profile or backend is unknown, or the backend
+                    is missing credentials
+    """
+    if profile not in LLM_PROFILES:
+        raise ValueError(f"Unknown LLM profile: {profile}")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {backend}. Choose from {sorted(BACKENDS)}")
+    # The fake backend has no provider quota to respect
+    limiter = RateLimiter(0, 0) if backend == "fake" else shared_limiter()
+    return LLMGateway(
+        BACKENDS[backend](profile),
+        limiter,
+        max_tokens=LLM_PROFILES[profile].get("max_tokens", 0)
+    )
\ No newline at end of file
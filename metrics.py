@@ -0,0 +1,144 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, TypedDict
+
+from config import STAGE_LATENCY_BUCKETS
+
+
+class StageSpan(TypedDict):
+    stage: str  # "retrieval", "relevance", "research", "verification", "answer_cache" or "query_embedding"
+    seconds: float
+    llm_calls: int
+    prompt_tokens: int
+    completion_tokens: int
+
+
+# LLM usage of the span open in the current thread or task, if any
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+@contextmanager
+def stage_span(stage: str):
+    """
+    Time a pipeline stage and collect the LLM usage recorded inside it.
+
+    Yields the span dict, complete once the block exits. Spans follow the
+    context they were opened in: a stage run on another thread or asyncio
+    task has to open its own.
+    """
+    span = {"stage": stage, "seconds": 0.0, "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    token = _current_span.set(span)
+    started = time.perf_counter()
+    try:
+        yield span
+    finally:
+        span["seconds"] = round(time.perf_counter() - started, 4)
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            pass  # A generator holding the span was closed from another context
+
+
+def record_llm_usage(prompt_tokens: int, completion_tokens: int):
+    """
+    Add one LLM call to the open span. A no-op outside stage_span().
+    """
+    span = _current_span.get()
+    if span is not None:
+        span["llm_calls"] += 1
+        span["prompt_tokens"] += prompt_tokens
+        span["completion_tokens"] += completion_tokens
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{value}"' for name, value in labels.items())
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters and histograms built from pipeline spans,
+    rendered in the Prometheus text exposition format.
+    """
+
+    def __init__(self, buckets=STAGE_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._stage_seconds = {}
+        self._pipeline_seconds = {}
+        self._llm_calls = {}
+        self._prompt_tokens = {}
+        self._completion_tokens = {}
+
+    def _histogram(self, histograms: dict, key) -> _Histogram:
+        if key not in histograms:
+            histograms[key] = _Histogram(self.buckets)
+        return histograms[key]
+
+    def observe_pipeline(self, mode: str, spans: List[StageSpan], seconds: float):
+        """
+        Record one answered question.
+
+        Args:
+            mode: "fast" or "verified"
+            spans: The stage spans of the run
+            seconds: End-to-end pipeline time
+        """
+        with self._lock:
+            self._histogram(self._pipeline_seconds, mode).observe(seconds)
+            for span in spans:
+                stage = span["stage"]
+                self._histogram(self._stage_seconds, stage).observe(span["seconds"])
+                self._llm_calls[stage] = self._llm_calls.get(stage, 0) + span["llm_calls"]
+                self._prompt_tokens[stage] = self._prompt_tokens.get(stage, 0) + span["prompt_tokens"]
+                self._completion_tokens[stage] = self._completion_tokens.get(stage, 0) + span["completion_tokens"]
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text format (version 0.0.4).
+        """
+        lines = []
+
+        def histogram(name: str, help_text: str, histograms: Dict[str, _Histogram], label: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in sorted(histograms.items()):
+                for bound, count in zip(hist.buckets, hist.counts):
+                    lines.append(f"{name}_bucket{{{_labels(**{label: key, 'le': bound})}}} {count}")
+                lines.append(f"{name}_bucket{{{_labels(**{label: key, 'le': '+Inf'})}}} {hist.total}")
+                lines.append(f"{name}_sum{{{_labels(**{label: key})}}} {hist.sum:.6f}")
+                lines.append(f"{name}_count{{{_labels(**{label: key})}}} {hist.total}")
+
+        def counter(name: str, help_text: str, values: Dict[str, int]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for stage, value in sorted(values.items()):
+                lines.append(f"{name}{{{_labels(stage=stage)}}} {value}")
+
+        with self._lock:
+            histogram("rag_pipeline_duration_seconds", "End-to-end question answering time.", self._pipeline_seconds, "mode")
+            histogram("rag_stage_duration_seconds", "Time spent in each pipeline stage.", self._stage_seconds, "stage")
+            counter("rag_llm_calls_total", "LLM calls made per stage.", self._llm_calls)
+            counter("rag_llm_prompt_tokens_total", "Prompt tokens sent to the LLM per stage.", self._prompt_tokens)
+            counter("rag_llm_completion_tokens_total", "Completion tokens returned by the LLM per stage.", self._completion_tokens)
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every workflow in the process
+registry = MetricsRegistry()
\ No newline at end of file
@@ -0,0 +1,163 @@
+import os
+import time
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader
+from llama_index.core import Document
+from config import MAX_FILE_SIZE_MB, PDF_PAGE_WINDOW, PARSE_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Same exclusions SimpleDirectoryReader applies, so embeddings are unchanged
+_EXCLUDED_METADATA_KEYS = ["file_name", "file_type", "file_size"]
+
+
+def count_pages(path: str) -> int:
+    # A file handle lets pypdf seek on demand; a path makes it read the whole file first
+    with open(path, "rb") as f:
+        return len(PdfReader(f).pages)
+
+
+# Reader of the file this process parsed last. Consecutive ranges of one
+# file reuse it instead of re-reading the trailer, page tree and labels.
+_reader_state = {"key": None, "handle": None, "reader": None, "labels": None}
+
+
+def _reader_for(path: str):
+    """
+    Returns:
+        (reader, page labels) for path, reusing the open reader when the
+        same, unmodified file was parsed last in this process
+    """
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if _reader_state["key"] != key:
+        _close_reader()
+        handle = open(path, "rb")
+        reader = PdfReader(handle)
+        try:
+            labels = reader.page_labels
+        except Exception:
+            labels = []
+        _reader_state.update(key=key, handle=handle, reader=reader, labels=labels)
+    return _reader_state["reader"], _reader_state["labels"]
+
+
+def _close_reader():
+    if _reader_state["handle"] is not None:
+        _reader_state["handle"].close()
+    _reader_state.update(key=None, handle=None, reader=None, labels=None)
+
+
+def _parse_range(path: str, start: int, end: int):
+    """
+    Extract (page_index, page_label, text) for pages in [start, end). Runs
+    in worker processes, so it only returns plain data.
+
+    The reader reads the file lazily through its handle and drops the
+    objects it resolved for the range afterwards, so memory is bounded by
+    one range of pages rather than the file size.
+
+    Returns:
+        (pages, seconds spent parsing)
+    """
+    start_time = time.perf_counter()
+    reader, labels = _reader_for(path)
+
+    pages = []
+    try:
+        for page in range(start, min(end, len(reader.pages))):
+            text = reader.pages[page].extract_text() or ""
+            label = labels[page] if page < len(labels) else str(page + 1)
+            pages.append((page, label, text))
+    finally:
+        reader.resolved_objects.clear()
+    return pages, time.perf_counter() - start_time
+
+
+def _page_document(path: str, page: int, label: str, text: str) -> Document:
+    return Document(
+        text=text,
+        id_=f"{path}_part_{page}",
+        metadata={
+            "page_label": label,
+            "file_name": os.path.basename(path),
+            "file_path": path,
+            "file_type": "application/pdf",
+            "file_size": os.path.getsize(path)
+        },
+        excluded_embed_metadata_keys=_EXCLUDED_METADATA_KEYS,
+        excluded_llm_metadata_keys=_EXCLUDED_METADATA_KEYS
+    )
+
+
+def _page_ranges(paths: list, workers: int):
+    """
+    Split files into (file_index, start, end, total_pages) tasks in file and
+    page order. With several workers every file is split into
+    PDF_PAGE_WINDOW page ranges so one large file still uses all of them;
+    sequentially only files above MAX_FILE_SIZE_MB are split.
+    """
+    for file_index, path in enumerate(paths):
+        total_pages = count_pages(path)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        window = total_pages
+        if workers > 1 or size_mb > MAX_FILE_SIZE_MB:
+            window = PDF_PAGE_WINDOW
+        if size_mb > MAX_FILE_SIZE_MB:
+            logger.info(
+                f"{os.path.basename(path)} is {size_mb:.0f} MB, parsing it in {window}-page ranges"
+            )
+        if total_pages == 0:
+            yield file_index, 0, 0, 0
+        for start in range(0, total_pages, max(window, 1)):
+            yield file_index, start, start + window, total_pages
+
+
+def iter_pdf_pages(paths: list, workers: int = PARSE_WORKERS, on_file_parsed=None):
+    """
+    Lazily yield (document, file_index, page_number, total_pages) for every
+    page of every PDF, in file and page order regardless of worker count.
+
+    With workers > 1, page ranges are parsed in a process pool with at most
+    two ranges per worker in flight, so memory stays bounded.
+
+    Args:
+        paths: PDF file paths
+        workers: Parser processes, 1 parses in-process
+        on_file_parsed: Optional callback (file_name, pages, seconds) called
+                        once a file is fully parsed, with its total parse time
+    """
+    parse_seconds = [0.0] * len(paths)
+
+    def finish_range(file_index, start, end, total_pages, pages, seconds):
+        parse_seconds[file_index] += seconds
+        path = paths[file_index]
+        for page, label, text in pages:
+            yield _page_document(path, page, label, text), file_index, page + 1, total_pages
+        if end >= total_pages and on_file_parsed:
+            on_file_parsed(os.path.basename(path), total_pages, parse_seconds[file_index])
+
+    if workers <= 1:
+        try:
+            for file_index, start, end, total_pages in _page_ranges(paths, workers):
+                pages, seconds = _parse_range(paths[file_index], start, end)
+                yield from finish_range(file_index, start, end, total_pages, pages, seconds)
+        finally:
+            _close_reader()
+        return
+
+    # spawn, not fork: the parent may already run tokenizer/torch threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        in_flight = deque()
+        for task in _page_ranges(paths, workers):
+            file_index, start, end, _ = task
+            in_flight.append((task, pool.submit(_parse_range, paths[file_index], start, end)))
+            if len(in_flight) >= 2 * workers:
+                task, future = in_flight.popleft()
+                yield from finish_range(*task, *future.result())
+        while in_flight:
+            task, future = in_flight.popleft()
+            yield from finish_range(*task, *future.result())
@@ -0,0 +1,88 @@
+import threading
+import logging
+from collections import OrderedDict
+import numpy as np
+from config import RERANK_MODEL, RERANK_BATCH_SIZE, RERANK_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, chunk) pairs with a small sentence-transformers
+    cross-encoder on CPU. All uncached pairs of a query are scored in one
+    batch, and scores are kept in a bounded LRU keyed by (query, node id)
+    so repeated questions don't re-run the model.
+    """
+
+    def __init__(
+        self,
+        model_name: str = RERANK_MODEL,
+        batch_size: int = RERANK_BATCH_SIZE,
+        cache_size: int = RERANK_CACHE_SIZE
+    ):
+        # sentence-transformers is already installed for the embedding model
+        from sentence_transformers import CrossEncoder
+
+        logger.info(f"Loading reranker {model_name}")
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+
+    def score(self, query: str, node_ids: list, texts: list) -> np.ndarray:
+        """
+        Relevance scores for texts against query, higher is better.
+        """
+        scores = np.empty(len(texts), dtype=np.float32)
+        missing = []
+        with self._lock:
+            for i, node_id in enumerate(node_ids):
+                cached = self._scores.get((query, node_id))
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._scores.move_to_end((query, node_id))
+                    scores[i] = cached
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            fresh = self.model.predict(
+                [(query, texts[i]) for i in missing],
+                batch_size=self.batch_size,
+                show_progress_bar=False
+            )
+            with self._lock:
+                for i, value in zip(missing, fresh):
+                    scores[i] = value
+                    self._scores[(query, node_ids[i])] = float(value)
+                while len(self._scores) > self.cache_size:
+                    self._scores.popitem(last=False)
+        return scores
+
+    def rerank(self, query: str, candidates: list, top_n: int) -> list:
+        """
+        Reorder fused candidates by cross-encoder score.
+
+        Args:
+            query: The search query
+            candidates: List of (fused_score, NodeWithScore)
+            top_n: Number of candidates to keep
+
+        Returns:
+            List of (rerank_score, NodeWithScore), best first
+        """
+        if not candidates:
+            return []
+        nodes = [n for _, n in candidates]
+        scores = self.score(query, [n.node.node_id for n in nodes], [n.node.text for n in nodes])
+        order = np.argsort(-scores, kind="stable")[:top_n]
+        return [(float(scores[i]), nodes[i]) for i in order]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._scores)}
\ No newline at end of file
@@ -0,0 +1,93 @@
+import threading
+import logging
+from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from index_manifest import index_version
+from llm_gateway import LLMGateway, create_llm
+from config import INDEX_DIR, EMBED_MODEL
+
+logger = logging.getLogger(__name__)
+
+# Process-wide, read-only objects shared by every session and request.
+# Each is created on first use under _lock and then reused.
+_lock = threading.RLock()
+_embed_model = None
+_retriever = None
+_retriever_version = None
+_llms = {}
+_workflows = {}
+
+
+def get_embed_model() -> HuggingFaceEmbedding:
+    """
+    The query embedding model, loaded once per process.
+    """
+    global _embed_model
+    if _embed_model is None:
+        with _lock:
+            if _embed_model is None:
+                logger.info(f"Loading embedding model {EMBED_MODEL}")
+                _embed_model = HuggingFaceEmbedding(model_name=EMBED_MODEL)
+    return _embed_model
+
+
+def get_retriever():
+    """
+    The hybrid retriever for the current index version.
+
+    Reloaded only when ingestion has bumped the manifest version; callers
+    still holding the previous retriever can finish their queries with it.
+
+    Raises:
+        RuntimeError: If no index exists yet
+    """
+    global _retriever, _retriever_version
+    version = index_version(INDEX_DIR)
+    if _retriever is not None and _retriever_version == version:
+        return _retriever
+
+    with _lock:
+        if _retriever is None or _retriever_version != version:
+            # Imported here so processes that only need LLM clients don't load the index stack
+            from retriever import LlamaIndexHybridRetriever
+
+            logger.info(f"Loading retriever for index version {version}")
+            # The previous retriever is not closed here: callers holding it
+            # keep querying it, and it releases its threads once collected
+            _retriever = LlamaIndexHybridRetriever(embed_model=get_embed_model())
+            _retriever_version = version
+    return _retriever
+
+
+def get_llm(profile: str) -> LLMGateway:
+    """
+    Shared LLM gateway for an agent profile in LLM_PROFILES
+    ("research", "verification" or "relevance"), on the LLM_BACKEND backend.
+
+    Raises:
+        ValueError: If the profile is unknown or GROQ_API_KEY is not set for Groq
+    """
+    llm = _llms.get(profile)
+    if llm is not None:
+        return llm
+
+    with _lock:
+        if profile not in _llms:
+            _llms[profile] = create_llm(profile)
+        return _llms[profile]
+
+
+def get_workflow(enable_verification: bool = False):
+    """
+    Shared compiled AgentWorkflow for a verification mode. Workflows keep
+    no per-question state, so one instance serves concurrent questions.
+    """
+    workflow = _workflows.get(enable_verification)
+    if workflow is not None:
+        return workflow
+
+    with _lock:
+        if enable_verification not in _workflows:
+            from agents.workflow import AgentWorkflow
+
+            _workflows[enable_verification] = AgentWorkflow(enable_verification=enable_verification)
+        return _workflows[enable_verification]
\ No newline at end of file
@@ -1,80 +1,420 @@
 import os
-from llama_index.core import (
-    StorageContext,
-    load_index_from_storage,
-    Settings
-)
-from llama_index.core.retrievers import VectorIndexRetriever
-from llama_index.retrievers.bm25 import BM25Retriever
+import weakref
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
+from llama_index.core import Settings
+from llama_index.core.schema import NodeWithScore
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from langchain_core.documents import Document
-from config import INDEX_DIR, TOP_K, EMBED_MODEL
+from bm25_index import BM25Index
+from ann_index import normalize, load_ann_index
+from embedding_store import EmbeddingStore
+from ingest import export_legacy_index
+from config import (
+    INDEX_DIR,
+    STORE_DIR,
+    BM25_DIR,
+    ANN_DIR,
+    IVF_NPROBE,
+    HNSW_EF_SEARCH,
+    TOP_K,
+    EMBED_MODEL,
+    VECTOR_TOP_K,
+    BM25_TOP_K,
+    FUSION_MODE,
+    RRF_K,
+    FUSION_WEIGHTS,
+    RETRIEVAL_TIMEOUT,
+    RETRIEVAL_WORKERS,
+    QUERY_CACHE_SIZE,
+    RERANK_ENABLED,
+    RERANK_CANDIDATES
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _reciprocal_rank_fusion(results: dict, k: int = RRF_K) -> list:
+    """
+    Fuse ranked node lists by summing 1 / (k + rank) for every list a node appears in.
+
+    Args:
+        results: Mapping of source name -> list of NodeWithScore (best first)
+        k: Rank damping constant
+
+    Returns:
+        List of (fused_score, NodeWithScore) sorted best first
+    """
+    scores = {}
+    nodes = {}
+    for source_nodes in results.values():
+        for rank, n in enumerate(source_nodes, start=1):
+            node_id = n.node.node_id
+            scores[node_id] = scores.get(node_id, 0.0) + 1.0 / (k + rank)
+            nodes.setdefault(node_id, n)
+
+    return sorted(
+        ((score, nodes[node_id]) for node_id, score in scores.items()),
+        key=lambda item: item[0],
+        reverse=True
+    )
+
+
+def _weighted_score_fusion(results: dict, weights: dict = FUSION_WEIGHTS) -> list:
+    """
+    Fuse node lists by a weighted sum of min-max normalized retriever scores.
+
+    Args:
+        results: Mapping of source name -> list of NodeWithScore (best first)
+        weights: Mapping of source name -> weight
+
+    Returns:
+        List of (fused_score, NodeWithScore) sorted best first
+    """
+    scores = {}
+    nodes = {}
+    for source, source_nodes in results.items():
+        if not source_nodes:
+            continue
+        raw = [n.score or 0.0 for n in source_nodes]
+        low, high = min(raw), max(raw)
+        spread = high - low
+        weight = weights.get(source, 1.0)
+        for n, score in zip(source_nodes, raw):
+            normalized = (score - low) / spread if spread > 0 else 1.0
+            node_id = n.node.node_id
+            scores[node_id] = scores.get(node_id, 0.0) + weight * normalized
+            nodes.setdefault(node_id, n)
+
+    return sorted(
+        ((score, nodes[node_id]) for node_id, score in scores.items()),
+        key=lambda item: item[0],
+        reverse=True
+    )
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a query for cache keys: case-folded, whitespace collapsed.
+    """
+    return " ".join(query.casefold().split())
+
+
+def _query_instruction(embed_model) -> str:
+    """
+    The instruction the model prepends to queries, "" if it has none.
+    HuggingFaceEmbedding falls back to a per-model default (e.g. for bge)
+    when none was passed.
+    """
+    instruction = getattr(embed_model, "query_instruction", None)
+    if instruction is None:
+        try:
+            from llama_index.embeddings.huggingface.utils import get_query_instruct_for_model_name
+            instruction = get_query_instruct_for_model_name(getattr(embed_model, "model_name", ""))
+        except ImportError:
+            instruction = ""
+    return instruction or ""
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe, bounded LRU cache of normalized query embeddings keyed by
+    normalized query text.
+    """
+
+    def __init__(self, embed_model, max_size: int = QUERY_CACHE_SIZE):
+        self.embed_model = embed_model
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Prefix that makes batched passage embeddings equal query
+        # embeddings, False if none does; found by warm()
+        self._batch_prefix = None
+
+    def get(self, query: str):
+        key = normalize_query(query)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return embedding
+            self.misses += 1
+
+        # Encode outside the lock so concurrent misses don't serialize
+        embedding = normalize(self.embed_model.get_query_embedding(key))
+        self._store(key, embedding)
+        return embedding
+
+    def _store(self, key: str, embedding):
+        embedding.setflags(write=False)
+        if self.max_size > 0:
+            with self._lock:
+                self._entries[key] = embedding
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+    def warm(self, queries: list) -> int:
+        """
+        Encode uncached queries ahead of time and cache them, at most
+        max_size of them since more would evict each other.
+
+        Queries are encoded in one get_text_embedding_batch() call, with the
+        model's query instruction (bge's "Represent this question for
+        searching relevant passages: ") prepended to each. A probe on the
+        first query checks once that this reproduces get_query_embedding();
+        models whose query encoding can't be matched that way get one
+        get_query_embedding() call per query so cached embeddings match get().
+
+        Returns:
+            Number of queries that were encoded
+        """
+        if self.max_size <= 0:
+            return 0
+        with self._lock:
+            missing = list(dict.fromkeys(
+                key for key in map(normalize_query, queries) if key not in self._entries
+            ))
+        if len(missing) > self.max_size:
+            logger.info(f"Warming {self.max_size} of {len(missing)} uncached queries (QUERY_CACHE_SIZE)")
+            missing = missing[:self.max_size]
+        if not missing:
+            return 0
+
+        if self._batch_prefix is None:
+            self._batch_prefix = self._probe_batch_prefix(missing[0])
+
+        if self._batch_prefix is not False:
+            embeddings = self.embed_model.get_text_embedding_batch([self._batch_prefix + key for key in missing])
+        else:
+            embeddings = [self.embed_model.get_query_embedding(key) for key in missing]
+
+        for key, embedding in zip(missing, normalize(embeddings)):
+            self._store(key, embedding)
+        return len(missing)
+
+    def _probe_batch_prefix(self, query: str):
+        """
+        Returns:
+            The query instruction, or "" for models without one, if prepending
+            it to a batched passage reproduces the query embedding, else False
+        """
+        expected = normalize(self.embed_model.get_query_embedding(query))
+        for prefix in dict.fromkeys((_query_instruction(self.embed_model), "")):
+            batch = normalize(self.embed_model.get_text_embedding_batch([prefix + query]))
+            if np.allclose(expected, batch[0], atol=1e-4):
+                return prefix
+        logger.info("Query embeddings differ from prefixed passage embeddings, warming queries one at a time")
+        return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class ANNVectorRetriever:
+    """
+    Embeds the query and searches the ANN index built during ingestion,
+    resolving matching rows to nodes through the embedding store.
+    Query embeddings are memoized in a QueryEmbeddingCache.
+    """
+
+    def __init__(self, ann, store: EmbeddingStore, embed_model, similarity_top_k: int = VECTOR_TOP_K):
+        self.ann = ann
+        self.store = store
+        self.embed_model = embed_model
+        self.similarity_top_k = similarity_top_k
+        self.query_cache = QueryEmbeddingCache(embed_model)
+
+    def retrieve(self, query: str, top_k: int = None):
+        query_embedding = self.query_cache.get(query)
+        rows, scores = self.ann.search(query_embedding, top_k or self.similarity_top_k, exclude=self.store.exclude_mask)
+        return [
+            NodeWithScore(node=self.store.get_node(row), score=float(score))
+            for row, score in zip(rows, scores)
+        ]
+
+
+class PersistentBM25Retriever:
+    """
+    Serves BM25 queries from the on-disk index written during ingestion
+    and resolves hits to nodes through the embedding store.
+    """
+
+    def __init__(self, bm25_index: BM25Index, store: EmbeddingStore, similarity_top_k: int = BM25_TOP_K):
+        self.bm25_index = bm25_index
+        self.store = store
+        self.similarity_top_k = similarity_top_k
+
+    def retrieve(self, query: str, top_k: int = None):
+        rows, scores = self.bm25_index.search(query, top_k or self.similarity_top_k, exclude=self.store.exclude_mask)
+        return [
+            NodeWithScore(node=self.store.get_node(row), score=float(score))
+            for row, score in zip(rows, scores)
+        ]
+
+
 class LlamaIndexHybridRetriever:
-    def __init__(self):
+    def __init__(self, embed_model: HuggingFaceEmbedding = None, rerank: bool = RERANK_ENABLED):
         """
         Initialize the hybrid retriever with both vector and BM25 retrieval.
         Optimized for large indices.
+
+        Args:
+            embed_model: Shared query embedding model, loaded here if not given
+            rerank: Rerank a larger fused candidate pool with a local cross-encoder
         """
         if not os.path.exists(INDEX_DIR) or not os.listdir(INDEX_DIR):
             raise RuntimeError("No index found. Upload PDFs first.")
 
         # Configure settings
         Settings.llm = None
-        Settings.embed_model = HuggingFaceEmbedding(
+        Settings.embed_model = embed_model or HuggingFaceEmbedding(
             model_name=EMBED_MODEL
         )
 
-        # Load index from storage
+        # Indices written before the binary store are converted once
+        if not EmbeddingStore.exists(STORE_DIR):
+            logger.info("No embedding store found, converting the legacy index...")
+            export_legacy_index()
+
+        # Memory-map the embedding store and search indices
         try:
             logger.info("Loading index from storage...")
-            storage = StorageContext.from_defaults(persist_dir=INDEX_DIR)
-            self.index = load_index_from_storage(storage)
-            logger.info("Index loaded successfully")
+            self.store = EmbeddingStore(STORE_DIR)
+            logger.info(f"Index loaded successfully ({len(self.store)} chunks)")
         except Exception as e:
             raise RuntimeError(f"Failed to load index: {e}")
 
         # Initialize retrievers with optimized settings
         try:
-            # Vector retriever - optimized for large indices
-            self.vector = VectorIndexRetriever(
-                index=self.index,
-                similarity_top_k=TOP_K,
-                # Add node postprocessors for better performance on large datasets
+            # Vector retriever - ANN search over the memory-mapped embedding matrix
+            self.vector = ANNVectorRetriever(
+                load_ann_index(ANN_DIR, self.store.vectors, nprobe=IVF_NPROBE, ef_search=HNSW_EF_SEARCH),
+                self.store,
+                Settings.embed_model,
+                similarity_top_k=VECTOR_TOP_K
             )
 
-            # BM25 retriever - optimized for large indices  
-            self.bm25 = BM25Retriever.from_defaults(
-                index=self.index,
-                similarity_top_k=TOP_K
+            # BM25 retriever - served from the persisted inverted index
+            self.bm25 = PersistentBM25Retriever(
+                BM25Index.load(BM25_DIR),
+                self.store,
+                similarity_top_k=BM25_TOP_K
             )
             
             logger.info("Retrievers initialized successfully")
         except Exception as e:
             raise RuntimeError(f"Failed to initialize retrievers: {e}")
 
-    def invoke(self, query: str, timeout: int = 30):
+        self.reranker = None
+        if rerank:
+            from reranker import CrossEncoderReranker
+            self.reranker = CrossEncoderReranker()
+
+        # Both retrievers run side by side for every query, shared by all
+        # concurrent questions
+        self._executor = ThreadPoolExecutor(
+            max_workers=RETRIEVAL_WORKERS,
+            thread_name_prefix="hybrid-retriever"
+        )
+        # Callers may still be querying a retriever that was replaced after a
+        # reindex, so its threads stop once the last reference is dropped
+        self._finalizer = weakref.finalize(self, self._executor.shutdown, wait=False)
+
+    def embed_query(self, query: str):
+        """
+        Normalized embedding of a query, served from the query cache when possible.
+        """
+        return self.vector.query_cache.get(query)
+
+    def warm_query_embeddings(self, queries: list) -> int:
+        """
+        Batch-encode queries ahead of invoke() calls, see QueryEmbeddingCache.warm.
+        """
+        return self.vector.query_cache.warm(queries)
+
+    def cache_stats(self) -> dict:
+        """
+        Query-embedding cache hits, misses and current size.
+        """
+        return self.vector.query_cache.stats()
+
+    def close(self):
+        """
+        Stop the retrieval threads now instead of when the retriever is
+        garbage collected. Only call it once no caller can still query it;
+        queries already running finish first.
+        """
+        self._finalizer()
+
+    def _retrieve_concurrently(self, query: str, timeout: float, k: int = TOP_K) -> dict:
+        """
+        Run the vector and BM25 retrievers in parallel, each pulling at least
+        k candidates. Retrievers that fail or miss the deadline contribute no results.
+
+        Both share one deadline, taken at submission: time a retriever spends
+        queued behind other questions' retrievals counts against it, so the
+        call never takes much longer than timeout. Retrievers still queued
+        at the deadline are cancelled, running ones are left to finish unused.
+        """
+        futures = {
+            self._executor.submit(self.vector.retrieve, query, max(k, self.vector.similarity_top_k)): "vector",
+            self._executor.submit(self.bm25.retrieve, query, max(k, self.bm25.similarity_top_k)): "bm25",
+        }
+        done, pending = wait(futures, timeout=timeout)
+
+        results = {}
+        for future in done:
+            source = futures[future]
+            try:
+                results[source] = future.result()
+            except Exception as e:
+                logger.error(f"Error during {source} retrieval: {e}")
+                results[source] = []
+
+        for future in pending:
+            source = futures[future]
+            future.cancel()
+            logger.warning(f"Dropping {source} retrieval after {timeout}s, using partial results")
+            results[source] = []
+
+        return results
+
+    def invoke(self, query: str, timeout: float = RETRIEVAL_TIMEOUT, k: int = None):
         """
         Retrieve documents using hybrid approach (vector + BM25).
-        Optimized for large indices with timeout protection.
+        Both retrievers run concurrently and their results are fused
+        according to FUSION_MODE.
         
         Args:
             query: The search query
-            timeout: Maximum time in seconds (not enforced, just for documentation)
+            timeout: Maximum time in seconds to wait for the retrievers.
+                     Results that finished in time are returned.
+            k: Number of documents to return, TOP_K by default
             
         Returns:
             List of LangChain Document objects
         """
+        k = k or TOP_K
+        # The reranker picks the best k from a larger fused pool
+        depth = max(k, RERANK_CANDIDATES) if self.reranker else k
         try:
             logger.debug(f"Retrieving documents for query: {query}")
             
-            # Retrieve from both retrievers
-            vector_nodes = self.vector.retrieve(query)
-            bm25_nodes = self.bm25.retrieve(query)
+            results = self._retrieve_concurrently(query, timeout, depth)
+            vector_nodes = results["vector"]
+            bm25_nodes = results["bm25"]
             
             logger.debug(f"Vector retrieval: {len(vector_nodes)} nodes")
             logger.debug(f"BM25 retrieval: {len(bm25_nodes)} nodes")
@@ -84,28 +424,57 @@ class LlamaIndexHybridRetriever:
             # Return empty list on error instead of crashing
             return []
 
-        # Merge results and deduplicate
-        seen = set()
-        merged = []
+        if FUSION_MODE == "rrf":
+            fused = _reciprocal_rank_fusion(results)
+        elif FUSION_MODE == "weighted":
+            fused = _weighted_score_fusion(results)
+        else:
+            # Plain concatenation, vector hits first
+            seen = set()
+            fused = []
+            for n in vector_nodes + bm25_nodes:
+                node_id = n.node.node_id
+                if node_id not in seen:
+                    seen.add(node_id)
+                    fused.append((n.score, n))
 
-        for n in vector_nodes + bm25_nodes:
-            node_id = n.node.node_id
-            if node_id not in seen:
-                seen.add(node_id)
-                merged.append(n)
+        fused_scores = {n.node.node_id: score for score, n in fused}
+        rerank_scores = {}
+        if self.reranker:
+            try:
+                reranked = self.reranker.rerank(query, fused[:depth], k)
+                rerank_scores = {n.node.node_id: score for score, n in reranked}
+                fused = [(fused_scores[n.node.node_id], n) for _, n in reranked]
+            except Exception as e:
+                logger.error(f"Error during reranking, using fused order: {e}")
 
-        # Limit to TOP_K for efficiency
-        merged = merged[:TOP_K]
+        # Limit to the requested depth for efficiency
+        fused = fused[:k]
         
-        logger.debug(f"Merged results: {len(merged)} unique nodes")
+        logger.debug(f"Merged results: {len(fused)} unique nodes")
+
+        # Raw per-source scores, kept for relevance gating downstream
+        source_scores = {
+            source: {n.node.node_id: n.score for n in source_nodes}
+            for source, source_nodes in results.items()
+        }
+
+        # BM25 scores relative to the query's own scale, see BM25Index.normalizer
+        bm25_normalizer = self.bm25.bm25_index.normalizer(query) if source_scores.get("bm25") else 0.0
 
         # Convert to LangChain Documents
-        documents = [
-            Document(
-                page_content=n.node.text,
-                metadata=n.node.metadata or {}
-            )
-            for n in merged
-        ]
+        documents = []
+        for fused_score, n in fused:
+            metadata = dict(n.node.metadata or {})
+            metadata["fusion_score"] = fused_score
+            if n.node.node_id in rerank_scores:
+                metadata["rerank_score"] = rerank_scores[n.node.node_id]
+            for source in ("vector", "bm25"):
+                score = source_scores.get(source, {}).get(n.node.node_id)
+                if score is not None:
+                    metadata[f"{source}_score"] = score
+            if "bm25_score" in metadata and bm25_normalizer > 0:
+                metadata["bm25_norm"] = min(1.0, metadata["bm25_score"] / bm25_normalizer)
+            documents.append(Document(page_content=n.node.text, metadata=metadata))
         
         return documents
\ No newline at end of file
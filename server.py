@@ -0,0 +1,260 @@
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import logging
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from resources import get_retriever, get_workflow
+from metrics import registry as metrics_registry
+from index_manifest import index_version
+from config import (
+    INDEX_DIR,
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_WORKERS,
+    SERVER_QUEUE_SIZE,
+    SERVER_REQUEST_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceBusy(RuntimeError):
+    """
+    Raised when the request queue is full.
+    """
+
+
+class QueryService:
+    """
+    Answers questions on a fixed pool of worker threads fed by a bounded
+    queue. When every worker is busy and the queue is full, submit() fails
+    fast with ServiceBusy instead of letting latency grow without bound.
+
+    Retriever and workflows come from the process-wide registry by default;
+    pass other factories (e.g. workflows with stub LLMs) for testing.
+    """
+
+    def __init__(
+        self,
+        workers: int = SERVER_WORKERS,
+        queue_size: int = SERVER_QUEUE_SIZE,
+        workflow_for=get_workflow,
+        retriever_for=get_retriever
+    ):
+        self.workers = max(1, workers)
+        self.workflow_for = workflow_for
+        self.retriever_for = retriever_for
+        self.completed = 0
+        self.rejected = 0
+        self._active = 0
+        # At least one slot: maxsize 0 would make the queue unbounded
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"query-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, question: str, enable_verification: bool = False) -> Future:
+        """
+        Queue a question.
+
+        Returns:
+            Future resolving to the full_pipeline result dict plus timings
+
+        Raises:
+            ServiceBusy: If the queue is full
+        """
+        future = Future()
+        try:
+            self._queue.put_nowait((question, enable_verification, future, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise ServiceBusy(f"Request queue is full ({self._queue.maxsize} waiting)")
+        return future
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            question, enable_verification, future, queued_at = item
+            if not future.set_running_or_notify_cancel():
+                continue  # Client gave up while the request was queued
+
+            with self._lock:
+                self._active += 1
+            started = time.perf_counter()
+            try:
+                workflow = self.workflow_for(enable_verification)
+                result = workflow.full_pipeline(question, self.retriever_for())
+                result = {
+                    **result,
+                    "seconds": round(time.perf_counter() - started, 3),
+                    "queued_seconds": round(started - queued_at, 3)
+                }
+                future.set_result(result)
+            except Exception as e:
+                logger.exception("Query failed")
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self.completed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "active": self._active,
+                "queued": self._queue.qsize(),
+                "queue_size": self._queue.maxsize,
+                "completed": self.completed,
+                "rejected": self.rejected
+            }
+
+    def close(self):
+        """
+        Stop the workers after the requests already queued.
+        """
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+def make_handler(service: QueryService, request_timeout: float = SERVER_REQUEST_TIMEOUT):
+    """
+    Build a request handler class bound to a QueryService.
+
+    Endpoints:
+        POST /query   {"question": str, "enable_verification": bool}
+                      200 result, 400 bad request, 503 queue full, 504 timeout
+        GET  /health  service stats and index version
+        GET  /metrics pipeline and stage metrics in the Prometheus text format
+    """
+
+    class QueryHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, body: dict, headers: dict = None):
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                payload = metrics_registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+            if self.path != "/health":
+                self._send_json(404, {"error": "Not found"})
+                return
+            self._send_json(200, {**service.stats(), "index_version": index_version(INDEX_DIR)})
+
+        def do_POST(self):
+            if self.path != "/query":
+                self._send_json(404, {"error": "Not found"})
+                return
+
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                question = body.get("question", "")
+                if not isinstance(question, str) or not question.strip():
+                    raise ValueError("\"question\" must be a non-empty string")
+                enable_verification = bool(body.get("enable_verification", False))
+            except (ValueError, AttributeError) as e:
+                self._send_json(400, {"error": str(e)})
+                return
+
+            try:
+                future = service.submit(question, enable_verification)
+            except ServiceBusy as e:
+                self._send_json(503, {"error": str(e)}, {"Retry-After": "1"})
+                return
+
+            try:
+                result = future.result(timeout=request_timeout)
+            except FutureTimeout:
+                future.cancel()
+                self._send_json(504, {"error": f"No answer within {request_timeout}s"})
+                return
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+
+            self._send_json(200, result)
+
+        def log_message(self, format, *args):
+            logger.info(f"{self.address_string()} - {format % args}")
+
+    return QueryHandler
+
+
+def serve(
+    host: str = SERVER_HOST,
+    port: int = SERVER_PORT,
+    service: QueryService = None
+) -> ThreadingHTTPServer:
+    """
+    Create the HTTP server. Call serve_forever() on the result to run it.
+    """
+    service = service or QueryService()
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve full_pipeline over a local HTTP interface.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=_positive_int, default=SERVER_WORKERS, help="Questions answered concurrently")
+    parser.add_argument("--queue-size", type=_positive_int, default=SERVER_QUEUE_SIZE, help="Requests waiting before 503s")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    # Load the index and models before accepting requests
+    get_retriever()
+    get_workflow(False)
+    get_workflow(True)
+
+    server = serve(args.host, args.port, QueryService(args.workers, args.queue_size))
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,71 @@
+import os
+import sys
+import shutil
+import tempfile
+import zlib
+
+import numpy as np
+import pytest
+from llama_index.core.embeddings import BaseEmbedding
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# config creates and reads its data directories at import time, so point
+# it at a scratch directory before any test imports it
+os.environ.setdefault("RAG_DATA_DIR", tempfile.mkdtemp(prefix="rag-tests-"))
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("LLM_FAKE_LATENCY", "0")
+
+
+class HashingModel(BaseEmbedding):
+    """
+    Deterministic bag-of-words embeddings, standing in for the HF model.
+    """
+
+    def _get_text_embedding(self, text: str):
+        vector = np.zeros(64, dtype=np.float32)
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode()) % 64] += 1.0
+        return vector.tolist()
+
+    def _get_query_embedding(self, query: str):
+        return self._get_text_embedding(query)
+
+    async def _aget_query_embedding(self, query: str):
+        return self._get_text_embedding(query)
+
+
+@pytest.fixture
+def index(monkeypatch):
+    """
+    Empty upload and index directories, with ingestion embedding through
+    HashingModel in-process.
+    """
+    # ingest imports the HuggingFace embedding integration; the model itself is never loaded
+    pytest.importorskip("llama_index.embeddings.huggingface")
+    import config
+    import ingest
+    import embedding_engine
+    from embedding_engine import EmbeddingEngine
+
+    for path in (config.UPLOAD_DIR, config.INDEX_DIR):
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+    monkeypatch.setattr(embedding_engine, "EMBED_CACHE_ENABLED", False)
+    monkeypatch.setattr(ingest, "EmbeddingEngine", lambda: EmbeddingEngine(model=HashingModel(), workers=1))
+    monkeypatch.setattr(ingest, "PARSE_WORKERS", 1)
+    return config
+
+
+def add_pdf(name: str, word: str, pages: int = 3):
+    """
+    Write a PDF of distinctive words into the upload directory.
+    """
+    import config
+    from benchmark import write_pdf
+
+    write_pdf(
+        os.path.join(config.UPLOAD_DIR, name),
+        [f"{word} page {p} " + " ".join(f"{word}{i}" for i in range(120)) for p in range(pages)]
+    )
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from ann_index import (
+    ExactIndex,
+    IVFIndex,
+    build_ann_index,
+    load_ann_index,
+    normalize,
+    save_ann_index,
+)
+
+
+@pytest.fixture
+def vectors():
+    # Clustered data, as real embeddings are
+    rng = np.random.default_rng(7)
+    centers = normalize(rng.normal(size=(16, 32)))
+    return normalize(np.repeat(centers, 64, axis=0) + 0.15 * rng.normal(size=(1024, 32)))
+
+
+def exact_top(vectors, query, k):
+    return set(np.argsort(-(vectors @ query))[:k])
+
+
+def test_normalize_handles_zero_rows():
+    out = normalize(np.array([[3.0, 4.0], [0.0, 0.0]]))
+    assert np.allclose(out, [[0.6, 0.8], [0.0, 0.0]])
+
+
+def test_exact_search_is_sorted_and_honours_exclude(vectors):
+    index = build_ann_index(vectors, backend="exact")
+    rows, scores = index.search(vectors[5], 4)
+    assert rows[0] == 5 and np.all(np.diff(scores) <= 0)
+
+    exclude = np.zeros(len(vectors), dtype=bool)
+    exclude[5] = True
+    rows, _ = index.search(vectors[5], 4, exclude=exclude)
+    assert 5 not in rows and len(rows) == 4
+
+
+def test_ivf_recall_against_exact(vectors):
+    index = build_ann_index(vectors, backend="ivf", nlist=16, nprobe=4)
+    queries = vectors[::37]
+    recall = np.mean([
+        len(set(index.search(q, 10)[0]) & exact_top(vectors, q, 10)) / 10
+        for q in queries
+    ])
+    assert recall >= 0.9
+
+
+def test_ivf_add_assigns_new_rows(vectors):
+    index = IVFIndex.build(vectors[:800], nlist=16, nprobe=16)
+    index = index.add(vectors, first_row=800)
+    assert index.built_rows == 800 and len(index.list_rows) == len(vectors)
+
+    # Probing every list is exact
+    for row in (800, 1000, 1023):
+        assert index.search(vectors[row], 1)[0][0] == row
+
+
+def test_small_corpus_falls_back_to_exact(vectors):
+    assert isinstance(build_ann_index(vectors[:10], backend="ivf", min_vectors=100), ExactIndex)
+
+
+def test_unknown_backend_is_rejected(vectors):
+    with pytest.raises(ValueError, match="Unknown ANN backend"):
+        build_ann_index(vectors, backend="annoy")
+
+
+def test_save_and_load_with_overridden_nprobe(tmp_path, vectors):
+    index = build_ann_index(vectors, backend="ivf", nlist=16, nprobe=2)
+    save_ann_index(index, str(tmp_path))
+
+    loaded = load_ann_index(str(tmp_path), vectors, nprobe=16)
+    assert isinstance(loaded, IVFIndex) and loaded.nprobe == 16 and loaded.built_rows == len(vectors)
+    rows, scores = loaded.search(vectors[3], 5)
+    assert set(rows) == exact_top(vectors, vectors[3], 5)
+
+    # Params saved at build time are used when not overridden
+    assert load_ann_index(str(tmp_path), vectors, nprobe=None).nprobe == 2
+
+
+def test_hnsw_backend(tmp_path, vectors):
+    pytest.importorskip("hnswlib")
+    index = build_ann_index(vectors[:512], backend="hnsw", ef_search=64)
+    index = index.add(vectors, first_row=512)
+    save_ann_index(index, str(tmp_path))
+
+    loaded = load_ann_index(str(tmp_path), vectors)
+    exclude = np.zeros(len(vectors), dtype=bool)
+    exclude[700] = True
+    assert loaded.search(vectors[700], 1)[0][0] == 700
+    assert 700 not in loaded.search(vectors[700], 3, exclude=exclude)[0]
+
+
+def test_hnsw_search_leaves_ef_alone(vectors):
+    pytest.importorskip("hnswlib")
+    index = build_ann_index(vectors, backend="hnsw", ef_search=16)
+
+    # k above ef_search, and over-fetching past tombstones
+    rows, _ = index.search(vectors[3], 40)
+    assert len(rows) == 40 and 3 in rows
+    exclude = np.zeros(len(vectors), dtype=bool)
+    exclude[np.argsort(-(vectors @ vectors[3]))[:30]] = True
+    rows, _ = index.search(vectors[3], 20, exclude=exclude)
+    assert len(rows) == 20 and not exclude[rows].any()
+    # Concurrent searches share the index, so none may change its ef
+    assert index.index.ef == 16
+
+
+def test_save_replaces_meta_atomically(tmp_path, vectors):
+    save_ann_index(build_ann_index(vectors, backend="exact"), str(tmp_path))
+    assert sorted(p.name for p in tmp_path.iterdir() if p.name.startswith("meta")) == ["meta.json"]
+    assert load_ann_index(str(tmp_path), vectors).backend == "exact"
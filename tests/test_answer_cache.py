@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+# answer_cache imports the HuggingFace embedding integration through retriever
+pytest.importorskip("llama_index.embeddings.huggingface")
+
+import index_manifest
+from agents.answer_cache import AnswerCache
+from index_manifest import empty_manifest, save_manifest
+
+RESULT = {"draft_answer": "Two years.", "verification_report": ""}
+
+
+def bump(index_dir, version):
+    save_manifest(str(index_dir), {**empty_manifest({}), "version": version})
+
+
+def test_exact_hit_ignores_case_and_whitespace(tmp_path):
+    cache = AnswerCache(index_dir=str(tmp_path))
+    cache.put("How long is the warranty?", False, RESULT)
+    assert cache.get("  how LONG is the   warranty? ", False) == RESULT
+    assert cache.get("How long is the warranty?", True) is None
+    assert cache.stats() == {"hits": 1, "semantic_hits": 0, "misses": 1, "size": 1}
+
+
+def test_new_index_version_invalidates_answers(tmp_path):
+    bump(tmp_path, 1)
+    cache = AnswerCache(index_dir=str(tmp_path))
+    cache.put("q", False, RESULT)
+    bump(tmp_path, 2)
+    assert cache.get("q", False) is None
+    assert cache.stats()["size"] == 0
+
+    # An answer computed against the old version is not stored under the new one
+    cache.put("q", False, RESULT, version=1)
+    assert cache.get("q", False) is None
+
+
+def test_expired_and_least_recent_entries_are_dropped(tmp_path, monkeypatch):
+    cache = AnswerCache(ttl=10, max_size=2, index_dir=str(tmp_path))
+    now = [1000.0]
+    monkeypatch.setattr("agents.answer_cache.time.time", lambda: now[0])
+    for question in ("a", "b", "c"):
+        cache.put(question, False, RESULT)
+    assert cache.get("a", False) is None and cache.get("c", False) == RESULT
+
+    now[0] += 11
+    assert cache.get("c", False) is None
+
+
+def test_semantic_hit_needs_the_similarity_threshold(tmp_path):
+    cache = AnswerCache(semantic=True, similarity_threshold=0.9, index_dir=str(tmp_path))
+    stored = np.array([1.0, 0.0], dtype=np.float32)
+    cache.put("How long is the warranty?", False, RESULT, embedding=stored)
+
+    close = np.array([0.95, np.sqrt(1 - 0.95 ** 2)], dtype=np.float32)
+    far = np.array([0.5, np.sqrt(1 - 0.25)], dtype=np.float32)
+    assert cache.get("What's the warranty period?", False, embedding=close) == RESULT
+    assert cache.get("Who makes it?", False, embedding=far) is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_current_version_reads_the_manifest_only_when_it_changes(tmp_path, monkeypatch):
+    bump(tmp_path, 3)
+    cache = AnswerCache(index_dir=str(tmp_path))
+    reads = []
+    load = index_manifest.load_manifest
+    monkeypatch.setattr(index_manifest, "load_manifest", lambda path: reads.append(path) or load(path))
+
+    assert [cache.current_version() for _ in range(5)] == [3] * 5
+    assert len(reads) == 1
+
+    bump(tmp_path, 4)
+    assert cache.current_version() == 4
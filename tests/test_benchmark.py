@@ -0,0 +1,14 @@
+from benchmark import summarize
+
+
+def test_summarize_reports_percentiles_in_milliseconds():
+    summary = summarize([0.01, 0.02, 0.03, 0.04], elapsed=0.1)
+    assert summary["count"] == 4
+    assert summary["p50_ms"] == 25.0 and summary["max_ms"] == 40.0
+    assert summary["throughput_per_s"] == 40.0
+
+
+def test_summarize_without_samples_has_no_latencies():
+    summary = summarize([], elapsed=0.0)
+    assert summary["count"] == 0 and summary["throughput_per_s"] == 0.0
+    assert all(summary[key] is None for key in ("p50_ms", "p95_ms", "p99_ms", "mean_ms", "max_ms"))
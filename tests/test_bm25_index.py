@@ -0,0 +1,133 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from bm25_index import BM25Index
+
+TEXTS = [
+    "The warranty covers parts and labour for two years.",
+    "Returns are accepted within thirty days of purchase.",
+    "Labour costs are not covered after the warranty expires.",
+    "Shipping is free for orders over fifty dollars.",
+]
+IDS = [f"node-{i}" for i in range(len(TEXTS))]
+
+
+def reference_scores(texts, query, k1=1.5, b=0.75):
+    """
+    Textbook BM25 over the same tokenizer.
+    """
+    docs = [BM25Index.tokenize(text) for text in texts]
+    avgdl = sum(map(len, docs)) / len(docs)
+    scores = np.zeros(len(docs))
+    for term in set(BM25Index.tokenize(query)):
+        df = sum(term in doc for doc in docs)
+        if not df:
+            continue
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        for i, doc in enumerate(docs):
+            tf = doc.count(term)
+            scores[i] += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(doc) / avgdl))
+    return scores
+
+
+def test_tokenize_drops_stopwords_and_stems():
+    assert BM25Index.tokenize("The warranties are covering THE parts") == ["warranti", "cover", "part"]
+
+
+def test_search_matches_reference_bm25():
+    index = BM25Index.build(IDS, TEXTS)
+    rows, scores = index.search("warranty labour", top_k=len(TEXTS))
+
+    expected = reference_scores(TEXTS, "warranty labour")
+    assert list(rows) == list(np.argsort(-expected)[:2])
+    assert np.allclose(scores, expected[rows], rtol=1e-5)
+
+
+def test_top_k_and_exclude_mask():
+    index = BM25Index.build(IDS, TEXTS)
+    rows, _ = index.search("warranty labour", top_k=1)
+    assert list(rows) == [2]
+
+    exclude = np.array([False, False, True, False])
+    rows, _ = index.search("warranty labour", top_k=2, exclude=exclude)
+    assert list(rows) == [0]
+
+
+def test_no_matching_terms_returns_nothing():
+    rows, scores = BM25Index.build(IDS, TEXTS).search("zebra", top_k=3)
+    assert len(rows) == 0 and len(scores) == 0
+
+
+def test_incremental_add_equals_full_build():
+    incremental = BM25Index.build(IDS[:2], TEXTS[:2]).add_documents(IDS[2:], TEXTS[2:])
+    full = BM25Index.build(IDS, TEXTS)
+
+    assert list(incremental.node_ids) == list(full.node_ids)
+    assert np.array_equal(incremental.vocab, full.vocab)
+    for query in ("warranty labour", "free shipping orders", "returns purchase"):
+        inc_rows, inc_scores = incremental.search(query, 4)
+        full_rows, full_scores = full.search(query, 4)
+        assert list(inc_rows) == list(full_rows)
+        assert np.allclose(inc_scores, full_scores)
+
+
+def test_remove_documents_equals_build_without_them():
+    removed = BM25Index.build(IDS, TEXTS).remove_documents(["node-0", "node-3"])
+    rebuilt = BM25Index.build([IDS[1], IDS[2]], [TEXTS[1], TEXTS[2]])
+
+    assert list(removed.node_ids) == ["node-1", "node-2"]
+    rows, scores = removed.search("warranty labour", 4)
+    expected_rows, expected_scores = rebuilt.search("warranty labour", 4)
+    assert list(rows) == list(expected_rows) and np.allclose(scores, expected_scores)
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_and_load_round_trip(tmp_path, mmap):
+    index = BM25Index.build(IDS, TEXTS)
+    index.save(str(tmp_path))
+    assert BM25Index.exists(str(tmp_path))
+
+    # Per-term and per-document data live in the arrays, not in meta.json
+    with open(tmp_path / "meta.json", encoding="utf-8") as f:
+        assert set(json.load(f)) == {"k1", "b"}
+
+    loaded = BM25Index.load(str(tmp_path), mmap=mmap)
+    assert list(loaded.node_ids) == IDS and np.array_equal(loaded.vocab, index.vocab)
+    rows, scores = loaded.search("returns within thirty days", 2)
+    expected_rows, expected_scores = index.search("returns within thirty days", 2)
+    assert list(rows) == list(expected_rows) and np.allclose(scores, expected_scores)
+
+
+def test_loads_indices_with_vocab_in_meta(tmp_path):
+    index = BM25Index.build(IDS, TEXTS)
+    index.save(str(tmp_path))
+
+    # Older indices listed terms in first-seen order in meta.json
+    first_seen = list(dict.fromkeys(token for text in TEXTS for token in BM25Index.tokenize(text)))
+    positions = np.searchsorted(index.vocab, first_seen)
+    counts = np.diff(index.term_offsets)[positions]
+    postings = np.concatenate([np.arange(index.term_offsets[t], index.term_offsets[t + 1]) for t in positions])
+    np.save(tmp_path / "term_offsets.npy", np.concatenate([[0], np.cumsum(counts)]))
+    np.save(tmp_path / "postings_docs.npy", index.postings_docs[postings])
+    np.save(tmp_path / "postings_tfs.npy", index.postings_tfs[postings])
+    with open(tmp_path / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"k1": index.k1, "b": index.b, "vocab": first_seen, "node_ids": IDS}, f)
+
+    loaded = BM25Index.load(str(tmp_path))
+    assert list(loaded.node_ids) == IDS
+    rows, scores = loaded.search("warranty labour", 4)
+    expected_rows, expected_scores = index.search("warranty labour", 4)
+    assert list(rows) == list(expected_rows) and np.allclose(scores, expected_scores)
+
+
+def test_normalizer_scales_scores_to_the_query():
+    index = BM25Index.build(IDS, TEXTS)
+    rows, scores = index.search("shipping orders", 1)
+    full_match = scores[0] / index.normalizer("shipping orders")
+    partial_match = scores[0] / index.normalizer("shipping orders refunds")
+
+    assert 0.5 < full_match <= 1.5
+    assert partial_match < full_match
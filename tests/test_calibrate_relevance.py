@@ -0,0 +1,29 @@
+from calibrate_relevance import calibrate
+
+
+def sample(label, vector, bm25_norm=0.0, bm25=0.0):
+    return {"label": label, "scores": [(vector, bm25_norm, bm25 or bm25_norm * 10)]}
+
+
+def test_calibrate_separates_labelled_scores():
+    samples = (
+        [sample("CAN_ANSWER", 0.9, 0.8)] * 8
+        + [sample("PARTIAL", 0.9, 0.35)] * 4
+        + [sample("PARTIAL", 0.7, 0.4)] * 4
+        + [sample("PARTIAL", 0.72)] * 2
+        + [sample("NO_MATCH", 0.5)] * 6
+        + [sample("NO_MATCH", 0.62, 0.0, bm25=0.5)]
+    )
+    result = calibrate(samples, target_precision=0.95)
+
+    assert result["can_answer_precision"] == 1.0 and result["can_answer_coverage"] == 8 / len(samples)
+    assert 0.35 < result["bm25"] <= 0.8
+    assert 0.7 < result["high"] <= 0.9
+    assert 0.5 < result["low"] <= 0.72
+    assert result["no_match_precision"] == 1.0 and result["no_match_coverage"] == 6 / len(samples)
+
+
+def test_calibrate_reports_unreachable_precision():
+    samples = [sample("CAN_ANSWER", 0.9, 0.9), sample("NO_MATCH", 0.9, 0.9)]
+    result = calibrate(samples)
+    assert result["high"] is None and result["can_answer_coverage"] == 0.0
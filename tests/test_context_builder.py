@@ -0,0 +1,67 @@
+from langchain_core.documents import Document
+from llama_index.core.utils import get_tokenizer
+
+from agents.context_builder import _merge_page_chunks, _overlap, build_context
+
+
+def doc(text, file_name="a.pdf", page="1"):
+    return Document(page_content=text, metadata={"file_name": file_name, "page_label": page})
+
+
+def test_overlap_finds_the_shared_span():
+    assert _overlap("the warranty lasts two years", "two years unless extended") == len("two years")
+    assert _overlap("short end", "unrelated start") == 0
+    # Below the minimum overlap it is coincidence
+    assert _overlap("ends in ab", "ab starts") == 0
+
+
+def test_page_chunks_are_stitched_in_either_order():
+    first = "The warranty covers parts and labour for two full years"
+    second = "labour for two full years from the date of purchase."
+    assert _merge_page_chunks([second, first]) == [
+        "The warranty covers parts and labour for two full years from the date of purchase."
+    ]
+
+
+def test_duplicate_and_contained_chunks_are_dropped():
+    assert _merge_page_chunks(["abc def ghi jkl", "def ghi", "abc def ghi jkl", "  "]) == ["abc def ghi jkl"]
+
+
+def test_context_keeps_page_order_by_best_chunk():
+    context = build_context([
+        doc("Returns are accepted within thirty days.", page="4"),
+        doc("The warranty covers parts and labour for two full years", page="2"),
+        doc("labour for two full years from the date of purchase.", page="2"),
+    ])
+    assert context.split("\n\n") == [
+        "Returns are accepted within thirty days.",
+        "The warranty covers parts and labour for two full years from the date of purchase.",
+    ]
+
+
+def test_chunks_from_other_pages_are_not_merged():
+    context = build_context([
+        doc("The warranty covers parts and labour for two full years", page="1"),
+        doc("labour for two full years from the date of purchase.", page="2"),
+    ])
+    assert len(context.split("\n\n")) == 2
+
+
+def test_budget_skips_segments_that_do_not_fit():
+    tokenizer = get_tokenizer()
+    long_text = " ".join(f"word{i}" for i in range(400))
+    short_text = "Shipping is free."
+    budget = len(tokenizer(short_text)) + 10
+
+    context = build_context([doc(long_text, page="1"), doc(short_text, page="2")], token_budget=budget)
+    assert context == short_text
+
+
+def test_first_segment_is_cut_when_nothing_fits():
+    long_text = " ".join(f"word{i}" for i in range(400))
+    context = build_context([doc(long_text)], token_budget=50)
+    assert long_text.startswith(context) and 0 < len(get_tokenizer()(context)) <= 60
+
+
+def test_empty_input():
+    assert build_context([]) == ""
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+import embedding_cache
+from embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache" / "embeddings.sqlite")
+
+
+def vectors(n, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_round_trip_and_stats(cache_path):
+    cache = EmbeddingCache(cache_path, model_name="m")
+    embeddings = vectors(3)
+    cache.put_many(["a", "b", "c"], embeddings)
+
+    found = cache.get_many(["c", "x", "a", "c"])
+    assert sorted(found) == [0, 2, 3]
+    assert np.array_equal(found[0], embeddings[2]) and np.array_equal(found[2], embeddings[0])
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert cache.size_bytes == 3 * 8 * 4
+
+
+def test_entries_persist_and_are_per_model(cache_path):
+    EmbeddingCache(cache_path, model_name="m").put_many(["a"], vectors(1))
+
+    assert 0 in EmbeddingCache(cache_path, model_name="m").get_many(["a"])
+    assert EmbeddingCache(cache_path, model_name="other").get_many(["a"]) == {}
+
+
+def test_reinserting_does_not_grow_the_size(cache_path):
+    cache = EmbeddingCache(cache_path, model_name="m")
+    cache.put_many(["a", "b"], vectors(2))
+    cache.put_many(["a", "b"], vectors(2, seed=1))
+    assert cache.size_bytes == 2 * 8 * 4
+
+
+def test_evicts_least_recently_used(cache_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: clock[0])
+    row_bytes = 8 * 4
+    cache = EmbeddingCache(cache_path, model_name="m", max_bytes=4 * row_bytes)
+
+    for text in ("a", "b", "c", "d"):
+        clock[0] += 1
+        cache.put_many([text], vectors(1))
+    clock[0] += 1
+    cache.get_many(["a"])  # "a" is now the most recently used
+
+    clock[0] += 1
+    cache.put_many(["e"], vectors(1))
+
+    # Evicted down to 90% of the limit: the two least recently used go
+    assert sorted(cache.get_many(["a", "b", "c", "d", "e"])) == [0, 3, 4]
+    assert cache.size_bytes == 3 * row_bytes
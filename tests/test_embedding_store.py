@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from llama_index.core.schema import TextNode
+
+from embedding_store import EmbeddingStore
+
+
+def nodes(*texts):
+    return [TextNode(id_=f"id-{text}", text=text, metadata={"page_label": text}) for text in texts]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EmbeddingStore.create(str(tmp_path), dim=4)
+
+
+def test_append_normalizes_and_reopens(store, tmp_path):
+    rows = store.append(nodes("a", "b"), [[3, 4, 0, 0], [0, 0, 0, 0]])
+    assert rows == range(0, 2)
+    store.append(nodes("c"), [[0, 0, 2, 0]])
+
+    reopened = EmbeddingStore(str(tmp_path))
+    assert len(reopened) == 3
+    assert np.allclose(reopened.vectors, [[0.6, 0.8, 0, 0], [0, 0, 0, 0], [0, 0, 1, 0]])
+    node = reopened.get_node(2)
+    assert (node.node_id, node.text, node.metadata) == ("id-c", "c", {"page_label": "c"})
+
+
+def test_float16_halves_the_matrix(tmp_path):
+    store = EmbeddingStore.create(str(tmp_path), dim=4, dtype="float16")
+    store.append(nodes("a"), [[1, 0, 0, 0]])
+    assert EmbeddingStore(str(tmp_path)).vectors.dtype == np.float16
+
+
+def test_uncommitted_rows_are_ignored(store, tmp_path):
+    store.append(nodes("a"), np.eye(1, 4))
+
+    # Bytes appended past the committed count without a meta.json update
+    with open(tmp_path / "embeddings.bin", "ab") as f:
+        f.write(np.ones(4, dtype=np.float32).tobytes())
+    with open(tmp_path / "nodes.jsonl", "ab") as f:
+        f.write(b'{"id": "ghost", "text": "ghost", "metadata": {}}\n')
+
+    reopened = EmbeddingStore(str(tmp_path))
+    assert len(reopened) == 1
+    reopened.append(nodes("b"), np.eye(1, 4))
+    assert [record["id"] for _, record in EmbeddingStore(str(tmp_path)).iter_records()] == ["id-a", "id-b"]
+
+
+def test_delete_tombstones_rows(store, tmp_path):
+    store.append(nodes("a", "b", "c"), np.eye(3, 4))
+    assert store.exclude_mask is None
+    store.delete([1])
+
+    reopened = EmbeddingStore(str(tmp_path))
+    assert reopened.deleted.tolist() == [False, True, False]
+    assert (reopened.deleted_count, reopened.live_count) == (1, 2)
+    assert reopened.exclude_mask is not None
+
+
+def test_compact_drops_tombstoned_rows(store, tmp_path):
+    store.append(nodes("a", "b", "c", "d"), np.eye(4))
+    store.delete([0, 2])
+    remap = store.compact()
+
+    assert remap.tolist() == [-1, 0, -1, 1]
+    reopened = EmbeddingStore(str(tmp_path))
+    assert [record["text"] for _, record in reopened.iter_records()] == ["b", "d"]
+    assert np.allclose(reopened.vectors, np.eye(4)[[1, 3]])
+    assert reopened.deleted_count == 0
+
+
+def test_truncate_drops_trailing_rows(store, tmp_path):
+    store.append([TextNode(text=f"chunk {i}") for i in range(5)], np.eye(5, 4))
+    store.delete([1, 4])
+    store.truncate(3)
+
+    reopened = EmbeddingStore(str(tmp_path))
+    assert len(reopened) == 3
+    assert reopened.deleted.tolist() == [False, True, False]
+    assert [record["text"] for _, record in reopened.iter_records()] == ["chunk 0", "chunk 1", "chunk 2"]
+
+    reopened.append([TextNode(text="chunk new")], np.ones((1, 4)))
+    assert EmbeddingStore(str(tmp_path)).get_record(3)["text"] == "chunk new"
+
+
+def test_readers_keep_their_mapping_across_rewrites(store, tmp_path):
+    store.append(nodes("a", "b"), np.eye(2, 4))
+    reader = EmbeddingStore(str(tmp_path))
+    store.delete([0])
+    store.compact()
+
+    # Files are replaced, not rewritten in place
+    assert reader.get_record(1)["text"] == "b" and len(reader) == 2
@@ -0,0 +1,51 @@
+import hashlib
+import os
+
+import pytest
+
+from index_manifest import (
+    MANIFEST_FILE,
+    empty_manifest,
+    file_sha256,
+    index_version,
+    load_manifest,
+    row_ranges,
+    rows_of,
+    save_manifest,
+)
+
+
+def test_file_sha256_hashes_in_chunks(tmp_path):
+    path = tmp_path / "a.pdf"
+    data = os.urandom(100_000)
+    path.write_bytes(data)
+    assert file_sha256(str(path), chunk_size=4096) == hashlib.sha256(data).hexdigest()
+
+
+def test_missing_manifest(tmp_path):
+    assert load_manifest(str(tmp_path)) is None
+    assert index_version(str(tmp_path)) == 0
+
+
+def test_save_replaces_atomically(tmp_path):
+    manifest = {**empty_manifest({"chunk_size": 512}), "version": 2}
+    save_manifest(str(tmp_path), manifest)
+
+    assert load_manifest(str(tmp_path)) == manifest
+    assert os.listdir(tmp_path) == [MANIFEST_FILE]
+    assert index_version(str(tmp_path)) == 2
+
+
+def test_index_version_follows_every_save(tmp_path):
+    for version in range(1, 6):
+        save_manifest(str(tmp_path), {**empty_manifest({}), "version": version})
+        assert index_version(str(tmp_path)) == version
+
+
+@pytest.mark.parametrize("rows", [[], [0], [0, 1, 2], [0, 1, 5, 6, 9]])
+def test_row_ranges_round_trip(rows):
+    assert rows_of(row_ranges(rows)) == rows
+
+
+def test_row_ranges_collapse_runs():
+    assert row_ranges([3, 4, 5, 8, 10, 11]) == [[3, 6], [8, 9], [10, 12]]
@@ -0,0 +1,128 @@
+import os
+
+import numpy as np
+import pytest
+
+# ingest imports the HuggingFace embedding integration; the model itself is never loaded
+pytest.importorskip("llama_index.embeddings.huggingface")
+
+import config
+import ingest
+from conftest import add_pdf
+from agents.answer_cache import AnswerCache
+from bm25_index import BM25Index
+from ann_index import load_ann_index
+from embedding_store import EmbeddingStore
+from index_manifest import load_manifest, rows_of
+
+
+def assert_consistent():
+    """
+    Store, manifest, BM25 and ANN all describe the same rows.
+    """
+    store = EmbeddingStore(config.STORE_DIR)
+    manifest = load_manifest(config.INDEX_DIR)
+    assert len(store) == manifest["row_count"]
+
+    bm25 = BM25Index.load(config.BM25_DIR)
+    assert list(bm25.node_ids) == [record["id"] for _, record in store.iter_records()]
+
+    ann = load_ann_index(config.ANN_DIR, store.vectors)
+    for row in range(len(store)):
+        if store.deleted[row]:
+            continue
+        rows, _ = ann.search(np.asarray(store.vectors[row], dtype=np.float32), 1, exclude=store.exclude_mask)
+        assert store.get_record(int(rows[0]))["text"] == store.get_record(row)["text"]
+    return store, bm25
+
+
+def test_incremental_ingest_skips_unchanged_files(index):
+    add_pdf("a.pdf", "alpha")
+    assert ingest.ingest_pdfs()["added"] == ["a.pdf"]
+    add_pdf("b.pdf", "bravo")
+    summary = ingest.ingest_pdfs()
+    assert summary["added"] == ["b.pdf"] and summary["unchanged"] == ["a.pdf"]
+    assert_consistent()
+
+
+def test_changed_and_removed_files_replace_their_chunks(index):
+    add_pdf("a.pdf", "alpha")
+    add_pdf("b.pdf", "bravo")
+    ingest.ingest_pdfs()
+    version = load_manifest(config.INDEX_DIR)["version"]
+
+    add_pdf("a.pdf", "charlie")
+    os.remove(os.path.join(config.UPLOAD_DIR, "b.pdf"))
+    summary = ingest.ingest_pdfs()
+    assert summary["added"] == ["a.pdf"] and summary["removed"] == ["b.pdf"]
+
+    manifest = load_manifest(config.INDEX_DIR)
+    assert manifest["version"] == version + 1 and list(manifest["files"]) == ["a.pdf"]
+    store, bm25 = assert_consistent()
+    texts = [store.get_record(row)["text"] for row in rows_of(manifest["files"]["a.pdf"]["rows"])]
+    assert texts and all("charlie" in text for text in texts)
+
+    live = [record["text"] for row, record in store.iter_records() if not store.deleted[row]]
+    assert not any("alpha" in text or "bravo" in text for text in live)
+    assert len(bm25.search("bravo7", 1, exclude=store.exclude_mask)[0]) == 0
+
+
+@pytest.mark.parametrize("crash_point", ["update_search_indices", "save_manifest"])
+def test_recovers_from_crash_after_append(index, monkeypatch, crash_point):
+    add_pdf("a.pdf", "alpha")
+    ingest.ingest_pdfs()
+    committed_rows = load_manifest(config.INDEX_DIR)["row_count"]
+
+    # Crash after the new rows were appended, before the manifest committed them
+    add_pdf("b.pdf", "bravo")
+
+    def crash(*args, **kwargs):
+        raise KeyboardInterrupt("simulated crash")
+
+    with monkeypatch.context() as m:
+        m.setattr(ingest, crash_point, crash)
+        with pytest.raises(KeyboardInterrupt):
+            ingest.ingest_pdfs()
+    assert len(EmbeddingStore(config.STORE_DIR)) > committed_rows
+
+    summary = ingest.ingest_pdfs()
+    assert summary["added"] == ["b.pdf"]
+    store, bm25 = assert_consistent()
+    assert not store.deleted_count
+
+    rows, _ = bm25.search("bravo7", 1)
+    assert store.get_record(int(rows[0]))["metadata"]["file_name"] == "b.pdf"
+
+def test_full_rebuild_bumps_the_version_and_invalidates_cached_answers(index):
+    add_pdf("a.pdf", "alpha")
+    ingest.ingest_pdfs()
+    add_pdf("b.pdf", "bravo")
+    ingest.ingest_pdfs()
+    version = load_manifest(config.INDEX_DIR)["version"]
+
+    cache = AnswerCache(index_dir=config.INDEX_DIR)
+    cache.put("What is alpha?", False, {"draft_answer": "A letter.", "verification_report": ""})
+    assert cache.get("What is alpha?", False) is not None
+
+    ingest.ingest_pdfs(full_rebuild=True)
+    assert load_manifest(config.INDEX_DIR)["version"] == version + 1
+    assert cache.get("What is alpha?", False) is None
+
+
+def test_settings_change_without_pdfs_clears_the_old_index(index, monkeypatch):
+    add_pdf("a.pdf", "alpha")
+    ingest.ingest_pdfs()
+    version = load_manifest(config.INDEX_DIR)["version"]
+
+    os.remove(os.path.join(config.UPLOAD_DIR, "a.pdf"))
+    monkeypatch.setattr(ingest, "CHUNK_SIZE", ingest.CHUNK_SIZE + 1)
+    ingest.ingest_pdfs()
+
+    manifest = load_manifest(config.INDEX_DIR)
+    assert manifest["version"] == version + 1 and manifest["files"] == {} and manifest["row_count"] == 0
+    assert not EmbeddingStore.exists(config.STORE_DIR) and not BM25Index.exists(config.BM25_DIR)
+
+    # The next ingestion starts from the empty index
+    add_pdf("b.pdf", "bravo")
+    assert ingest.ingest_pdfs()["added"] == ["b.pdf"]
+    assert_consistent()
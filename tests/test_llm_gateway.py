@@ -0,0 +1,229 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+import llm_gateway
+from llm_gateway import FakeChatModel, LLMGateway, RateLimiter, TokenBucket, _is_retryable, _retry_delay, create_llm
+from metrics import stage_span
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"status_code": status_code, "headers": headers or {}})()
+
+
+class FlakyModel:
+    """
+    Raises the queued errors in order, then answers.
+    """
+
+    def __init__(self, *errors, chunks=("a ", "b "), fail_after_chunk=False):
+        self.errors = list(errors)
+        self.chunks = chunks
+        self.fail_after_chunk = fail_after_chunk
+        self.calls = 0
+
+    def _next(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+
+    def invoke(self, prompt):
+        self._next()
+        return AIMessage(content="ok", usage_metadata={"input_tokens": 3, "output_tokens": 2, "total_tokens": 5})
+
+    async def ainvoke(self, prompt):
+        return self.invoke(prompt)
+
+    def stream(self, prompt):
+        self.calls += 1
+        for chunk in self.chunks:
+            yield AIMessageChunk(content=chunk)
+            if self.fail_after_chunk:
+                raise ConnectionError("dropped mid-stream")
+        if self.errors:
+            raise self.errors.pop(0)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "_retry_delay", lambda error, attempt: 0.0)
+
+
+def gateway(model, **kwargs):
+    return LLMGateway(model, RateLimiter(0, 0), **kwargs)
+
+
+def test_token_bucket_waits_for_overdraft_and_refunds():
+    bucket = TokenBucket(60, capacity=10)  # One token per second
+    assert bucket.reserve(10) == 0.0
+    assert bucket.reserve(5) == pytest.approx(5.0, abs=0.1)
+
+    bucket.refund(5)
+    assert bucket.reserve(0) == pytest.approx(0.0, abs=0.1)
+
+    # Refunds never fill the bucket past its capacity
+    bucket.refund(100)
+    assert bucket.reserve(10) == pytest.approx(0.0, abs=0.1)
+
+
+def test_disabled_bucket_never_waits():
+    bucket = TokenBucket(0)
+    assert bucket.reserve(1_000_000) == 0.0
+    bucket.refund(-1_000_000)
+    assert bucket.reserve(1) == 0.0
+
+
+def test_rate_limiter_waits_for_the_tighter_limit():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600)
+    assert limiter.reserve(600) == 0.0
+    # One request left in the request bucket, but the token bucket is empty
+    assert limiter.reserve(60) == pytest.approx(6.0, abs=0.1)
+
+
+def test_retryable_errors():
+    assert _is_retryable(TimeoutError())
+    assert _is_retryable(asyncio.TimeoutError())
+    assert _is_retryable(ConnectionError())
+    assert _is_retryable(HTTPError(429))
+    assert _is_retryable(HTTPError(503))
+    assert not _is_retryable(HTTPError(400))
+    assert not _is_retryable(ValueError("bad prompt"))
+
+
+def test_retry_delay_honours_retry_after_and_caps_backoff(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "LLM_RETRY_BASE_DELAY", 1.0)
+    monkeypatch.setattr(llm_gateway, "LLM_RETRY_MAX_DELAY", 4.0)
+    assert _retry_delay(HTTPError(429, {"retry-after": "2"}), attempt=0) == 2.0
+    assert _retry_delay(HTTPError(429, {"retry-after": "30"}), attempt=0) == 4.0
+    for attempt in range(6):
+        assert 0.0 <= _retry_delay(HTTPError(503), attempt) <= min(4.0, 2 ** attempt)
+
+
+def test_invoke_retries_retryable_errors_and_records_usage():
+    model = FlakyModel(HTTPError(429), TimeoutError())
+    with stage_span("research") as span:
+        response = gateway(model, max_retries=2).invoke("question")
+    assert response.content == "ok"
+    assert model.calls == 3
+    assert (span["llm_calls"], span["prompt_tokens"], span["completion_tokens"]) == (1, 3, 2)
+
+
+def test_invoke_gives_up_after_max_retries_and_on_client_errors():
+    model = FlakyModel(HTTPError(503), HTTPError(503))
+    with pytest.raises(HTTPError):
+        gateway(model, max_retries=1).invoke("question")
+    assert model.calls == 2
+
+    model = FlakyModel(HTTPError(400))
+    with pytest.raises(HTTPError):
+        gateway(model, max_retries=3).invoke("question")
+    assert model.calls == 1
+
+
+def test_ainvoke_times_out_and_retries():
+    class SlowOnce(FlakyModel):
+        async def ainvoke(self, prompt):
+            self.calls += 1
+            if self.calls == 1:
+                await asyncio.sleep(1)
+            return AIMessage(content="ok")
+
+    model = SlowOnce()
+    response = asyncio.run(gateway(model, timeout=0.05, max_retries=1).ainvoke("question"))
+    assert response.content == "ok"
+    assert model.calls == 2
+
+    model = SlowOnce()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(gateway(model, timeout=0.05, max_retries=0).ainvoke("question"))
+
+
+def test_stream_retries_only_before_the_first_chunk():
+    class FailFirst(FlakyModel):
+        def stream(self, prompt):
+            self.calls += 1
+            if self.calls == 1:
+                raise ConnectionError("refused")
+            for chunk in self.chunks:
+                yield AIMessageChunk(content=chunk)
+
+    model = FailFirst()
+    chunks = [chunk.content for chunk in gateway(model, max_retries=2).stream("question")]
+    assert chunks == ["a ", "b "]
+    assert model.calls == 2
+
+    model = FlakyModel(fail_after_chunk=True)
+    received = []
+    with pytest.raises(ConnectionError):
+        for chunk in gateway(model, max_retries=3).stream("question"):
+            received.append(chunk.content)
+    assert received == ["a "]
+    assert model.calls == 1
+
+
+def test_fake_backend_replies_per_profile():
+    assert FakeChatModel("relevance", latency=0).invoke("anything").content == "CAN_ANSWER"
+    assert "Supported: YES" in FakeChatModel("verification", latency=0).invoke("anything").content
+
+    research = FakeChatModel("research", latency=0)
+    prompt = "**Available information:**\nThe warranty lasts two years.\n**Answer:**"
+    assert research.invoke(prompt).content == "The warranty lasts two years."
+    streamed = "".join(chunk.content for chunk in research.stream(prompt))
+    assert streamed.strip() == "The warranty lasts two years."
+    assert research.invoke("no context").content == "no context"
+
+
+def test_create_llm_rejects_unknown_profiles_and_backends():
+    assert isinstance(create_llm("research", backend="fake").model, FakeChatModel)
+    with pytest.raises(ValueError):
+        create_llm("no-such-profile", backend="fake")
+    with pytest.raises(ValueError):
+        create_llm("research", backend="no-such-backend")
+
+
+def test_failed_attempts_refund_their_token_reservation():
+    limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=3000)
+    model = FlakyModel(HTTPError(429), HTTPError(503))
+    LLMGateway(model, limiter, max_tokens=1000, max_retries=2).invoke("question")
+    assert model.calls == 3
+    # Only the successful call's 5 reported tokens stay spent
+    assert limiter.tokens.reserve(2990) == 0.0
+
+
+class StubChatGroq:
+    instances = []
+
+    def __init__(self, **kwargs):
+        self.http_async_client = kwargs.get("http_async_client")
+        StubChatGroq.instances.append(self)
+
+    async def ainvoke(self, prompt):
+        return AIMessage(content="ok")
+
+
+def test_groq_async_calls_get_a_client_per_event_loop(monkeypatch):
+    langchain_groq = pytest.importorskip("langchain_groq")
+    monkeypatch.setattr(langchain_groq, "ChatGroq", StubChatGroq)
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setattr(StubChatGroq, "instances", [])
+
+    research = create_llm("research", backend="groq")
+    relevance = create_llm("relevance", backend="groq")
+
+    async def ask_both():
+        await research.ainvoke("question")
+        await research.ainvoke("question")
+        await relevance.ainvoke("question")
+
+    asyncio.run(ask_both())
+    asyncio.run(ask_both())
+
+    async_models = [model for model in StubChatGroq.instances if model.http_async_client is not None]
+    # One ChatGroq per profile and loop; both profiles share each loop's client
+    assert len(async_models) == 4
+    clients = [model.http_async_client for model in async_models]
+    assert clients[0] is clients[1] and clients[2] is clients[3] and clients[0] is not clients[2]
@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+from metrics import MetricsRegistry, record_llm_usage, stage_span
+
+
+def test_stage_span_times_the_block_and_collects_llm_usage():
+    with stage_span("research") as span:
+        time.sleep(0.01)
+        record_llm_usage(10, 4)
+        record_llm_usage(5, 1)
+    assert span["stage"] == "research"
+    assert span["seconds"] >= 0.01
+    assert (span["llm_calls"], span["prompt_tokens"], span["completion_tokens"]) == (2, 15, 5)
+
+
+def test_usage_goes_to_the_innermost_span_and_is_dropped_outside():
+    record_llm_usage(100, 100)  # No span open: a no-op
+    with stage_span("relevance") as outer:
+        with stage_span("verification") as inner:
+            record_llm_usage(3, 2)
+        record_llm_usage(1, 1)
+    assert (inner["llm_calls"], inner["prompt_tokens"]) == (1, 3)
+    assert (outer["llm_calls"], outer["prompt_tokens"]) == (1, 1)
+
+
+def test_tasks_started_inside_a_span_record_to_it():
+    async def other_task():
+        record_llm_usage(7, 7)
+
+    async def main():
+        with stage_span("research") as span:
+            await asyncio.create_task(other_task())
+        return span
+
+    # The task copies the context, so its usage lands on the same span
+    span = asyncio.run(main())
+    assert span["llm_calls"] == 1
+
+
+def span(stage, seconds, calls=0, prompt=0, completion=0):
+    return {"stage": stage, "seconds": seconds, "llm_calls": calls,
+            "prompt_tokens": prompt, "completion_tokens": completion}
+
+
+def test_render_emits_cumulative_histograms_and_counters():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.observe_pipeline("fast", [span("retrieval", 0.05), span("research", 0.5, 1, 100, 20)], 0.6)
+    registry.observe_pipeline("fast", [span("research", 2.0, 2, 50, 10)], 2.5)
+    lines = registry.render().splitlines()
+
+    assert "# HELP rag_pipeline_duration_seconds End-to-end question answering time." in lines
+    assert "# TYPE rag_pipeline_duration_seconds histogram" in lines
+    assert 'rag_pipeline_duration_seconds_bucket{mode="fast",le="0.1"} 0' in lines
+    assert 'rag_pipeline_duration_seconds_bucket{mode="fast",le="1.0"} 1' in lines
+    assert 'rag_pipeline_duration_seconds_bucket{mode="fast",le="+Inf"} 2' in lines
+    assert 'rag_pipeline_duration_seconds_sum{mode="fast"} 3.100000' in lines
+    assert 'rag_pipeline_duration_seconds_count{mode="fast"} 2' in lines
+
+    assert 'rag_stage_duration_seconds_bucket{stage="retrieval",le="0.1"} 1' in lines
+    assert 'rag_stage_duration_seconds_bucket{stage="research",le="1.0"} 1' in lines
+    assert 'rag_stage_duration_seconds_bucket{stage="research",le="+Inf"} 2' in lines
+
+    assert "# TYPE rag_llm_calls_total counter" in lines
+    assert 'rag_llm_calls_total{stage="research"} 3' in lines
+    assert 'rag_llm_calls_total{stage="retrieval"} 0' in lines
+    assert 'rag_llm_prompt_tokens_total{stage="research"} 150' in lines
+    assert 'rag_llm_completion_tokens_total{stage="research"} 30' in lines
+
+
+def test_render_without_observations_has_only_metadata():
+    lines = MetricsRegistry().render().splitlines()
+    assert lines and all(line.startswith("# ") for line in lines)
@@ -0,0 +1,46 @@
+import pytest
+
+# relevance_checker imports the HuggingFace embedding integration through resources
+pytest.importorskip("llama_index.embeddings.huggingface")
+
+from langchain_core.documents import Document
+from agents.relevance_checker import RelevanceChecker
+from config import RELEVANCE_GATE_HIGH, RELEVANCE_GATE_LOW, RELEVANCE_GATE_BM25
+from llm_gateway import FakeChatModel, LLMGateway, RateLimiter
+
+
+def doc(**scores):
+    return Document(page_content="chunk", metadata=scores)
+
+
+@pytest.fixture
+def checker():
+    llm = LLMGateway(FakeChatModel("relevance", latency=0), RateLimiter(0, 0))
+    return RelevanceChecker(llm=llm, gate=True)
+
+
+def test_strong_vector_and_lexical_match_is_can_answer(checker):
+    documents = [doc(vector_score=RELEVANCE_GATE_HIGH + 0.02, bm25_score=7.1, bm25_norm=RELEVANCE_GATE_BM25 + 0.1)]
+    assert checker.gate(documents) == "CAN_ANSWER"
+
+
+def test_weak_bm25_match_is_left_to_the_llm(checker):
+    # Any BM25 hit used to be enough for CAN_ANSWER
+    documents = [doc(vector_score=RELEVANCE_GATE_HIGH + 0.02, bm25_score=0.4, bm25_norm=0.05)]
+    assert checker.gate(documents) is None
+    assert checker.check("question", documents) == "CAN_ANSWER"
+    assert checker.stats()["llm_calls"] == 1
+
+
+def test_low_similarity_without_bm25_hit_is_no_match(checker):
+    documents = [doc(vector_score=RELEVANCE_GATE_LOW - 0.05), doc(vector_score=RELEVANCE_GATE_LOW - 0.1)]
+    assert checker.gate(documents) == "NO_MATCH"
+
+
+def test_low_similarity_with_bm25_hit_is_left_to_the_llm(checker):
+    documents = [doc(vector_score=RELEVANCE_GATE_LOW - 0.05, bm25_score=1.2, bm25_norm=0.2)]
+    assert checker.gate(documents) is None
+
+
+def test_gate_needs_vector_scores(checker):
+    assert checker.gate([doc(bm25_score=5.0, bm25_norm=0.9)]) is None
@@ -0,0 +1,130 @@
+import gc
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# retriever imports the HuggingFace embedding integration; the model itself is never loaded
+pytest.importorskip("llama_index.embeddings.huggingface")
+
+import ingest
+from conftest import HashingModel, add_pdf
+import numpy as np
+from ann_index import normalize
+from retriever import LlamaIndexHybridRetriever, QueryEmbeddingCache
+
+
+@pytest.fixture
+def retriever(index):
+    add_pdf("a.pdf", "alpha")
+    add_pdf("b.pdf", "bravo")
+    ingest.ingest_pdfs()
+    return LlamaIndexHybridRetriever(embed_model=HashingModel(), rerank=False)
+
+
+def test_hybrid_retrieval_finds_matching_file(retriever):
+    documents = retriever.invoke("bravo17 bravo42", k=2)
+    assert documents and documents[0].metadata["file_name"] == "b.pdf"
+    assert "bm25_score" in documents[0].metadata and "vector_score" in documents[0].metadata
+    assert 0 < documents[0].metadata["bm25_norm"] <= 1
+
+
+def test_replaced_retriever_keeps_serving_until_collected(retriever):
+    held = LlamaIndexHybridRetriever(embed_model=HashingModel(), rerank=False)
+    executor = held._executor
+
+    # A caller still holding a replaced retriever can query it
+    assert held.invoke("alpha3", k=1)
+    assert not executor._shutdown
+
+    del held
+    gc.collect()
+    assert executor._shutdown
+
+
+def slow(retrieve, seconds):
+    def run(*args):
+        time.sleep(seconds)
+        return retrieve(*args)
+    return run
+
+
+def test_slow_leg_is_dropped_with_a_warning(retriever, monkeypatch, caplog):
+    monkeypatch.setattr(retriever.bm25, "retrieve", slow(retriever.bm25.retrieve, 0.5))
+    with caplog.at_level(logging.WARNING, logger="retriever"):
+        results = retriever._retrieve_concurrently("alpha3", timeout=0.1)
+    assert results["bm25"] == [] and results["vector"]
+    assert "bm25" in caplog.text
+
+
+def test_queued_leg_counts_against_the_deadline(retriever, monkeypatch):
+    # One thread: BM25 waits in the queue behind the slow vector leg
+    monkeypatch.setattr(retriever, "_executor", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(retriever.vector, "retrieve", slow(retriever.vector.retrieve, 0.5))
+    bm25_calls = []
+    monkeypatch.setattr(retriever.bm25, "retrieve", lambda *args: bm25_calls.append(args) or [])
+
+    started = time.perf_counter()
+    results = retriever._retrieve_concurrently("alpha3", timeout=0.2)
+    assert time.perf_counter() - started < 0.4
+    assert results == {"vector": [], "bm25": []}
+
+    # The queued leg was cancelled rather than run after the deadline
+    retriever._executor.shutdown(wait=True)
+    assert bm25_calls == []
+
+
+class InstructedModel(HashingModel):
+    """
+    Embeds queries with an instruction prefix, as bge does.
+    """
+
+    query_instruction: str = "represent this query "
+    batches: list = []
+
+    def _get_query_embedding(self, query: str):
+        return self._get_text_embedding(self.query_instruction + query)
+
+    def _get_text_embeddings(self, texts):
+        self.batches.append(len(texts))
+        return super()._get_text_embeddings(texts)
+
+
+class UndeclaredInstructionModel(HashingModel):
+    """
+    Prefixes queries without exposing the instruction.
+    """
+
+    def _get_query_embedding(self, query: str):
+        return self._get_text_embedding("represent this query " + query)
+
+
+@pytest.mark.parametrize("model", [HashingModel(), InstructedModel(), UndeclaredInstructionModel()])
+def test_warm_caches_the_embeddings_get_would_compute(model):
+    cache = QueryEmbeddingCache(model, max_size=8)
+    assert cache.warm(["Alpha three", "alpha   THREE", "bravo"]) == 2
+    assert cache.stats() == {"hits": 0, "misses": 0, "size": 2}
+
+    expected = normalize(model.get_query_embedding("alpha three"))
+    assert np.allclose(cache.get("alpha three"), expected)
+    assert cache.stats()["hits"] == 1
+
+
+def test_warm_encodes_instructed_queries_in_one_batch():
+    model = InstructedModel(batches=[])
+    cache = QueryEmbeddingCache(model, max_size=8)
+    cache.warm(["alpha"])  # Probes the instruction once
+    model.batches.clear()
+
+    assert cache.warm(["bravo", "charlie", "delta"]) == 3
+    assert model.batches == [3]
+    assert np.allclose(cache.get("charlie"), normalize(model.get_query_embedding("charlie")))
+
+
+def test_warm_is_capped_at_the_cache_size(caplog):
+    cache = QueryEmbeddingCache(HashingModel(), max_size=2)
+    with caplog.at_level(logging.INFO, logger="retriever"):
+        assert cache.warm(["one", "two", "three"]) == 2
+    assert cache.stats()["size"] == 2
+    assert "Warming 2 of 3" in caplog.text
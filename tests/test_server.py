@@ -0,0 +1,101 @@
+import json
+import time
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+# server imports the HuggingFace embedding integration through resources
+pytest.importorskip("llama_index.embeddings.huggingface")
+
+from langchain_core.documents import Document
+from agents.answer_cache import AnswerCache
+from agents.workflow import AgentWorkflow
+from server import QueryService, make_handler
+
+
+class StubRetriever:
+    """
+    Returns a fixed document, optionally blocking until released.
+    """
+
+    def __init__(self, block: bool = False):
+        self.released = threading.Event()
+        if not block:
+            self.released.set()
+
+    def invoke(self, question, k=None):
+        self.released.wait(5)
+        return [Document(page_content="The warranty lasts two years.", metadata={"file_name": "a.pdf"})]
+
+
+@pytest.fixture
+def start_server():
+    servers = []
+
+    def start(retriever, workers=1, queue_size=1, request_timeout=5):
+        # LLM_BACKEND=fake (conftest): the agents answer without an API
+        workflow = AgentWorkflow(enable_verification=False, answer_cache=AnswerCache(max_size=0))
+        service = QueryService(workers, queue_size, workflow_for=lambda _: workflow, retriever_for=lambda: retriever)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(service, request_timeout))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append((server, service, retriever))
+        return service, f"http://127.0.0.1:{server.server_address[1]}/query"
+
+    yield start
+    for server, service, retriever in servers:
+        retriever.released.set()
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+
+def post(url, question="How long is the warranty?"):
+    request = urllib.request.Request(
+        url, data=json.dumps({"question": question}).encode(), headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_query_is_answered(start_server):
+    _, url = start_server(StubRetriever())
+    status, body = post(url)
+    assert status == 200
+    assert "warranty" in body["draft_answer"].lower()
+    assert [span["stage"] for span in body["spans"]][:1] == ["retrieval"]
+
+
+def test_full_queue_is_rejected_with_503(start_server):
+    retriever = StubRetriever(block=True)
+    service, url = start_server(retriever, workers=1, queue_size=1)
+
+    # One request occupies the worker, the next fills the queue
+    pending = [service.submit("first")]
+    deadline = time.monotonic() + 5
+    while service.stats()["active"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    pending.append(service.submit("second"))
+    status, body = post(url)
+    assert status == 503 and "queue is full" in body["error"]
+    assert service.stats()["rejected"] == 1
+
+    retriever.released.set()
+    assert all(future.result(timeout=10)["draft_answer"] for future in pending)
+
+
+def test_slow_answer_times_out_with_504(start_server):
+    _, url = start_server(StubRetriever(block=True), request_timeout=0.2)
+    status, body = post(url)
+    assert status == 504 and "0.2s" in body["error"]
+
+
+def test_zero_queue_size_still_bounds_the_queue(start_server):
+    service, _ = start_server(StubRetriever(block=True), queue_size=0)
+    assert service.stats()["queue_size"] == 1
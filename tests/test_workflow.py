@@ -0,0 +1,152 @@
+import time
+import asyncio
+
+import pytest
+
+# The agents import the HuggingFace embedding integration through resources
+pytest.importorskip("llama_index.embeddings.huggingface")
+
+import numpy as np
+from langchain_core.documents import Document
+from agents.answer_cache import AnswerCache
+from agents.workflow import AgentWorkflow
+from llm_gateway import FakeChatModel
+
+
+class StubRetriever:
+    def invoke(self, question, k=None):
+        return [
+            Document(page_content=f"Section {i}: the warranty lasts two years.", metadata={"file_name": "a.pdf"})
+            for i in range(k or 1)
+        ]
+
+    def embed_query(self, question):
+        return np.ones(4, dtype=np.float32) / 2
+
+
+def stages(result):
+    return [span["stage"] for span in result["spans"]]
+
+
+def slow_stream(question, documents):
+    for word in "The warranty lasts two years .".split():
+        time.sleep(0.02)
+        yield word + " "
+
+
+def test_stream_records_research_when_relevance_fails_mid_stream(monkeypatch):
+    workflow = AgentWorkflow(enable_verification=True, speculative=True, answer_cache=AnswerCache(max_size=0))
+    monkeypatch.setattr(workflow.relevance_checker, "check", lambda *args, **kwargs: "NO_MATCH")
+    monkeypatch.setattr(workflow.researcher, "stream", slow_stream)
+
+    events = list(workflow.stream_pipeline("What is the refund policy?", StubRetriever()))
+    result = events[-1]
+    assert result["type"] == "result"
+    assert "research" in stages(result) and "relevance" in stages(result)
+    assert "warranty" not in "".join(e["content"] for e in events if e["type"] == "token")
+
+
+def test_stream_records_research_when_relevant(monkeypatch):
+    workflow = AgentWorkflow(enable_verification=True, speculative=True, answer_cache=AnswerCache(max_size=0))
+    monkeypatch.setattr(workflow.researcher, "stream", slow_stream)
+
+    events = list(workflow.stream_pipeline("How long is the warranty?", StubRetriever()))
+    assert "".join(e["content"] for e in events if e["type"] == "token").strip() == "The warranty lasts two years ."
+    assert stages(events[-1])[:1] == ["retrieval"] and "research" in stages(events[-1])
+
+
+@pytest.mark.parametrize("pipeline", ["full", "stream"])
+def test_query_embedding_has_its_own_span(pipeline):
+    workflow = AgentWorkflow(enable_verification=False, answer_cache=AnswerCache(semantic=True))
+    if pipeline == "full":
+        result = workflow.full_pipeline("How long is the warranty?", StubRetriever())
+    else:
+        result = list(workflow.stream_pipeline("How long is the warranty?", StubRetriever()))[-1]
+    assert stages(result)[:2] == ["query_embedding", "retrieval"]
+
+
+def failing_once(check):
+    calls = []
+
+    def verify(answer, documents):
+        calls.append(len(documents))
+        if len(calls) == 1:
+            return {"verification_report": "Supported: NO", "verification": {"Supported": "NO", "Relevant": "YES"}}
+        return check(answer=answer, documents=documents)
+    return verify, calls
+
+
+@pytest.mark.parametrize("speculative", [True, False])
+def test_stream_follows_the_graph_routing(monkeypatch, speculative):
+    results = {}
+    for pipeline in ("full", "stream"):
+        workflow = AgentWorkflow(enable_verification=True, speculative=speculative, answer_cache=AnswerCache(max_size=0))
+        verify, calls = failing_once(workflow.verifier.check)
+        monkeypatch.setattr(workflow.verifier, "check", verify)
+        if pipeline == "full":
+            results[pipeline] = workflow.full_pipeline("How long is the warranty?", StubRetriever())
+        else:
+            events = list(workflow.stream_pipeline("How long is the warranty?", StubRetriever()))
+            assert [e["type"] for e in events if e["type"] != "token"] == ["answer", "result"]
+            results[pipeline] = events[-1]
+        # The retry verifies a wider context
+        assert len(calls) == 2 and calls[1] > calls[0]
+
+    full, stream = results["full"], results["stream"]
+    assert stream["retry_count"] == full["retry_count"] == 1
+    assert stream["draft_answer"] == full["draft_answer"]
+    assert sorted(stages(stream)) == sorted(stages(full))
+
+
+class UnrelatedRetriever(StubRetriever):
+    """
+    Documents with scores the relevance gate rejects on its own.
+    """
+
+    def invoke(self, question, k=None):
+        return [
+            Document(page_content="Unrelated text.", metadata={"vector_score": 0.1, "bm25_score": 0.0, "bm25_norm": 0.0})
+            for _ in range(k or 1)
+        ]
+
+
+@pytest.mark.parametrize("pipeline", ["full", "afull", "stream"])
+def test_gated_no_match_starts_no_speculative_draft(monkeypatch, pipeline):
+    workflow = AgentWorkflow(enable_verification=True, speculative=True, answer_cache=AnswerCache(max_size=0))
+    drafts = []
+    monkeypatch.setattr(workflow.researcher, "generate", lambda *args, **kwargs: drafts.append("generate"))
+    monkeypatch.setattr(workflow.researcher, "agenerate", lambda *args, **kwargs: drafts.append("agenerate"))
+    monkeypatch.setattr(workflow.researcher, "stream", lambda *args, **kwargs: drafts.append("stream") or iter(()))
+
+    if pipeline == "full":
+        result = workflow.full_pipeline("What is the refund policy?", UnrelatedRetriever())
+    elif pipeline == "afull":
+        result = asyncio.run(workflow.afull_pipeline("What is the refund policy?", UnrelatedRetriever()))
+    else:
+        result = list(workflow.stream_pipeline("What is the refund policy?", UnrelatedRetriever()))[-1]
+    assert drafts == []
+    assert "not related" in result["draft_answer"]
+    assert stages(result) == ["retrieval", "relevance"]
+
+
+@pytest.mark.parametrize("pipeline", ["full", "stream"])
+def test_avoided_llm_calls_match_the_fake_backend(monkeypatch, pipeline):
+    calls = []
+    for method in ("invoke", "ainvoke", "stream"):
+        original = getattr(FakeChatModel, method)
+        monkeypatch.setattr(
+            FakeChatModel, method,
+            lambda self, prompt, original=original: calls.append(self.profile) or original(self, prompt)
+        )
+    workflow = AgentWorkflow(enable_verification=True, speculative=True, answer_cache=AnswerCache(max_size=0))
+
+    if pipeline == "full":
+        workflow.full_pipeline("What is the refund policy?", UnrelatedRetriever())
+    else:
+        list(workflow.stream_pipeline("What is the refund policy?", UnrelatedRetriever()))
+    # Let a stray speculative draft reach the backend if one was started
+    time.sleep(0.05)
+
+    assert calls == []
+    stats = workflow.relevance_checker.stats()
+    assert stats["gated_no_match"] == stats["llm_calls_avoided"] == 1 and stats["llm_calls"] == 0